@@ -3,6 +3,12 @@
 -- =====================================================================
 -- Database: gamezone_analytics
 -- Use these queries in pgAdmin Query Tool or any PostgreSQL client
+-- fact_orders stores integer surrogate keys; fact_orders_labeled joins the
+-- dimensions back on (integer hash joins) and exposes the original columns.
+-- Order counts and revenue by month, country, platform, channel or product
+-- read fact_orders_monthly (the rollup kept by the loaders), which holds
+-- those additive totals once per month x country x platform x channel x
+-- product. Distinct customers and per-order measures need the fact rows.
 
 -- =====================================================================
 -- 1. BASIC DATA OVERVIEW
@@ -13,9 +19,9 @@ SELECT
     COUNT(DISTINCT f.order_id) as total_orders,
     COUNT(DISTINCT f.customer_id) as unique_customers,
     COUNT(DISTINCT f.product_id) as unique_products,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f;
+    ROUND(SUM(f.order_amount_usd), 2) as total_revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled f;
 
 -- =====================================================================
 -- 2. REVENUE ANALYSIS
@@ -23,36 +29,36 @@ FROM fact_orders f;
 
 -- Total Revenue by Country
 SELECT 
-    f.country_code,
-    COUNT(f.order_id) as order_count,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
-GROUP BY f.country_code
+    m.country_code,
+    SUM(m.order_count) as order_count,
+    ROUND(SUM(m.revenue_usd), 2) as total_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_order_value
+FROM fact_orders_monthly m
+GROUP BY m.country_code
 ORDER BY total_revenue DESC
 LIMIT 20;
 
 -- Revenue Trend by Month
 SELECT 
-    f.order_year_month,
-    COUNT(f.order_id) as monthly_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as monthly_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
-WHERE f.order_year_month IS NOT NULL AND f.order_year_month != ''
-GROUP BY f.order_year_month
-ORDER BY f.order_year_month DESC;
+    m.order_year_month,
+    SUM(m.order_count) as monthly_orders,
+    ROUND(SUM(m.revenue_usd), 2) as monthly_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_order_value
+FROM fact_orders_monthly m
+WHERE m.order_year_month IS NOT NULL
+GROUP BY m.order_year_month
+ORDER BY m.order_year_month DESC;
 
 -- Revenue by Year
 SELECT 
-    f.order_year,
-    COUNT(f.order_id) as yearly_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as yearly_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
-WHERE f.order_year IS NOT NULL AND f.order_year != ''
-GROUP BY f.order_year
-ORDER BY f.order_year DESC;
+    m.order_year,
+    SUM(m.order_count) as yearly_orders,
+    ROUND(SUM(m.revenue_usd), 2) as yearly_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_order_value
+FROM fact_orders_monthly m
+WHERE m.order_year IS NOT NULL
+GROUP BY m.order_year
+ORDER BY m.order_year DESC;
 
 -- =====================================================================
 -- 3. PRODUCT ANALYSIS
@@ -60,36 +66,36 @@ ORDER BY f.order_year DESC;
 
 -- Top 10 Best Selling Products by Revenue
 SELECT 
-    f.product_name,
-    f.product_id,
-    COUNT(f.order_id) as total_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_price
-FROM fact_orders f
-GROUP BY f.product_name, f.product_id
+    m.product_name,
+    m.product_id,
+    SUM(m.order_count) as total_orders,
+    ROUND(SUM(m.revenue_usd), 2) as total_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_price
+FROM fact_orders_monthly m
+GROUP BY m.product_name, m.product_id
 ORDER BY total_revenue DESC
 LIMIT 10;
 
 -- Top 10 Most Ordered Products (by frequency)
 SELECT 
-    f.product_name,
-    f.product_id,
-    COUNT(f.order_id) as order_count,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue
-FROM fact_orders f
-GROUP BY f.product_name, f.product_id
+    m.product_name,
+    m.product_id,
+    SUM(m.order_count) as order_count,
+    ROUND(SUM(m.revenue_usd), 2) as total_revenue
+FROM fact_orders_monthly m
+GROUP BY m.product_name, m.product_id
 ORDER BY order_count DESC
 LIMIT 10;
 
 -- Product Performance Ranking
 SELECT 
-    ROW_NUMBER() OVER (ORDER BY SUM(f.order_amount_usd::numeric) DESC) as rank,
-    f.product_name,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as product_revenue,
-    COUNT(f.order_id) as order_count,
-    ROUND(SUM(f.order_amount_usd::numeric) / COUNT(f.order_id), 2) as revenue_per_order
-FROM fact_orders f
-GROUP BY f.product_name
+    ROW_NUMBER() OVER (ORDER BY SUM(m.revenue_usd) DESC) as rank,
+    m.product_name,
+    ROUND(SUM(m.revenue_usd), 2) as product_revenue,
+    SUM(m.order_count) as order_count,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as revenue_per_order
+FROM fact_orders_monthly m
+GROUP BY m.product_name
 ORDER BY product_revenue DESC;
 
 -- =====================================================================
@@ -102,9 +108,9 @@ SELECT
     f.country_code,
     f.account_creation_method,
     COUNT(f.order_id) as total_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as lifetime_value,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
+    ROUND(SUM(f.order_amount_usd), 2) as lifetime_value,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled f
 GROUP BY f.customer_id, f.country_code, f.account_creation_method
 ORDER BY lifetime_value DESC
 LIMIT 20;
@@ -114,10 +120,10 @@ SELECT
     f.country_code,
     COUNT(DISTINCT f.customer_id) as customer_count,
     COUNT(f.order_id) as total_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND(SUM(f.order_amount_usd::numeric) / COUNT(DISTINCT f.customer_id), 2) as revenue_per_customer
-FROM fact_orders f
+    ROUND(SUM(f.order_amount_usd), 2) as total_revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value,
+    ROUND(SUM(f.order_amount_usd) / COUNT(DISTINCT f.customer_id), 2) as revenue_per_customer
+FROM fact_orders_labeled f
 GROUP BY f.country_code
 ORDER BY total_revenue DESC
 LIMIT 20;
@@ -138,8 +144,8 @@ FROM (
     SELECT 
         f.customer_id,
         COUNT(f.order_id) as order_count,
-        SUM(f.order_amount_usd::numeric) as lifetime_value
-    FROM fact_orders f
+        SUM(f.order_amount_usd) as lifetime_value
+    FROM fact_orders_labeled f
     GROUP BY f.customer_id
 ) customer_stats
 GROUP BY customer_segment
@@ -151,24 +157,24 @@ ORDER BY avg_customer_value DESC;
 
 -- Revenue by Platform
 SELECT 
-    f.purchase_platform,
-    COUNT(f.order_id) as order_count,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND((SUM(f.order_amount_usd::numeric) / (SELECT SUM(f2.order_amount_usd::numeric) FROM fact_orders f2) * 100), 2) as revenue_share_pct
-FROM fact_orders f
-GROUP BY f.purchase_platform
+    m.purchase_platform,
+    SUM(m.order_count) as order_count,
+    ROUND(SUM(m.revenue_usd), 2) as total_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_order_value,
+    ROUND((SUM(m.revenue_usd) / (SELECT SUM(m2.revenue_usd) FROM fact_orders_monthly m2) * 100), 2) as revenue_share_pct
+FROM fact_orders_monthly m
+GROUP BY m.purchase_platform
 ORDER BY total_revenue DESC;
 
 -- Revenue by Marketing Channel
 SELECT 
-    f.marketing_channel,
-    COUNT(f.order_id) as order_count,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND((SUM(f.order_amount_usd::numeric) / (SELECT SUM(f2.order_amount_usd::numeric) FROM fact_orders f2) * 100), 2) as revenue_share_pct
-FROM fact_orders f
-GROUP BY f.marketing_channel
+    m.marketing_channel,
+    SUM(m.order_count) as order_count,
+    ROUND(SUM(m.revenue_usd), 2) as total_revenue,
+    ROUND(SUM(m.revenue_usd) / SUM(m.order_count), 2) as avg_order_value,
+    ROUND((SUM(m.revenue_usd) / (SELECT SUM(m2.revenue_usd) FROM fact_orders_monthly m2) * 100), 2) as revenue_share_pct
+FROM fact_orders_monthly m
+GROUP BY m.marketing_channel
 ORDER BY total_revenue DESC;
 
 -- Revenue by Account Creation Method
@@ -176,9 +182,9 @@ SELECT
     f.account_creation_method,
     COUNT(f.order_id) as order_count,
     COUNT(DISTINCT f.customer_id) as customer_count,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
+    ROUND(SUM(f.order_amount_usd), 2) as total_revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled f
 GROUP BY f.account_creation_method
 ORDER BY total_revenue DESC;
 
@@ -190,10 +196,10 @@ ORDER BY total_revenue DESC;
 SELECT 
     f.order_year_month,
     COUNT(f.order_id) as monthly_orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as monthly_revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
+    ROUND(SUM(f.order_amount_usd), 2) as monthly_revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value,
     COUNT(DISTINCT f.customer_id) as unique_customers
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.order_year_month IS NOT NULL AND f.order_year_month != ''
 GROUP BY f.order_year_month
 ORDER BY f.order_year_month DESC;
@@ -204,9 +210,9 @@ SELECT
     COUNT(f.order_id) as orders,
     COUNT(DISTINCT f.customer_id) as customers,
     COUNT(DISTINCT f.product_id) as products,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
+    ROUND(SUM(f.order_amount_usd), 2) as revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled f
 WHERE f.order_year_month IS NOT NULL AND f.order_year_month != ''
 GROUP BY f.order_year_month
 ORDER BY f.order_year_month;
@@ -219,7 +225,7 @@ ORDER BY f.order_year_month;
 SELECT 
     repeat_status,
     COUNT(*) as customer_count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(DISTINCT customer_id) FROM fact_orders), 2) as percentage
+    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(DISTINCT customer_id) FROM fact_orders_labeled), 2) as percentage
 FROM (
     SELECT 
         customer_id,
@@ -228,7 +234,7 @@ FROM (
         SELECT 
             customer_id,
             COUNT(*) as order_count
-        FROM fact_orders
+        FROM fact_orders_labeled
         GROUP BY customer_id
     ) customer_orders
 ) repeat_analysis
@@ -237,16 +243,16 @@ GROUP BY repeat_status;
 -- Order Value Distribution
 SELECT 
     CASE 
-        WHEN f.order_amount_usd::numeric < 50 THEN 'Low ($0-50)'
-        WHEN f.order_amount_usd::numeric < 100 THEN 'Medium ($50-100)'
-        WHEN f.order_amount_usd::numeric < 250 THEN 'High ($100-250)'
-        WHEN f.order_amount_usd::numeric < 500 THEN 'Very High ($250-500)'
+        WHEN f.order_amount_usd < 50 THEN 'Low ($0-50)'
+        WHEN f.order_amount_usd < 100 THEN 'Medium ($50-100)'
+        WHEN f.order_amount_usd < 250 THEN 'High ($100-250)'
+        WHEN f.order_amount_usd < 500 THEN 'Very High ($250-500)'
         ELSE 'Premium ($500+)'
     END as order_value_range,
     COUNT(*) as order_count,
     ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM fact_orders), 2) as percentage,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_value
-FROM fact_orders f
+    ROUND(AVG(f.order_amount_usd), 2) as avg_value
+FROM fact_orders_labeled f
 GROUP BY order_value_range
 ORDER BY order_count DESC;
 
@@ -261,9 +267,9 @@ SELECT
     COUNT(CASE WHEN order_id IS NULL OR order_id = '' THEN 1 END) as null_order_ids,
     COUNT(CASE WHEN customer_id IS NULL OR customer_id = '' THEN 1 END) as null_customers,
     COUNT(CASE WHEN product_id IS NULL OR product_id = '' THEN 1 END) as null_products,
-    COUNT(CASE WHEN order_amount_usd IS NULL OR order_amount_usd = '' THEN 1 END) as null_amounts,
+    COUNT(CASE WHEN order_amount_usd IS NULL THEN 1 END) as null_amounts,
     COUNT(CASE WHEN country_code IS NULL OR country_code = '' THEN 1 END) as null_country
-FROM fact_orders;
+FROM fact_orders_labeled;
 
 -- Check dimension table row counts
 SELECT 
@@ -277,6 +283,8 @@ SELECT 'dim_platform', COUNT(*) FROM dim_platform
 UNION ALL
 SELECT 'dim_marketing_channel', COUNT(*) FROM dim_marketing_channel
 UNION ALL
+SELECT 'dim_account_creation_method', COUNT(*) FROM dim_account_creation_method
+UNION ALL
 SELECT 'fact_orders', COUNT(*) FROM fact_orders
 ORDER BY table_name;
 
@@ -290,12 +298,12 @@ SELECT
     COUNT(DISTINCT customer_id) as total_customers,
     COUNT(DISTINCT product_id) as total_products,
     COUNT(DISTINCT country_code) as total_countries,
-    ROUND(SUM(order_amount_usd::numeric), 2) as total_revenue,
-    ROUND(AVG(order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND(MIN(order_amount_usd::numeric), 2) as min_order_value,
-    ROUND(MAX(order_amount_usd::numeric), 2) as max_order_value,
-    ROUND(SUM(order_amount_usd::numeric) / COUNT(DISTINCT customer_id), 2) as revenue_per_customer
-FROM fact_orders;
+    ROUND(SUM(order_amount_usd), 2) as total_revenue,
+    ROUND(AVG(order_amount_usd), 2) as avg_order_value,
+    ROUND(MIN(order_amount_usd), 2) as min_order_value,
+    ROUND(MAX(order_amount_usd), 2) as max_order_value,
+    ROUND(SUM(order_amount_usd) / COUNT(DISTINCT customer_id), 2) as revenue_per_customer
+FROM fact_orders_labeled;
 
 -- =====================================================================
 -- 10. SAMPLE ANALYTICS QUERIES
@@ -306,9 +314,9 @@ SELECT
     country_code,
     COUNT(DISTINCT customer_id) as customers,
     COUNT(order_id) as orders,
-    ROUND(SUM(order_amount_usd::numeric), 2) as revenue,
-    ROUND(AVG(order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders
+    ROUND(SUM(order_amount_usd), 2) as revenue,
+    ROUND(AVG(order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled
 GROUP BY country_code
 ORDER BY revenue DESC
 LIMIT 15;
@@ -317,10 +325,10 @@ LIMIT 15;
 SELECT 
     purchase_platform,
     marketing_channel,
-    COUNT(order_id) as orders,
-    ROUND(SUM(order_amount_usd::numeric), 2) as revenue,
-    ROUND(AVG(order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders
+    SUM(order_count) as orders,
+    ROUND(SUM(revenue_usd), 2) as revenue,
+    ROUND(SUM(revenue_usd) / SUM(order_count), 2) as avg_order_value
+FROM fact_orders_monthly
 GROUP BY purchase_platform, marketing_channel
 ORDER BY revenue DESC
 LIMIT 15;
@@ -330,9 +338,9 @@ SELECT
     account_creation_method,
     COUNT(DISTINCT customer_id) as customers,
     COUNT(order_id) as orders,
-    ROUND(SUM(order_amount_usd::numeric), 2) as revenue,
-    ROUND(SUM(order_amount_usd::numeric) / COUNT(DISTINCT customer_id), 2) as revenue_per_customer
-FROM fact_orders
+    ROUND(SUM(order_amount_usd), 2) as revenue,
+    ROUND(SUM(order_amount_usd) / COUNT(DISTINCT customer_id), 2) as revenue_per_customer
+FROM fact_orders_labeled
 GROUP BY account_creation_method
 ORDER BY revenue DESC;
 
@@ -1,6 +1,11 @@
 -- =====================================================================
 -- GAMEZONE ADVANCED ANALYTICS QUERIES
 -- Senior Data Analyst Level
+-- fact_orders stores integer surrogate keys; fact_orders_labeled joins the
+-- dimensions back on (integer hash joins) and exposes the original columns.
+-- Revenue-only rankings read fact_orders_monthly (the monthly rollup kept by
+-- the loaders). Queries with distinct customers, first purchases or
+-- shipping-time extremes and medians need the fact rows.
 -- =====================================================================
 
 -- =====================================================================
@@ -11,25 +16,24 @@ SELECT
     f.country_code,
     f.order_year,
     COUNT(f.order_id) as orders,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue,
+    ROUND(SUM(f.order_amount_usd), 2) as revenue,
     COUNT(DISTINCT f.customer_id) as customers,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value
-FROM fact_orders f
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value
+FROM fact_orders_labeled f
 WHERE f.order_year IS NOT NULL 
-    AND f.order_year != '' 
-    AND f.order_year::int >= (EXTRACT(YEAR FROM CURRENT_DATE) - 2)
+    AND f.order_year >= (EXTRACT(YEAR FROM CURRENT_DATE) - 2)
 GROUP BY f.country_code, f.order_year
 ORDER BY f.country_code, f.order_year DESC;
 
 -- YoY Growth Rate with Pivot View
 WITH yearly_revenue AS (
     SELECT 
-        f.country_code,
-        f.order_year::int as year,
-        ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue
-    FROM fact_orders f
-    WHERE f.order_year IS NOT NULL AND f.order_year != ''
-    GROUP BY f.country_code, f.order_year
+        m.country_code,
+        m.order_year as year,
+        ROUND(SUM(m.revenue_usd), 2) as revenue
+    FROM fact_orders_monthly m
+    WHERE m.order_year IS NOT NULL
+    GROUP BY m.country_code, m.order_year
 )
 SELECT 
     yoy_2021.country_code,
@@ -59,14 +63,14 @@ SELECT
     f.marketing_channel,
     COUNT(f.order_id) as orders,
     COUNT(DISTINCT f.customer_id) as customers,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND((SUM(f.order_amount_usd::numeric) / (
-        SELECT SUM(f2.order_amount_usd::numeric) 
-        FROM fact_orders f2 
+    ROUND(SUM(f.order_amount_usd), 2) as revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value,
+    ROUND((SUM(f.order_amount_usd) / (
+        SELECT SUM(f2.order_amount_usd) 
+        FROM fact_orders_labeled f2 
         WHERE f2.purchase_platform = f.purchase_platform
     ) * 100), 2) as channel_share_pct_on_platform
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.marketing_channel IS NOT NULL 
     AND f.marketing_channel != '' 
     AND f.marketing_channel != 'unknown'
@@ -79,12 +83,12 @@ SELECT
     f.marketing_channel,
     COUNT(f.order_id) as orders,
     COUNT(DISTINCT f.customer_id) as customers,
-    ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue,
-    ROUND(AVG(f.order_amount_usd::numeric), 2) as avg_order_value,
-    ROUND(SUM(f.order_amount_usd::numeric) / COUNT(DISTINCT f.customer_id), 2) as revenue_per_customer,
+    ROUND(SUM(f.order_amount_usd), 2) as revenue,
+    ROUND(AVG(f.order_amount_usd), 2) as avg_order_value,
+    ROUND(SUM(f.order_amount_usd) / COUNT(DISTINCT f.customer_id), 2) as revenue_per_customer,
     ROUND(COUNT(f.order_id)::numeric / COUNT(DISTINCT f.customer_id), 2) as orders_per_customer,
-    ROUND((SUM(f.order_amount_usd::numeric) / (SELECT SUM(f2.order_amount_usd::numeric) FROM fact_orders f2) * 100), 2) as total_revenue_share_pct
-FROM fact_orders f
+    ROUND((SUM(f.order_amount_usd) / (SELECT SUM(f2.order_amount_usd) FROM fact_orders_labeled f2) * 100), 2) as total_revenue_share_pct
+FROM fact_orders_labeled f
 WHERE f.marketing_channel IS NOT NULL 
     AND f.marketing_channel != '' 
     AND f.marketing_channel != 'unknown'
@@ -97,14 +101,14 @@ ORDER BY revenue DESC;
 
 WITH product_yearly_revenue AS (
     SELECT 
-        f.product_name,
-        f.product_id,
-        f.order_year::int as year,
-        COUNT(f.order_id) as orders,
-        ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue
-    FROM fact_orders f
-    WHERE f.order_year IS NOT NULL AND f.order_year != ''
-    GROUP BY f.product_name, f.product_id, f.order_year
+        m.product_name,
+        m.product_id,
+        m.order_year as year,
+        SUM(m.order_count) as orders,
+        ROUND(SUM(m.revenue_usd), 2) as revenue
+    FROM fact_orders_monthly m
+    WHERE m.order_year IS NOT NULL
+    GROUP BY m.product_name, m.product_id, m.order_year
 ),
 latest_year_top10 AS (
     SELECT 
@@ -148,7 +152,7 @@ WITH customer_first_purchase AS (
     SELECT 
         customer_id,
         MIN(f.order_date) as first_purchase_date
-    FROM fact_orders f
+    FROM fact_orders_labeled f
     WHERE f.order_date IS NOT NULL
     GROUP BY customer_id
 ),
@@ -160,8 +164,8 @@ monthly_customers AS (
             WHEN cf.first_purchase_date::date = f.order_date::date THEN 'New'
             ELSE 'Repeat'
         END as customer_type,
-        f.order_amount_usd::numeric as revenue
-    FROM fact_orders f
+        f.order_amount_usd as revenue
+    FROM fact_orders_labeled f
     LEFT JOIN customer_first_purchase cf ON f.customer_id = cf.customer_id
     WHERE f.order_year_month IS NOT NULL AND f.order_year_month != ''
 )
@@ -182,7 +186,7 @@ WITH customer_first_purchase AS (
     SELECT 
         customer_id,
         MIN(f.order_date) as first_purchase_date
-    FROM fact_orders f
+    FROM fact_orders_labeled f
     WHERE f.order_date IS NOT NULL
     GROUP BY customer_id
 ),
@@ -194,7 +198,7 @@ monthly_split AS (
             ELSE 'Repeat'
         END as customer_type,
         COUNT(*) as orders
-    FROM fact_orders f
+    FROM fact_orders_labeled f
     LEFT JOIN customer_first_purchase cf ON f.customer_id = cf.customer_id
     WHERE f.order_year_month IS NOT NULL AND f.order_year_month != ''
     GROUP BY f.order_year_month, customer_type
@@ -216,11 +220,11 @@ ORDER BY order_year_month DESC;
 
 WITH country_revenue AS (
     SELECT 
-        f.country_code,
-        ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue
-    FROM fact_orders f
-    WHERE f.country_code IS NOT NULL AND f.country_code != ''
-    GROUP BY f.country_code
+        m.country_code,
+        ROUND(SUM(m.revenue_usd), 2) as revenue
+    FROM fact_orders_monthly m
+    WHERE m.country_code IS NOT NULL AND m.country_code != ''
+    GROUP BY m.country_code
 ),
 country_ranked AS (
     SELECT 
@@ -248,11 +252,11 @@ ORDER BY rank;
 -- Pareto Summary
 WITH country_revenue AS (
     SELECT 
-        f.country_code,
-        ROUND(SUM(f.order_amount_usd::numeric), 2) as revenue
-    FROM fact_orders f
-    WHERE f.country_code IS NOT NULL AND f.country_code != ''
-    GROUP BY f.country_code
+        m.country_code,
+        ROUND(SUM(m.revenue_usd), 2) as revenue
+    FROM fact_orders_monthly m
+    WHERE m.country_code IS NOT NULL AND m.country_code != ''
+    GROUP BY m.country_code
 ),
 country_ranked AS (
     SELECT 
@@ -281,26 +285,24 @@ SELECT
     f.purchase_platform,
     COUNT(f.order_id) as orders,
     ROUND(AVG(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as avg_shipping_days,
     ROUND(MIN(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as min_shipping_days,
     ROUND(MAX(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as max_shipping_days,
     ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY 
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
-    ), 2) as median_shipping_days
-FROM fact_orders f
+        (f.ship_ts - f.order_date::date)
+    )::numeric, 2) as median_shipping_days
+FROM fact_orders_labeled f
 WHERE f.order_date IS NOT NULL 
-    AND f.order_date != ''
     AND f.ship_ts IS NOT NULL 
-    AND f.ship_ts != ''
     AND f.country_code IS NOT NULL
     AND f.country_code != ''
     AND f.purchase_platform IS NOT NULL
-    AND EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp)) >= 0
+    AND (f.ship_ts - f.order_date::date) >= 0
 GROUP BY f.country_code, f.purchase_platform
 ORDER BY avg_shipping_days DESC;
 
@@ -309,22 +311,20 @@ SELECT
     f.country_code,
     COUNT(f.order_id) as orders,
     ROUND(AVG(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as avg_shipping_days,
     ROUND(MIN(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as min_shipping_days,
     ROUND(MAX(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as max_shipping_days
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.order_date IS NOT NULL 
-    AND f.order_date != ''
     AND f.ship_ts IS NOT NULL 
-    AND f.ship_ts != ''
     AND f.country_code IS NOT NULL
     AND f.country_code != ''
-    AND EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp)) >= 0
+    AND (f.ship_ts - f.order_date::date) >= 0
 GROUP BY f.country_code
 ORDER BY avg_shipping_days DESC
 LIMIT 20;
@@ -334,20 +334,18 @@ SELECT
     f.purchase_platform,
     COUNT(f.order_id) as orders,
     ROUND(AVG(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as avg_shipping_days,
     ROUND(MIN(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as min_shipping_days,
     ROUND(MAX(
-        EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp))
+        (f.ship_ts - f.order_date::date)
     ), 2) as max_shipping_days
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.order_date IS NOT NULL 
-    AND f.order_date != ''
     AND f.ship_ts IS NOT NULL 
-    AND f.ship_ts != ''
-    AND EXTRACT(DAY FROM (f.ship_ts::timestamp - f.order_date::timestamp)) >= 0
+    AND (f.ship_ts - f.order_date::date) >= 0
 GROUP BY f.purchase_platform
 ORDER BY avg_shipping_days DESC;
 
@@ -360,37 +358,37 @@ SELECT
     'Total Orders' as metric,
     COUNT(f.order_id)::text as value,
     'orders' as unit
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.order_id IS NOT NULL AND f.order_id != ''
 UNION ALL
 SELECT 'Total Revenue', 
-    ROUND(SUM(f.order_amount_usd::numeric), 2)::text, 
+    ROUND(SUM(f.order_amount_usd), 2)::text, 
     'USD'
-FROM fact_orders f
-WHERE f.order_amount_usd IS NOT NULL AND f.order_amount_usd != ''
+FROM fact_orders_labeled f
+WHERE f.order_amount_usd IS NOT NULL
 UNION ALL
 SELECT 'Total Customers', 
     COUNT(DISTINCT f.customer_id)::text, 
     'customers'
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.customer_id IS NOT NULL AND f.customer_id != ''
 UNION ALL
 SELECT 'Avg Order Value', 
-    ROUND(AVG(f.order_amount_usd::numeric), 2)::text, 
+    ROUND(AVG(f.order_amount_usd), 2)::text, 
     'USD'
-FROM fact_orders f
-WHERE f.order_amount_usd IS NOT NULL AND f.order_amount_usd != ''
+FROM fact_orders_labeled f
+WHERE f.order_amount_usd IS NOT NULL
 UNION ALL
 SELECT 'Countries', 
     COUNT(DISTINCT f.country_code)::text, 
     'countries'
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.country_code IS NOT NULL AND f.country_code != ''
 UNION ALL
 SELECT 'Products', 
     COUNT(DISTINCT f.product_id)::text, 
     'products'
-FROM fact_orders f
+FROM fact_orders_labeled f
 WHERE f.product_id IS NOT NULL AND f.product_id != '';
 
 -- =====================================================================
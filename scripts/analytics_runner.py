@@ -0,0 +1,269 @@
+"""
+Concurrent runner for the analytics SQL in documentation/.
+
+documentation/analytics_queries_*.sql are split into named queries: each
+"-- N. TITLE" (or "-- N️⃣ TITLE") banner starts a section, and every
+statement in it is named after the file, the section number and the
+comment line just above it, e.g.
+
+    foundational_02_1_total_revenue_by_country
+
+The queries run in parallel, each on its own connection from the shared
+pool (db.get_pool), so a full KPI refresh takes about as long as its
+slowest query instead of the sum of all of them. Queries are started
+longest-first by their duration in the previous run, so the slowest one
+is never left until last.
+
+Every result is streamed through a server-side cursor (db.stream_frames)
+into <name>.csv or <name>.parquet in ANALYTICS_EXPORT_DIR, ready for Power
+BI import; only one chunk is held in memory at a time. A file is written
+under a temporary name and renamed when complete, so a failed query never
+leaves a truncated export behind. Each query's runtime, time to first row,
+rows and bytes are recorded in LOAD_METRICS_FILE (stage "query").
+
+Usage:
+    python analytics_runner.py [--list] [--format csv|parquet] [file.sql ...] [name_pattern ...]
+
+Name patterns are shell-style (e.g. "strategic_05_*"); without patterns
+every query runs.
+"""
+
+import fnmatch
+import glob
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import db
+from load_metrics import LoadMetrics, load_runs
+from parallel_loader import DEFAULT_WORKERS
+from parquet_io import MART_FORMATS, disk_usage, mart_path, write_parquet_frames
+
+QUERY_FILES = os.getenv('ANALYTICS_QUERY_FILES', 'documentation/analytics_queries_*.sql')
+EXPORT_DIR = os.getenv('ANALYTICS_EXPORT_DIR', 'analytics_exports')
+EXPORT_FORMAT = os.getenv('ANALYTICS_EXPORT_FORMAT', 'csv').lower()
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', DEFAULT_WORKERS))
+
+# Rows per server-side fetch (and per CSV write / Parquet row group)
+EXPORT_CHUNK_ROWS = db.DEFAULT_ITERSIZE
+
+# "-- 2. REVENUE ANALYSIS" or "-- 2️⃣ MARKETING ..." (digit, variation selector, keycap)
+SECTION_HEADER = re.compile(r"^--\s*(\d+)(?:\.|\ufe0f?\u20e3)\s*(.+)$")
+BANNER = re.compile(r"^--\s*=+\s*$")
+
+# Longest name part taken from the query's comment
+MAX_SLUG_LENGTH = 40
+
+AnalyticsQuery = namedtuple("AnalyticsQuery", ["name", "source", "section", "title", "sql"])
+QueryResult = namedtuple("QueryResult", ["query", "path", "rows", "nbytes", "duration", "first_row", "error"])
+
+METRICS = LoadMetrics("analytics_runner")
+
+
+def _slug(text):
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    return slug[:MAX_SLUG_LENGTH].rstrip("_")
+
+
+def parse_query_file(path):
+    """
+    [AnalyticsQuery] of one SQL file, in file order.
+
+    A statement ends at a line ending in ";". Banner sections without a
+    number (e.g. "BONUS: ...") are numbered after the previous section.
+    """
+    tag = _slug(os.path.splitext(os.path.basename(path))[0].replace("analytics_queries_", ""))
+    with open(path, encoding="utf-8") as f:
+        lines = [line.rstrip() for line in f]
+
+    queries = []
+    section, section_title, in_section = 0, "", 0
+    comment, statement = None, []
+    for i, line in enumerate(lines):
+        text = line.strip()
+        if text.startswith("--"):
+            if BANNER.match(text):
+                continue
+            header = SECTION_HEADER.match(text)
+            banner_above = i > 0 and BANNER.match(lines[i - 1].strip())
+            banner_below = i + 1 < len(lines) and BANNER.match(lines[i + 1].strip())
+            if header or (banner_above and banner_below and queries):
+                section = int(header.group(1)) if header else section + 1
+                section_title = (header.group(2) if header else text[2:]).strip()
+                in_section, comment = 0, None
+            elif not statement:
+                comment = text[2:].strip()
+            continue
+        if not text and not statement:
+            continue
+        statement.append(line)
+        if text.endswith(";"):
+            in_section += 1
+            title = comment or section_title
+            queries.append(AnalyticsQuery(
+                f"{tag}_{section:02d}_{in_section}_{_slug(title)}",
+                path, section, title, "\n".join(statement).strip().rstrip(";"),
+            ))
+            comment, statement = None, []
+    return queries
+
+
+def load_queries(paths=None):
+    """Every query in paths (default: the QUERY_FILES glob); names must be unique"""
+    paths = paths or sorted(glob.glob(QUERY_FILES))
+    if not paths:
+        raise FileNotFoundError(f"No analytics query files match {QUERY_FILES}")
+    queries = [query for path in paths for query in parse_query_file(path)]
+    names = [query.name for query in queries]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate query names: {duplicates}")
+    return queries
+
+
+def previous_durations(path=None):
+    """{query name: seconds} from the most recent runner run that recorded it"""
+    durations = {}
+    try:
+        runs = load_runs(path or METRICS.path)
+    except FileNotFoundError:
+        return durations
+    for records in runs.values():
+        for entry in records:
+            if entry.get("script") == METRICS.script and entry.get("stage") == "query" \
+                    and entry.get("error") is None:
+                durations[entry["table"]] = entry["duration_s"]
+    return durations
+
+
+def _write_csv(frames, path):
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, frame in enumerate(frames):
+            frame.to_csv(f, header=(i == 0), index=False)
+            rows += len(frame)
+    return rows
+
+
+def export_query(pool, query, export_format=EXPORT_FORMAT, directory=EXPORT_DIR):
+    """
+    Run one query on a pooled connection and stream its result to a file.
+
+    Returns:
+        QueryResult (error set instead of raising, so one failure does not
+        stop the other queries)
+    """
+    path = mart_path(query.name, export_format, directory)
+    partial = path + ".partial"
+    timing = {}
+    start = time.perf_counter()
+
+    def frames():
+        for frame in db.stream_frames(conn, query.sql, chunk_rows=EXPORT_CHUNK_ROWS, yield_empty=True):
+            timing.setdefault("first_row", time.perf_counter() - start)
+            yield frame
+
+    conn = pool.getconn()
+    try:
+        writer = write_parquet_frames if export_format == "parquet" else _write_csv
+        rows = writer(frames(), partial)
+        os.replace(partial, path)
+        return QueryResult(query, path, rows, disk_usage(path), time.perf_counter() - start,
+                           timing.get("first_row"), None)
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return QueryResult(query, None, 0, 0, time.perf_counter() - start, timing.get("first_row"), e)
+    finally:
+        # Read-only work: end the transaction before the connection goes back
+        conn.rollback()
+        pool.putconn(conn)
+
+
+def run_queries(pool, queries, workers=ANALYTICS_WORKERS, export_format=EXPORT_FORMAT,
+                directory=EXPORT_DIR):
+    """
+    Export every query concurrently, longest (by previous runtime) first.
+
+    Returns:
+        [QueryResult] in completion order
+    """
+    if export_format not in MART_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}' (expected one of {MART_FORMATS})")
+    os.makedirs(directory, exist_ok=True)
+
+    # Queries never run before sort first: they may be the slow ones
+    durations = previous_durations()
+    ordered = sorted(queries, key=lambda query: -durations.get(query.name, float("inf")))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(export_query, pool, query, export_format, directory) for query in ordered]
+        for future in as_completed(futures):
+            result = future.result()
+            METRICS.record("query", result.query.name, result.rows, result.nbytes, result.duration,
+                           first_row_s=None if result.first_row is None else round(result.first_row, 6),
+                           error=None if result.error is None else str(result.error))
+            if result.error is None:
+                print(f"  ✓ {result.query.name:<60} {result.rows:>10,} rows {result.duration:>9.2f}s")
+            else:
+                print(f"  ❌ {result.query.name:<60} {result.error}")
+            results.append(result)
+    return results
+
+
+def main():
+    args = sys.argv[1:]
+    export_format = EXPORT_FORMAT
+    if "--format" in args:
+        i = args.index("--format")
+        export_format = args[i + 1].lower()
+        del args[i:i + 2]
+    list_only = "--list" in args
+    if list_only:
+        args.remove("--list")
+
+    files = [arg for arg in args if arg.endswith(".sql")]
+    patterns = [arg for arg in args if not arg.endswith(".sql")]
+    queries = load_queries(files)
+    if patterns:
+        queries = [query for query in queries if any(fnmatch.fnmatch(query.name, p) for p in patterns)]
+    if not queries:
+        print(f"❌ No queries match {patterns}")
+        sys.exit(1)
+
+    if list_only:
+        for query in queries:
+            print(f"  {query.name:<60} {query.title}")
+        print(f"\n  {len(queries)} queries")
+        return
+
+    workers = max(1, min(ANALYTICS_WORKERS, len(queries)))
+    print(f"[ANALYTICS] {len(queries)} queries, {workers} workers → {EXPORT_DIR}/*.{export_format}\n")
+    pool = db.get_pool(workers)
+    start = time.perf_counter()
+    try:
+        results = run_queries(pool, queries, workers, export_format)
+    finally:
+        db.close_pool()
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if result.error is not None]
+    slowest = max(results, key=lambda result: result.duration)
+    total = sum(result.duration for result in results)
+    print(f"\n  Wall clock {elapsed:.2f}s, sum of query times {total:.2f}s, "
+          f"slowest {slowest.query.name} {slowest.duration:.2f}s")
+    METRICS.record("refresh", None, sum(result.rows for result in results),
+                   sum(result.nbytes for result in results), elapsed,
+                   queries=len(results), failed=len(failed))
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(results)} queries failed")
+        sys.exit(1)
+    print(f"\n✅ {len(results)} results exported")
+
+
+if __name__ == "__main__":
+    main()
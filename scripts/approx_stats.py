@@ -0,0 +1,255 @@
+"""
+Approximate table statistics with stated error bounds (verification --fast).
+
+Exact COUNT(*) / COUNT(DISTINCT ...) read every row, which takes minutes on
+a billion-row fact_orders. The estimators here read the catalog or a small
+block sample instead, and every figure comes back as an Estimate carrying a
+low/high bound:
+
+    estimated_rows        pg_class.reltuples; the bound is the number of rows
+                          inserted/deleted since the last ANALYZE
+                          (pg_stat_user_tables)
+    estimated_distinct    pg_stats.n_distinct; the bound is the sqrt(N/r)
+                          ratio error guaranteed for a distinct count from an
+                          r-row sample (Charikar et al., GEE). Columns without
+                          statistics are estimated with GEE on a BERNOULLI sample.
+    sampled_totals        SUM(expression) from TABLESAMPLE SYSTEM (whole blocks),
+    sampled_group_totals  scaled by the sampling rate (Horvitz-Thompson); the
+                          bound is 1.96 standard errors computed between blocks
+                          (of each partition), so clustered values widen it
+                          instead of hiding in it
+    sampled_range         MIN/MAX over the sample: an inner bound of the range
+
+A sample percent of 100 reads the whole table and yields exact figures, so
+small dimensions cost the same as before and report no error.
+"""
+
+import math
+import os
+from collections import namedtuple
+
+# Rows read by a sampled check (the sample percent is derived per table)
+DEFAULT_SAMPLE_ROWS = int(os.getenv('VERIFY_SAMPLE_ROWS', 100000))
+
+# Fixed seed, so re-running --fast on unchanged data reports the same figures
+SAMPLE_SEED = 42
+
+# Two-sided 95% normal quantile for the sampled bounds
+Z_95 = 1.96
+
+
+class Estimate(namedtuple("Estimate", ["value", "low", "high", "basis"])):
+    """A figure with its error bound; formats like a number followed by the bound"""
+
+    __slots__ = ()
+
+    @classmethod
+    def exact(cls, value, basis="exact"):
+        return cls(value, value, value, basis)
+
+    @property
+    def is_exact(self):
+        return self.low == self.high == self.value
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __format__(self, spec):
+        spec = spec or ",.0f"
+        if self.is_exact:
+            return f"{format(self.value, spec)} (exact)"
+        return (f"≈{format(self.value, spec)} "
+                f"[{format(self.low, spec)} – {format(self.high, spec)}, {self.basis}]")
+
+    def __str__(self):
+        return format(self)
+
+
+def add_estimates(values):
+    """Sum of ints and/or Estimates (bounds add up, which is conservative)"""
+    values = list(values)
+    if not any(isinstance(value, Estimate) for value in values):
+        return sum(values)
+    values = [value if isinstance(value, Estimate) else Estimate.exact(value) for value in values]
+    return Estimate(
+        sum(value.value for value in values),
+        sum(value.low for value in values),
+        sum(value.high for value in values),
+        "sum of estimates",
+    )
+
+
+def estimated_rows(cursor):
+    """
+    {table: Estimate} for every user table from reltuples.
+
+    A partitioned table is the sum of its partitions. Tables that were never
+    analyzed (reltuples < 0) are counted exactly.
+    """
+    cursor.execute("""
+        SELECT c.relname, c.relkind, c.reltuples::bigint, COALESCE(s.n_mod_since_analyze, 0),
+               (SELECT array_agg(child.relname) FROM pg_inherits i
+                JOIN pg_class child ON child.oid = i.inhrelid
+                WHERE i.inhparent = c.oid)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+    """)
+    tables = {table: (kind, reltuples, modified, partitions or [])
+              for table, kind, reltuples, modified, partitions in cursor.fetchall()}
+    estimates = {}
+
+    def estimate(table):
+        if table not in estimates:
+            kind, reltuples, modified, partitions = tables[table]
+            if kind == 'p':
+                estimates[table] = add_estimates(estimate(child) for child in partitions if child in tables)
+            elif reltuples < 0:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                estimates[table] = Estimate.exact(cursor.fetchone()[0])
+            else:
+                estimates[table] = Estimate(
+                    reltuples, max(reltuples - modified, 0), reltuples + modified, "reltuples"
+                )
+        return estimates[table]
+
+    for table in tables:
+        estimate(table)
+    return estimates
+
+
+def sample_percent(rows, target_rows=DEFAULT_SAMPLE_ROWS):
+    """TABLESAMPLE percent that reads about target_rows of a table with rows rows"""
+    rows = getattr(rows, "value", rows)
+    if rows <= target_rows:
+        return 100.0
+    return max(100.0 * target_rows / rows, 0.0001)
+
+
+def _ratio_bound(value, rows, sample_rows, basis):
+    """Estimate with the sqrt(rows / sample_rows) ratio bound of a sampled distinct count"""
+    if sample_rows >= rows:
+        return Estimate.exact(value, basis)
+    ratio = math.sqrt(rows / sample_rows)
+    return Estimate(value, value / ratio, min(value * ratio, rows), basis)
+
+
+def estimated_distinct(cursor, table, column, rows):
+    """
+    Estimate of COUNT(DISTINCT column) (nulls excluded) for a table of rows rows.
+
+    Uses pg_stats when the column has been analyzed, otherwise GEE on a
+    BERNOULLI sample of about DEFAULT_SAMPLE_ROWS rows.
+    """
+    rows = getattr(rows, "value", rows)
+    cursor.execute("""
+        SELECT s.n_distinct, s.null_frac, current_setting('default_statistics_target')::int
+        FROM pg_stats s
+        WHERE s.schemaname = current_schema() AND s.tablename = %s AND s.attname = %s
+        ORDER BY s.inherited DESC
+    """, (table, column))
+    row = cursor.fetchone()
+    if row is not None:
+        n_distinct, null_frac, statistics_target = row
+        value = n_distinct if n_distinct >= 0 else -n_distinct * rows * (1 - null_frac)
+        # ANALYZE reads 300 rows per unit of statistics target
+        return _ratio_bound(round(value), rows, 300 * statistics_target, "pg_stats")
+
+    percent = sample_percent(rows)
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(freq), 0), COUNT(*), COUNT(*) FILTER (WHERE freq = 1)
+        FROM (
+            SELECT COUNT(*) AS freq
+            FROM {table} TABLESAMPLE BERNOULLI (%s) REPEATABLE (%s)
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+        ) values_in_sample
+    """, (percent, SAMPLE_SEED))
+    sample_rows, seen, singletons = cursor.fetchone()
+    if percent >= 100:
+        return Estimate.exact(seen)
+    if sample_rows == 0:
+        return Estimate(0, 0, rows, "GEE sample")
+    value = math.sqrt(rows / sample_rows) * singletons + (seen - singletons)
+    estimate = _ratio_bound(round(value), rows, sample_rows, "GEE sample")
+    # Every value seen in the sample exists
+    return estimate._replace(low=max(estimate.low, seen))
+
+
+def _block_estimate(total, sum_squares, fraction):
+    """Horvitz-Thompson estimate of a total from per-block sums of a SYSTEM sample"""
+    if fraction >= 1:
+        return Estimate.exact(total)
+    value = total / fraction
+    error = Z_95 * math.sqrt((1 - fraction) / fraction ** 2 * sum_squares)
+    if total == 0:
+        # Nothing seen: rule of three, assuming the rows are not clustered in blocks
+        error = 3 / fraction
+    return Estimate(value, max(value - error, 0), value + error, "block sample")
+
+
+def sampled_totals(cursor, table, expressions, percent, alias="t", joins=""):
+    """
+    Estimate SUM(expression) over the whole table for every expression.
+
+    Args:
+        cursor: database cursor
+        table: sampled table
+        expressions: {name: SQL expression over alias (and joins)}
+        percent: TABLESAMPLE SYSTEM percent (see sample_percent)
+        alias: alias of the sampled table
+        joins: JOIN clauses appended after the sampled table
+
+    Returns:
+        {name: Estimate}
+    """
+    names = list(expressions)
+    per_block = ", ".join(
+        f"COALESCE(SUM({expressions[name]}), 0)::float8 AS {name}" for name in names
+    )
+    totals = ", ".join(f"COALESCE(SUM({name}), 0), COALESCE(SUM({name} * {name}), 0)" for name in names)
+    cursor.execute(f"""
+        SELECT {totals} FROM (
+            SELECT {per_block}
+            FROM {table} {alias} TABLESAMPLE SYSTEM (%s) REPEATABLE (%s)
+            {joins}
+            GROUP BY {alias}.tableoid, ({alias}.ctid::text::point)[0]
+        ) blocks
+    """, (percent, SAMPLE_SEED))
+    row = cursor.fetchone()
+    return {
+        name: _block_estimate(row[2 * i], row[2 * i + 1], percent / 100)
+        for i, name in enumerate(names)
+    }
+
+
+def sampled_group_totals(cursor, table, group_expression, expression, percent, alias="t", joins=""):
+    """{group: Estimate of SUM(expression)} for every group seen in a SYSTEM sample"""
+    cursor.execute(f"""
+        SELECT grp, SUM(block_total), SUM(block_total * block_total) FROM (
+            SELECT {group_expression} AS grp, SUM({expression})::float8 AS block_total
+            FROM {table} {alias} TABLESAMPLE SYSTEM (%s) REPEATABLE (%s)
+            {joins}
+            GROUP BY 1, {alias}.tableoid, ({alias}.ctid::text::point)[0]
+        ) blocks
+        GROUP BY grp
+    """, (percent, SAMPLE_SEED))
+    return {
+        group: _block_estimate(total, sum_squares, percent / 100)
+        for group, total, sum_squares in cursor.fetchall()
+    }
+
+
+def sampled_range(cursor, table, column, percent):
+    """
+    (MIN, MAX, exact) of column over a SYSTEM sample.
+
+    Unless exact, the true range contains the returned one.
+    """
+    cursor.execute(f"""
+        SELECT MIN({column}), MAX({column})
+        FROM {table} TABLESAMPLE SYSTEM (%s) REPEATABLE (%s)
+    """, (percent, SAMPLE_SEED))
+    low, high = cursor.fetchone()
+    return low, high, percent >= 100
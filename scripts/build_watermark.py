@@ -0,0 +1,111 @@
+"""
+Watermark for incremental builds of the analytical mart.
+
+gamezone_orders_clean.csv only grows by appending the day's orders, so
+setup_02 records how far into the file it has processed: the byte offset
+just after the last complete row, a hash of the header and of the bytes
+just before that offset (to detect rewrites rather than appends), the row
+count and the max order_date seen. The next incremental run seeks to the
+offset and parses only the rows after it, so the daily build reads the
+day's volume instead of the full history.
+
+If the file shrank or the hashed bytes changed, the watermark no longer
+describes the file and a full rebuild is needed.
+"""
+
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+DEFAULT_WATERMARK_FILE = "build_watermark.json"
+
+# Bytes just before the offset that must be unchanged for an append-only file
+HASH_WINDOW = 1 << 20
+
+
+def complete_rows_end(path):
+    """Offset just after the last newline (a row still being written is left for next time)"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        position = size
+        while position > 0:
+            step = min(1 << 16, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def content_hash(path, offset, window=HASH_WINDOW):
+    """sha256 of the header line plus the window of bytes ending at offset"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.readline())
+        start = max(offset - window, 0)
+        f.seek(start)
+        digest.update(f.read(offset - start))
+    return digest.hexdigest()
+
+
+def load_watermark(path=DEFAULT_WATERMARK_FILE):
+    """Previous watermark, or None before the first build"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_watermark(input_file, offset, rows, max_order_date, path=DEFAULT_WATERMARK_FILE):
+    """Record that input_file has been processed up to offset"""
+    state = {
+        "input": os.path.abspath(input_file),
+        "offset": offset,
+        "content_hash": content_hash(input_file, offset),
+        "rows": rows,
+        "max_order_date": None if pd.isna(max_order_date) else str(max_order_date),
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+    return state
+
+
+def check_watermark(input_file, state):
+    """
+    Return None if input_file is an append-only continuation of the build
+    recorded in state, else the reason a full rebuild is needed.
+    """
+    if state is None:
+        return "no previous build"
+    if state.get("input") != os.path.abspath(input_file):
+        return f"watermark is for {state.get('input')}"
+    if os.path.getsize(input_file) < state["offset"]:
+        return "input file shrank"
+    if content_hash(input_file, state["offset"]) != state["content_hash"]:
+        return "already processed rows changed"
+    return None
+
+
+def read_rows_after(input_file, offset, **read_csv_kwargs):
+    """
+    Parse only the complete rows after offset.
+
+    Returns:
+        (DataFrame of the new rows, offset just after the last one)
+    """
+    end = complete_rows_end(input_file)
+    with open(input_file, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        data = f.read(max(end - offset, 0))
+    frame = pd.read_csv(io.BytesIO(header + data), **read_csv_kwargs)
+    return frame, max(end, offset)
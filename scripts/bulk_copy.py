@@ -0,0 +1,249 @@
+"""
+Bulk CSV ingestion for PostgreSQL using COPY ... FROM STDIN.
+
+The CSV is streamed in batches: each batch is re-encoded into an in-memory
+CSV buffer (with NULL markers normalised) and sent to the server with a
+single COPY, so a table load costs one round trip per batch instead of one
+INSERT per row. Only one batch is held in memory at a time, so peak memory
+does not grow with file size.
+
+For files without quoted fields, parallel_copy_csv splits the file into
+line-aligned byte ranges and streams each range to its own connection, so
+CSV parsing runs on several server backends at once; the rows reach the
+target table in the caller's transaction.
+"""
+
+import csv
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Rows sent per COPY statement (scripts override this with COPY_BATCH_SIZE)
+DEFAULT_BATCH_SIZE = 50000
+
+# Source values that are loaded as SQL NULL (matches pandas' NaN handling)
+NULL_TOKENS = frozenset(['', 'NaN', 'nan', 'NULL', 'null', 'None', 'NaT'])
+
+
+def _copy_batch(cursor, table_name, columns, rows):
+    """Send one batch of rows to the server with a single COPY; returns payload size"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if len(columns) == 1:
+        # csv.writer renders a lone None as "" (an empty string to COPY);
+        # an empty line is the unquoted empty field that loads as NULL
+        for row in rows:
+            if row[0] is None:
+                buffer.write('\n')
+            else:
+                writer.writerow(row)
+    else:
+        writer.writerows(rows)
+    size = buffer.tell()
+    buffer.seek(0)
+
+    col_names = ", ".join(columns)
+    cursor.copy_expert(
+        f"COPY {table_name} ({col_names}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        buffer
+    )
+    return size
+
+
+def copy_csv_to_table(conn, csv_file, table_name, columns=None,
+                      batch_size=DEFAULT_BATCH_SIZE, null_tokens=NULL_TOKENS,
+                      row_filter=None, stats=None):
+    """
+    Stream csv_file into table_name with COPY ... FROM STDIN.
+
+    Args:
+        conn: open psycopg2 connection
+        csv_file: path of a CSV file with a header row
+        table_name: target table (must already exist)
+        columns: subset of CSV columns to load (default: all header columns)
+        batch_size: rows per COPY statement
+        null_tokens: source values loaded as NULL
+        row_filter: optional (column, predicate); only rows whose raw value in
+            column satisfies predicate are loaded
+        stats: optional dict that receives read_s (CSV parsing), insert_s
+            (COPY round trips) and bytes (CSV payload sent)
+
+    Returns:
+        (rows_loaded, elapsed_seconds)
+    """
+    start = time.perf_counter()
+    rows_loaded = 0
+    insert_s = 0.0
+    bytes_sent = 0
+
+    def flush(batch):
+        nonlocal insert_s, bytes_sent
+        copy_start = time.perf_counter()
+        bytes_sent += _copy_batch(cursor, table_name, columns, batch)
+        insert_s += time.perf_counter() - copy_start
+
+    cursor = conn.cursor()
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+
+        columns = list(columns) if columns else header
+        positions = [header.index(col) for col in columns]
+        if row_filter:
+            filter_pos, predicate = header.index(row_filter[0]), row_filter[1]
+
+        batch = []
+        for record in reader:
+            if row_filter and not predicate(record[filter_pos]):
+                continue
+            batch.append([
+                None if record[pos] in null_tokens else record[pos]
+                for pos in positions
+            ])
+            if len(batch) >= batch_size:
+                flush(batch)
+                rows_loaded += len(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+            rows_loaded += len(batch)
+
+    cursor.close()
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats.update(read_s=elapsed - insert_s, insert_s=insert_s, bytes=bytes_sent)
+    return rows_loaded, elapsed
+
+
+def has_quoted_fields(csv_file, block_size=1 << 24):
+    """True if csv_file contains any quote character (quoted fields may span lines)"""
+    with open(csv_file, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            if b'"' in block:
+                return True
+    return False
+
+
+def split_byte_ranges(csv_file, parts, start=None, end=None):
+    """
+    Split the data rows of csv_file into roughly equal byte ranges.
+
+    Every range starts at the beginning of a line and ends just after a
+    newline, so each one can be parsed on its own. Only valid for files
+    without quoted fields (see has_quoted_fields). start/end restrict the
+    split to part of the file (both must be line starts; default: all rows).
+
+    Returns:
+        (header_columns, [(start_offset, end_offset), ...])
+    """
+    size = os.path.getsize(csv_file) if end is None else end
+    with open(csv_file, 'rb') as f:
+        header = f.readline().decode('utf-8-sig').rstrip('\r\n')
+        data_start = f.tell() if start is None else max(start, f.tell())
+        boundaries = [data_start]
+        for i in range(1, parts):
+            f.seek(data_start + (size - data_start) * i // parts)
+            f.readline()  # advance to the next line start
+            boundaries.append(max(f.tell(), boundaries[-1]))
+        boundaries.append(size)
+
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+    return header.split(','), ranges
+
+
+class ByteRangeReader:
+    """File-like view of [start, end) of a file, read in small blocks (by COPY or pandas)"""
+
+    def __init__(self, f, start, end):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+def _copy_byte_range(conn, csv_file, table_name, columns, start, end):
+    """Stream one byte range of csv_file into table_name (uncommitted)"""
+    cursor = conn.cursor()
+    with open(csv_file, 'rb') as f:
+        cursor.copy_expert(
+            f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+            ByteRangeReader(f, start, end)
+        )
+    rows = cursor.rowcount
+    cursor.close()
+    return rows
+
+
+def parallel_copy_csv(conn, connect, csv_file, table_name, workers):
+    """
+    Load csv_file into table_name with the CSV parsed over several connections.
+
+    The file is split into line-aligned byte ranges and each range is
+    streamed with COPY on its own connection into a load table (a plain
+    copy of table_name's columns that nobody reads). The rows then move
+    into table_name with one INSERT ... SELECT on conn, which is not
+    committed: the caller commits them together with the rest of its
+    transaction (e.g. the DELETE of the old rows), or rolls everything
+    back. A load table left behind by a failed run is dropped on the next.
+
+    Args:
+        conn: connection whose transaction receives the rows
+        connect: zero-argument callable returning a new psycopg2 connection
+        csv_file: CSV without quoted fields (empty fields load as NULL)
+        table_name: target table (must already exist)
+        workers: number of byte ranges / connections
+
+    Returns:
+        (rows_loaded, elapsed_seconds)
+    """
+    start = time.perf_counter()
+    columns, ranges = split_byte_ranges(csv_file, workers)
+    load_table = f"{table_name}_parallel_load"
+    connections = [connect() for _ in ranges]
+    try:
+        setup = connections[0].cursor()
+        setup.execute(f"DROP TABLE IF EXISTS {load_table}")
+        setup.execute(
+            f"CREATE UNLOGGED TABLE {load_table} AS SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA"
+        )
+        setup.close()
+        connections[0].commit()
+
+        with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+            list(executor.map(
+                lambda job: _copy_byte_range(job[0], csv_file, load_table, columns, *job[1]),
+                zip(connections, ranges)
+            ))
+        for worker_conn in connections:
+            worker_conn.commit()
+    except Exception:
+        for worker_conn in connections:
+            worker_conn.rollback()
+        raise
+    finally:
+        for worker_conn in connections:
+            worker_conn.close()
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {load_table}"
+    )
+    rows = cursor.rowcount
+    cursor.execute(f"DROP TABLE {load_table}")
+    cursor.close()
+    return rows, time.perf_counter() - start
+
+
+def rows_per_second(rows, elapsed):
+    """Throughput helper that tolerates sub-millisecond loads"""
+    return rows / elapsed if elapsed > 0 else float(rows)
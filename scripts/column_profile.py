@@ -0,0 +1,430 @@
+"""
+Single-pass column profiles with a persisted history and drift detection.
+
+profile_table() runs one aggregate query per table on the server for the
+exact figures, and streams only a sample of the rows to the client (through
+a server-side cursor, db.stream_frames) for the sketches:
+
+    null rate         COUNT(*) and COUNT(column)             (aggregate)
+    min / max         MIN / MAX                              (aggregate)
+    length histogram  lengths of the values' text form,      (aggregate)
+                      power-of-two buckets
+    distinct          KMV sketch: the DISTINCT_SKETCH_SIZE smallest value hashes
+                      (exact below that many values, about 1/sqrt(k) = 3%
+                      relative error above). When the table is sampled the
+                      estimate comes from approx_stats.estimated_distinct
+                      (pg_stats or GEE) and is at least what the sample saw.
+    top values        Misra-Gries counters (TOP_VALUE_COUNTERS) on the sample,
+                      scaled to the table; a sampled count is short by at most
+                      sample rows / (TOP_VALUE_COUNTERS + 1) before scaling
+
+Tables of at most PROFILE_SAMPLE_ROWS rows are read whole, so their
+sketches see every value.
+
+store_profiles() writes one row per column to profile_history, keyed by
+load id. detect_drift() compares two stored loads column by column; it only
+reads profile_history, so old data is never rescanned.
+
+Usage:
+    python column_profile.py [load_id] [table ...]
+
+Without tables every mart table in the database is profiled; the new load
+is compared with the previous one.
+"""
+
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import Json, execute_values
+
+import db
+from approx_stats import SAMPLE_SEED, estimated_distinct, sample_percent
+from surrogate_keys import DIMENSION_KEYS
+
+# Tables written by setup_02 and loaded by setup_01
+MART_TABLES = ["dim_date"] + [table for table, _, _ in DIMENSION_KEYS] + ["fact_orders"]
+
+# Rows per chunk read from the server-side cursor
+PROFILE_CHUNK_ROWS = 100000
+
+# Rows sent to the client for the distinct and top-value sketches
+PROFILE_SAMPLE_ROWS = 100000
+
+DISTINCT_SKETCH_SIZE = 1024
+TOP_VALUES = 10
+TOP_VALUE_COUNTERS = 100
+
+# Upper bounds of the length buckets; longer values go to a final ">256" bucket
+LENGTH_BOUNDS = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256]
+LENGTH_LABELS = [
+    str(high) if high - low <= 1 else f"{low + 1}-{high}"
+    for low, high in zip([-1] + LENGTH_BOUNDS, LENGTH_BOUNDS)
+] + [f">{LENGTH_BOUNDS[-1]}"]
+
+# Drift thresholds
+NULL_RATE_DRIFT = 0.05       # absolute change of the null rate
+DISTINCT_DRIFT_RATIO = 1.5   # change factor of distinct values per row
+DISTRIBUTION_DRIFT = 0.2     # total variation distance of top values / lengths
+
+PROFILE_HISTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS profile_history (
+        load_id VARCHAR(100) NOT NULL,
+        profiled_at TIMESTAMP NOT NULL DEFAULT now(),
+        table_name VARCHAR(100) NOT NULL,
+        column_name VARCHAR(100) NOT NULL,
+        row_count BIGINT NOT NULL,
+        null_count BIGINT NOT NULL,
+        null_rate DOUBLE PRECISION,
+        min_value TEXT,
+        max_value TEXT,
+        distinct_estimate BIGINT,
+        top_values JSONB,
+        length_histogram JSONB,
+        PRIMARY KEY (load_id, table_name, column_name)
+    )
+"""
+
+Drift = namedtuple("Drift", ["table", "column", "check", "baseline", "current"])
+
+
+def _text(values):
+    """
+    Canonical text form of non-null values, decided per value, never per chunk.
+
+    Whole numbers render as '42' whether their chunk came back as int64 or
+    float64 (an INT column with NULLs arrives as float); timestamps render
+    with isoformat, so a midnight value reads the same in every chunk.
+    """
+    if pd.api.types.is_float_dtype(values):
+        text = values.astype(str)
+        whole = ((values % 1) == 0) & (values.abs() < 2**53)
+        text[whole] = values[whole].astype("int64").astype(str)
+        return text
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.map(pd.Timestamp.isoformat)
+    return values.astype(str)
+
+
+def _extreme(current, candidate, pick):
+    """min/max of two values, comparing their text when the types do not compare"""
+    if current is None:
+        return candidate
+    try:
+        return pick(current, candidate)
+    except TypeError:
+        return pick(str(current), str(candidate))
+
+
+class ColumnProfile:
+    """Bounded-memory statistics of one column, updated a chunk at a time"""
+
+    def __init__(self, column):
+        self.column = column
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.sketch = np.array([], dtype=np.uint64)
+        self.counters = pd.Series(dtype="float64")
+        self.lengths = np.zeros(len(LENGTH_LABELS), dtype=np.int64)
+        self.distinct = None
+
+    def update(self, values):
+        """Fold one chunk (a Series) into the profile"""
+        self.rows += len(values)
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        if present.empty:
+            return
+
+        try:
+            low, high = present.min(), present.max()
+        except TypeError:
+            low, high = present.astype(str).min(), present.astype(str).max()
+        self.min = _extreme(self.min, low, min)
+        self.max = _extreme(self.max, high, max)
+
+        text = _text(present)
+
+        # KMV: keep the k smallest distinct hashes seen so far
+        hashes = pd.util.hash_pandas_object(text, index=False).to_numpy()
+        if len(self.sketch) == DISTINCT_SKETCH_SIZE:
+            hashes = hashes[hashes < self.sketch[-1]]
+        self.sketch = np.unique(np.concatenate([self.sketch, hashes]))[:DISTINCT_SKETCH_SIZE]
+
+        # Misra-Gries: merge the chunk counts, then cut back to the counter budget
+        counters = self.counters.add(text.value_counts(), fill_value=0)
+        if len(counters) > TOP_VALUE_COUNTERS:
+            cut = counters.nlargest(TOP_VALUE_COUNTERS + 1).iloc[-1]
+            counters = counters[counters > cut] - cut
+        self.counters = counters
+
+        buckets = np.searchsorted(LENGTH_BOUNDS, text.str.len().to_numpy(), side="left")
+        self.lengths += np.bincount(buckets, minlength=len(LENGTH_LABELS))
+
+    def apply_totals(self, rows, present, low, high, lengths, sampled_rows, distinct=None):
+        """
+        Replace the counts seen in a sample with the table's aggregate figures.
+
+        Top-value counts are scaled by rows / sampled_rows; distinct is the
+        table-level estimate (None keeps the sketch's).
+        """
+        self.rows = rows
+        self.nulls = rows - present
+        self.min, self.max = low, high
+        self.lengths = np.array(lengths, dtype=np.int64)
+        if sampled_rows and sampled_rows < rows:
+            self.counters = (self.counters * (rows / sampled_rows)).round()
+        if distinct is not None:
+            self.distinct = max(int(distinct), len(self.sketch)) if present else 0
+
+    def distinct_estimate(self):
+        if self.distinct is not None:
+            return self.distinct
+        if len(self.sketch) < DISTINCT_SKETCH_SIZE:
+            return len(self.sketch)
+        return int((DISTINCT_SKETCH_SIZE - 1) / (float(self.sketch[-1]) / 2.0 ** 64))
+
+    def result(self):
+        """The profile as a profile_history row (without load id and table)"""
+        top = self.counters.nlargest(TOP_VALUES)
+        return {
+            "column_name": self.column,
+            "row_count": self.rows,
+            "null_count": self.nulls,
+            "null_rate": self.nulls / self.rows if self.rows else None,
+            "min_value": None if self.min is None else _text(pd.Series([self.min])).iloc[0],
+            "max_value": None if self.max is None else _text(pd.Series([self.max])).iloc[0],
+            "distinct_estimate": self.distinct_estimate(),
+            "top_values": [[value, int(count)] for value, count in top.items()],
+            "length_histogram": dict(zip(LENGTH_LABELS, self.lengths.tolist())),
+        }
+
+
+def profile_frames(frames):
+    """Profile an iterable of DataFrames (one pass); returns [profile row, ...]"""
+    profiles = None
+    for frame in frames:
+        if profiles is None:
+            profiles = [ColumnProfile(column) for column in frame.columns]
+        for profile in profiles:
+            profile.update(frame[profile.column])
+    return [profile.result() for profile in profiles or []]
+
+
+def _aggregate_sql(table, columns):
+    """
+    One query over table: COUNT(*), then per column COUNT, MIN, MAX and
+    the length histogram (one count per LENGTH_LABELS bucket)
+    """
+    items = ["COUNT(*)"]
+    for column in columns:
+        length = f"length({column}::text)"
+        items += [f"COUNT({column})", f"MIN({column})", f"MAX({column})"]
+        for low, high in zip([-1] + LENGTH_BOUNDS, LENGTH_BOUNDS):
+            items.append(f"COUNT(*) FILTER (WHERE {length} > {low} AND {length} <= {high})")
+        items.append(f"COUNT(*) FILTER (WHERE {length} > {LENGTH_BOUNDS[-1]})")
+    return f"SELECT {', '.join(items)} FROM {table}"
+
+
+def profile_table(conn, table, chunk_rows=PROFILE_CHUNK_ROWS, sample_rows=PROFILE_SAMPLE_ROWS):
+    """
+    Profile every column of table.
+
+    Counts, extremes and length histograms are aggregated by the server in
+    one scan; only about sample_rows rows (BERNOULLI, fixed seed) are sent
+    to the client for the distinct and top-value sketches.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+    columns = [column.name for column in cursor.description]
+    cursor.execute(_aggregate_sql(table, columns))
+    aggregates = list(cursor.fetchone())
+    rows = aggregates.pop(0)
+
+    percent = sample_percent(rows, sample_rows)
+    query = f"SELECT * FROM {table}"
+    if percent < 100:
+        query += f" TABLESAMPLE BERNOULLI ({percent}) REPEATABLE ({SAMPLE_SEED})"
+    profiles = [ColumnProfile(column) for column in columns]
+    sampled_rows = 0
+    for frame in db.stream_frames(conn, query, chunk_rows=chunk_rows):
+        sampled_rows += len(frame)
+        for profile in profiles:
+            profile.update(frame[profile.column])
+
+    width = 3 + len(LENGTH_LABELS)
+    for index, profile in enumerate(profiles):
+        present, low, high, *lengths = aggregates[index * width:(index + 1) * width]
+        distinct = None
+        if percent < 100:
+            distinct = estimated_distinct(cursor, table, profile.column, rows).value
+        profile.apply_totals(rows, present, low, high, lengths, sampled_rows, distinct)
+    cursor.close()
+    return [profile.result() for profile in profiles]
+
+
+def store_profiles(conn, load_id, table, profiles):
+    """Replace the profile_history rows of (load_id, table) with profiles"""
+    cursor = conn.cursor()
+    cursor.execute(PROFILE_HISTORY_DDL)
+    cursor.execute(
+        "DELETE FROM profile_history WHERE load_id = %s AND table_name = %s", (load_id, table)
+    )
+    execute_values(cursor, """
+        INSERT INTO profile_history (load_id, table_name, column_name, row_count, null_count,
+            null_rate, min_value, max_value, distinct_estimate, top_values, length_histogram)
+        VALUES %s
+    """, [
+        (load_id, table, p["column_name"], p["row_count"], p["null_count"], p["null_rate"],
+         p["min_value"], p["max_value"], p["distinct_estimate"],
+         Json(p["top_values"]), Json(p["length_histogram"]))
+        for p in profiles
+    ])
+    conn.commit()
+    cursor.close()
+
+
+def previous_load_id(cursor, load_id):
+    """The most recent load profiled before load_id (None if there is none)"""
+    cursor.execute("""
+        SELECT load_id FROM profile_history
+        GROUP BY load_id
+        HAVING MAX(profiled_at) < (SELECT MIN(profiled_at) FROM profile_history WHERE load_id = %s)
+        ORDER BY MAX(profiled_at) DESC
+        LIMIT 1
+    """, (load_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _stored_profiles(cursor, load_id):
+    cursor.execute("""
+        SELECT table_name, column_name, row_count, null_rate, distinct_estimate,
+               top_values, length_histogram
+        FROM profile_history WHERE load_id = %s
+    """, (load_id,))
+    return {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+
+
+def _variation_distance(a, b):
+    """Total variation distance of two {key: count} distributions"""
+    a_total, b_total = sum(a.values()) or 1, sum(b.values()) or 1
+    return 0.5 * sum(abs(a.get(k, 0) / a_total - b.get(k, 0) / b_total) for k in set(a) | set(b))
+
+
+def detect_drift(cursor, load_id, baseline_load_id=None):
+    """
+    Compare the stored profiles of load_id with a baseline load.
+
+    Args:
+        cursor: database cursor
+        load_id: load to check
+        baseline_load_id: load to compare with (default: the previous load)
+
+    Returns:
+        (baseline_load_id, [Drift, ...]); no baseline means nothing to compare
+    """
+    baseline_load_id = baseline_load_id or previous_load_id(cursor, load_id)
+    if baseline_load_id is None:
+        return None, []
+    baseline = _stored_profiles(cursor, baseline_load_id)
+    current = _stored_profiles(cursor, load_id)
+    tables = {table for table, _ in current}
+
+    drifts = []
+    for (table, column), (rows, null_rate, distinct, top, lengths) in sorted(current.items()):
+        if (table, column) not in baseline:
+            drifts.append(Drift(table, column, "COLUMN_ADDED", None, None))
+            continue
+        old_rows, old_null_rate, old_distinct, old_top, old_lengths = baseline[(table, column)]
+
+        if null_rate is not None and old_null_rate is not None \
+                and abs(null_rate - old_null_rate) > NULL_RATE_DRIFT:
+            drifts.append(Drift(table, column, "NULL_RATE", round(old_null_rate, 4), round(null_rate, 4)))
+
+        if rows and old_rows and distinct and old_distinct:
+            density, old_density = distinct / rows, old_distinct / old_rows
+            if max(density, old_density) / min(density, old_density) > DISTINCT_DRIFT_RATIO:
+                drifts.append(Drift(table, column, "DISTINCT", old_distinct, distinct))
+
+        top_distance = _variation_distance(dict(map(tuple, old_top or [])), dict(map(tuple, top or [])))
+        if top and old_top and top_distance > DISTRIBUTION_DRIFT:
+            drifts.append(Drift(table, column, "TOP_VALUES", old_top[:3], top[:3]))
+
+        if lengths and old_lengths and _variation_distance(old_lengths, lengths) > DISTRIBUTION_DRIFT:
+            drifts.append(Drift(table, column, "LENGTHS", old_lengths, lengths))
+
+    for table, column in sorted(set(baseline) - set(current)):
+        if table in tables:
+            drifts.append(Drift(table, column, "COLUMN_REMOVED", None, None))
+    return baseline_load_id, drifts
+
+
+def existing_tables(cursor, tables):
+    """The tables of the list that exist in the current schema"""
+    cursor.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = current_schema() AND table_name = ANY(%s)
+    """, (list(tables),))
+    found = {row[0] for row in cursor.fetchall()}
+    return [table for table in tables if table in found]
+
+
+def profile_tables(conn, load_id, tables=None):
+    """
+    Profile tables (default: every mart table present), store them under
+    load_id and compare with the previous load.
+
+    Returns:
+        ({table: [profile row, ...]}, baseline_load_id, [Drift, ...])
+    """
+    cursor = conn.cursor()
+    tables = existing_tables(cursor, tables or MART_TABLES)
+    profiles = {}
+    for table in tables:
+        profiles[table] = profile_table(conn, table)
+        store_profiles(conn, load_id, table, profiles[table])
+    baseline, drifts = detect_drift(cursor, load_id)
+    cursor.close()
+    return profiles, baseline, drifts
+
+
+def print_drift(baseline, drifts):
+    """Print the drift report of profile_tables / detect_drift"""
+    if baseline is None:
+        print("  (no earlier profile to compare with)")
+    elif not drifts:
+        print(f"  ✅ No drift since {baseline}")
+    else:
+        print(f"  ⚠️  {len(drifts)} drifted column statistics since {baseline}:")
+        for drift in drifts:
+            print(f"     {drift.table}.{drift.column:<28} {drift.check:<15} "
+                  f"{drift.baseline} -> {drift.current}")
+
+
+def main():
+    load_id = sys.argv[1] if len(sys.argv) > 1 else f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-profile"
+    conn = db.connect()
+    try:
+        profiles, baseline, drifts = profile_tables(conn, load_id, sys.argv[2:] or None)
+    finally:
+        conn.close()
+
+    print(f"[PROFILE] Load {load_id}\n")
+    for table, columns in profiles.items():
+        rows = columns[0]["row_count"] if columns else 0
+        print(f"  📊 {table} ({rows:,} rows)")
+        for p in columns:
+            null_rate = f"{p['null_rate']:.1%}" if p["null_rate"] is not None else "-"
+            print(f"     {p['column_name']:.<30} nulls {null_rate:>6}  distinct ≈{p['distinct_estimate']:,}  "
+                  f"[{p['min_value']} .. {p['max_value']}]")
+    print("\n[DRIFT]")
+    print_drift(baseline, drifts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Infer PostgreSQL column types from every row of a CSV file.
+
+Used by the loader to create typed tables (INT keys, NUMERIC amounts,
+DATE/TIMESTAMP dates, SMALLINT year/month) instead of VARCHAR everywhere.
+The file is read in chunks and each column keeps a small summary (still
+all integers? largest scale? longest value?), so a value late in the file
+widens the type instead of failing COPY or being rounded.
+"""
+
+import pandas as pd
+
+# Rows read per chunk while scanning a file
+DEFAULT_CHUNK_ROWS = 100000
+
+# VARCHAR widths used across the schema; a column gets the smallest bucket
+# that fits twice its longest value (headroom for rows loaded later)
+VARCHAR_BUCKETS = [10, 20, 50, 100, 255, 500]
+
+# Columns that are small calendar parts
+SMALLINT_COLUMNS = {"order_year", "order_month"}
+
+INTEGER_PATTERN = r"-?\d+"
+DECIMAL_PATTERN = r"-?\d+(\.\d+)?"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+TIMESTAMP_PATTERN = r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?"
+MIDNIGHT_PATTERN = r"\d{4}-\d{2}-\d{2}[ T]00:00(:00(\.0+)?)?"
+
+
+def update_summary(summary, values):
+    """
+    Fold a chunk of raw column values into the column's summary.
+
+    Args:
+        summary: dict returned for the previous chunks, or None
+        values: pandas Series of raw strings (NaN for missing values)
+
+    Returns:
+        the updated summary (None while every value seen is missing).
+        Patterns already ruled out by earlier chunks are not checked again.
+    """
+    values = values.dropna().astype(str).str.strip()
+    values = values[values != ""]
+    if values.empty:
+        return summary
+    if summary is None:
+        summary = {
+            "integer": True, "leading_zero": False, "max_abs": 0,
+            "decimal": True, "scale": 0, "integer_digits": 0,
+            "date": True, "datetime": True, "midnight": True,
+            "longest": 0,
+        }
+
+    if summary["integer"]:
+        summary["integer"] = bool(values.str.fullmatch(INTEGER_PATTERN).all())
+        if summary["integer"]:
+            summary["leading_zero"] |= bool(values.str.startswith("0").any())
+            summary["max_abs"] = max(summary["max_abs"], pd.to_numeric(values).abs().max())
+
+    if summary["decimal"]:
+        summary["decimal"] = bool(values.str.fullmatch(DECIMAL_PATTERN).all())
+        if summary["decimal"]:
+            parts = values.str.split(".", n=1, expand=True)
+            if parts.shape[1] > 1:
+                summary["scale"] = max(summary["scale"], int(parts[1].str.len().max()))
+            summary["integer_digits"] = max(
+                summary["integer_digits"], int(parts[0].str.lstrip("-").str.len().max())
+            )
+
+    if summary["date"]:
+        summary["date"] = bool(values.str.fullmatch(DATE_PATTERN).all())
+
+    if summary["datetime"]:
+        summary["datetime"] = bool(values.str.fullmatch(f"{DATE_PATTERN}|{TIMESTAMP_PATTERN}").all())
+        if summary["datetime"] and summary["midnight"]:
+            # Timestamps that are always midnight are really dates
+            timestamps = values[~values.str.fullmatch(DATE_PATTERN)]
+            summary["midnight"] = bool(timestamps.str.fullmatch(MIDNIGHT_PATTERN).all())
+
+    summary["longest"] = max(summary["longest"], int(values.str.len().max()))
+    return summary
+
+
+def summary_sql_type(column_name, summary):
+    """
+    The narrowest PostgreSQL type that fits every value folded into summary.
+
+    Returns:
+        SQL type string, e.g. "INT", "NUMERIC(12,2)", "DATE", "VARCHAR(50)"
+    """
+    if summary is None:
+        return "VARCHAR(500)"
+
+    # Identifiers stay text unless every value is a plain integer
+    is_identifier = column_name.endswith("_id")
+
+    if summary["integer"] and not (is_identifier and summary["leading_zero"]):
+        if column_name in SMALLINT_COLUMNS and summary["max_abs"] < 2**15:
+            return "SMALLINT"
+        if summary["max_abs"] < 2**31:
+            return "INT"
+        return "BIGINT"
+
+    if not is_identifier and summary["decimal"]:
+        scale = max(summary["scale"], 2)
+        precision = max(summary["integer_digits"] + scale + 2, 12)
+        return f"NUMERIC({precision},{scale})"
+
+    if summary["date"]:
+        return "DATE"
+
+    if summary["datetime"]:
+        return "DATE" if summary["midnight"] else "TIMESTAMP"
+
+    for width in VARCHAR_BUCKETS:
+        if summary["longest"] * 2 <= width:
+            return f"VARCHAR({width})"
+    return "TEXT"
+
+
+def infer_sql_type(column_name, values):
+    """Infer the narrowest PostgreSQL type that fits every value in a Series"""
+    return summary_sql_type(column_name, update_summary(None, values))
+
+
+def infer_csv_schema(csv_file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Return [(column_name, sql_type), ...] for csv_file in header order (reads every row)"""
+    columns = list(pd.read_csv(csv_file, nrows=0).columns)
+    summaries = dict.fromkeys(columns)
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_rows, dtype=str, keep_default_na=True):
+        for col in columns:
+            summaries[col] = update_summary(summaries[col], chunk[col])
+    return [(col, summary_sql_type(col, summaries[col])) for col in columns]
+
+
+def build_create_table_sql(table_name, schema, primary_key=None, partition_by=None):
+    """Render CREATE TABLE IF NOT EXISTS DDL for an inferred schema"""
+    col_defs = [f"{col} {sql_type}" for col, sql_type in schema]
+    if primary_key:
+        col_defs.append(f"PRIMARY KEY ({primary_key})")
+    ddl = f"CREATE TABLE IF NOT EXISTS {table_name} (\n    " + ",\n    ".join(col_defs) + "\n)"
+    if partition_by:
+        ddl += f" {partition_by}"
+    return ddl
@@ -0,0 +1,66 @@
+"""
+Fast date parsing for order exports.
+
+pd.to_datetime(format='mixed') guesses the format of every element, which
+is by far the slowest step of the dimension build. Order dates repeat
+heavily (a few hundred distinct days across millions of orders), so each
+distinct string is parsed once and the results are mapped back by code.
+Known fixed formats are tried first with vectorized parsing; only the
+strings none of them match fall back to mixed parsing.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Tried in order; the exports use both plain dates and midnight timestamps
+FIXED_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+)
+
+
+def parse_unique_dates(values, formats=FIXED_DATE_FORMATS):
+    """
+    Parse an array of distinct date strings.
+
+    Each fixed format is tried on the values still unparsed; leftovers go
+    through mixed parsing. Unparseable values become NaT.
+
+    Returns:
+        numpy datetime64[ns] array aligned with values
+    """
+    values = pd.Series(values, dtype=object).astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    pending = pd.Series(True, index=values.index)
+
+    for fmt in formats:
+        if not pending.any():
+            break
+        attempt = pd.to_datetime(values[pending], format=fmt, errors="coerce")
+        hits = attempt.notna()
+        parsed[hits[hits].index] = attempt[hits].astype("datetime64[ns]")
+        pending[hits[hits].index] = False
+
+    if pending.any():
+        leftovers = pd.to_datetime(values[pending], format="mixed", errors="coerce")
+        parsed[pending] = leftovers.astype("datetime64[ns]")
+
+    return parsed.to_numpy()
+
+
+def parse_dates(series, formats=FIXED_DATE_FORMATS):
+    """
+    Parse a column of date strings, parsing each distinct value only once.
+
+    Missing values and strings no format can parse become NaT, matching
+    pd.to_datetime(..., errors="coerce").
+
+    Returns:
+        datetime64[ns] Series with the same index as series
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = parse_unique_dates(uniques, formats)
+    # Code -1 (missing) picks the trailing NaT
+    lookup = np.append(parsed, np.datetime64("NaT", "ns"))
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
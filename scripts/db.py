@@ -0,0 +1,173 @@
+"""
+Shared PostgreSQL access for the GameZone scripts.
+
+Every script connects through this module, so connection settings live in
+one place (.env: DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD) and every
+session gets the same setup:
+
+    - TCP keepalives, so a long COPY or index build is not cut off by an
+      idle firewall and a dead server is noticed instead of hanging
+    - statement_timeout (DB_STATEMENT_TIMEOUT) so a runaway query fails
+      instead of holding locks forever
+    - application_name, so sessions are identifiable in pg_stat_activity
+
+get_pool() opens one thread-safe pool per process and hands the same pool
+to every caller. execute_prepared() PREPAREs a repeated statement once per
+connection and EXECUTEs it afterwards, skipping parse/plan on every call.
+stream_query() and stream_frames() read large results through a named
+(server-side) cursor, itersize rows per round trip, so the client never
+holds the whole result set.
+"""
+
+import itertools
+import os
+import sys
+import threading
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+
+load_dotenv()
+
+DB_HOST = os.getenv('DB_HOST', '127.0.0.1')
+DB_PORT = int(os.getenv('DB_PORT', 5432))
+DB_NAME = os.getenv('DB_NAME', 'gamezone_analytics')
+DB_USER = os.getenv('DB_USER', 'postgres')
+DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+
+# Per-statement limit (PostgreSQL interval syntax, "0" disables)
+DB_STATEMENT_TIMEOUT = os.getenv('DB_STATEMENT_TIMEOUT', '1h')
+
+KEEPALIVE_SETTINGS = dict(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
+
+# Rows fetched per round trip by server-side cursors
+DEFAULT_ITERSIZE = 10000
+
+_pool = None
+_pool_options = None
+_pool_lock = threading.Lock()
+_cursor_ids = itertools.count(1)
+
+
+class Connection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def connect_params(database=None, options=None):
+    """
+    Keyword arguments for psycopg2.connect / the pool.
+
+    Args:
+        database: database name (default DB_NAME)
+        options: extra libpq options, e.g. staged_load.staging_connect_options()
+    """
+    session_options = [f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"]
+    if options:
+        session_options.append(options)
+    return dict(
+        host=DB_HOST,
+        port=DB_PORT,
+        database=database or DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        options=" ".join(session_options),
+        application_name=f"gamezone:{os.path.basename(sys.argv[0]) or 'python'}",
+        connection_factory=Connection,
+        **KEEPALIVE_SETTINGS,
+    )
+
+
+def connect(database=None, options=None, autocommit=False):
+    """Open a single connection with the shared session settings"""
+    conn = psycopg2.connect(**connect_params(database, options))
+    conn.autocommit = autocommit
+    return conn
+
+
+def get_pool(size, options=None):
+    """
+    The process-wide connection pool, opened on first use.
+
+    Later calls return the same pool (its size is fixed by the first call);
+    asking for different session options is an error.
+    """
+    global _pool, _pool_options
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(1, size, **connect_params(options=options))
+            _pool_options = options
+        elif options != _pool_options:
+            raise ValueError(f"Connection pool already open with options {_pool_options!r}")
+        return _pool
+
+
+def close_pool():
+    """Close every pooled connection (the next get_pool() opens a new pool)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+def execute_prepared(cursor, name, query, params=()):
+    """
+    Run query as the server-side prepared statement name.
+
+    query uses $1, $2, ... placeholders. It is PREPAREd the first time the
+    connection runs it; later calls only send EXECUTE with the parameters.
+    """
+    conn = cursor.connection
+    prepared = getattr(conn, "prepared", None)
+    if prepared is None or name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {query}")
+        if prepared is not None:
+            prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cursor.execute(f"EXECUTE {name}" + (f" ({placeholders})" if params else ""), tuple(params))
+
+
+def stream_query(conn, query, params=None, itersize=DEFAULT_ITERSIZE):
+    """
+    Yield the rows of query through a named server-side cursor.
+
+    Only itersize rows are held by the client at a time. In autocommit mode
+    the cursor is declared WITH HOLD so it survives outside a transaction.
+    """
+    cursor = conn.cursor(name=f"gamezone_stream_{next(_cursor_ids)}", withhold=conn.autocommit)
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def stream_frames(conn, query, params=None, chunk_rows=DEFAULT_ITERSIZE, yield_empty=False):
+    """
+    Yield the result of query as DataFrames of at most chunk_rows rows (server-side cursor).
+
+    With yield_empty, an empty result still yields one empty frame carrying
+    the column names.
+    """
+    cursor = conn.cursor(name=f"gamezone_stream_{next(_cursor_ids)}", withhold=conn.autocommit)
+    try:
+        cursor.execute(query, params)
+        fetched = 0
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows and (fetched or not yield_empty):
+                break
+            fetched += len(rows)
+            yield pd.DataFrame(rows, columns=[column.name for column in cursor.description])
+            if not rows:
+                break
+    finally:
+        cursor.close()
@@ -0,0 +1,174 @@
+"""
+Parallel, single-scan extraction of the GameZone dimension members.
+
+The dimensions only need the distinct members of a few columns, but
+deriving them from one big frame costs a full pass per dimension on one
+core. Here the input is split into line-aligned byte ranges; a process
+pool parses each range once (only the dimension columns) and returns the
+distinct members of every dimension. The partial sets are concatenated in
+file order and de-duplicated again, so members come out in order of first
+appearance, exactly as a sequential build would number them.
+
+A quoted field may contain newlines, so a line-aligned boundary can fall
+inside a field. Each task also counts the quote characters of its range:
+a boundary is a real record start only if the number of quotes before it
+is even ("" escapes count twice). Ranges next to a boundary inside a
+quoted field are merged and parsed again as one range; every other range
+keeps its parallel result, so quotes cost nothing on files without them.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from bulk_copy import ByteRangeReader, split_byte_ranges
+from date_parsing import parse_dates
+from surrogate_keys import DIMENSION_KEYS
+
+# Byte range parsed by one task (several per worker so the pool stays busy)
+DEFAULT_PARTITION_BYTES = 64 << 20
+
+# Block read while counting the quotes of a range
+QUOTE_SCAN_BYTES = 1 << 24
+
+# Dimension columns are read as text so natural keys compare equal across builds
+TEXT_COLUMNS = {col: str for _, _, column_map in DIMENSION_KEYS for col in column_map}
+
+DATE_COLUMNS = ["order_date", "order_year", "order_month", "order_month_name", "order_year_month"]
+CUSTOMER_COLUMNS = ["customer_id", "country_code", "account_creation_method"]
+
+
+def date_key_of(order_date):
+    """YYYYMMDD integer key computed arithmetically (no per-row string formatting)"""
+    return (order_date.dt.year * 10000 + order_date.dt.month * 100 + order_date.dt.day).astype("int64")
+
+
+def distinct_members(df):
+    """
+    Distinct members of every dimension present in df, in order of first appearance.
+
+    df must already have order_date parsed and rows without a date dropped.
+
+    Returns:
+        {table: DataFrame} with the order column names (dim_date has date_key
+        plus DATE_COLUMNS, dim_customer has CUSTOMER_COLUMNS)
+    """
+    members = {
+        "dim_date": df[DATE_COLUMNS].assign(date_key=date_key_of(df["order_date"]))
+        .drop_duplicates(subset=["date_key"])
+    }
+    for table, _, column_map in DIMENSION_KEYS:
+        columns = list(column_map)
+        if not all(c in df.columns for c in columns):
+            continue
+        if table == "dim_customer":
+            # Attributes from the customer's first order
+            columns = [c for c in CUSTOMER_COLUMNS if c in df.columns]
+            members[table] = df[columns].drop_duplicates(subset=["customer_id"])
+        else:
+            members[table] = df[columns].drop_duplicates()
+    return members
+
+
+def merge_members(partials):
+    """Combine per-range distinct sets (in file order) into one per dimension"""
+    merged = {}
+    for table in partials[0]:
+        frames = [partial[table] for partial in partials]
+        subset = {"dim_date": ["date_key"], "dim_customer": ["customer_id"]}.get(table)
+        merged[table] = pd.concat(frames, ignore_index=True).drop_duplicates(subset=subset)
+    return merged
+
+
+def count_quotes(f, start, end, block_size=QUOTE_SCAN_BYTES):
+    """Number of quote characters in bytes [start, end) of an open binary file"""
+    f.seek(start)
+    quotes = 0
+    remaining = end - start
+    while remaining > 0:
+        block = f.read(min(block_size, remaining))
+        if not block:
+            break
+        quotes += block.count(b'"')
+        remaining -= len(block)
+    return quotes
+
+
+def _parse_range(input_file, columns, start, end, chunk_rows):
+    """Distinct dimension members of one byte range (None if it has no rows)"""
+    usecols = [c for c in columns if c in TEXT_COLUMNS or c in DATE_COLUMNS]
+    partials = []
+    with open(input_file, "rb") as f:
+        chunks = pd.read_csv(
+            ByteRangeReader(f, start, end), header=None, names=columns,
+            usecols=usecols, dtype=TEXT_COLUMNS, chunksize=chunk_rows
+        )
+        for chunk in chunks:
+            chunk["order_date"] = parse_dates(chunk["order_date"])
+            partials.append(distinct_members(chunk.dropna(subset=["order_date"])))
+    return merge_members(partials) if partials else None
+
+
+def _extract_range(job):
+    """
+    Worker: (quotes in the range, distinct members or None, parsed).
+
+    A range may start or end inside a quoted field (or lie entirely in
+    one); if it does not parse, parsed is False and the caller parses it
+    again merged with its neighbours, where real errors surface.
+    """
+    input_file, columns, start, end, chunk_rows = job
+    with open(input_file, "rb") as f:
+        quotes = count_quotes(f, start, end)
+    try:
+        return quotes, _parse_range(input_file, columns, start, end, chunk_rows), True
+    except ValueError:
+        return quotes, None, False
+
+
+def extract_dimensions(input_file, workers, start=None, end=None,
+                       partition_bytes=DEFAULT_PARTITION_BYTES, chunk_rows=1000000):
+    """
+    Distinct members of every dimension in input_file, from one parallel scan.
+
+    Args:
+        input_file: cleaned orders CSV with a header row
+        workers: number of processes
+        start, end: line-aligned byte offsets to restrict the scan (e.g. the
+            rows appended since the last incremental build)
+        partition_bytes: approximate size of the byte range per task
+        chunk_rows: rows parsed at a time inside a task (bounds worker memory)
+
+    Returns:
+        {table: DataFrame} as distinct_members(), or {} if there are no rows
+    """
+    span = (os.path.getsize(input_file) if end is None else end) - (start or 0)
+    parts = max(workers, -(-span // partition_bytes))
+    columns, ranges = split_byte_ranges(input_file, parts, start=start, end=end)
+    jobs = [(input_file, columns, range_start, range_end, chunk_rows) for range_start, range_end in ranges]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_range, jobs))
+    else:
+        results = [_extract_range(job) for job in jobs]
+
+    # Group the ranges between boundaries that lie outside quoted fields
+    partials = []
+    quotes_before = 0
+    group_start = 0
+    for index, (quotes, members, parsed) in enumerate(results):
+        quotes_before += quotes
+        if quotes_before % 2 and index < len(results) - 1:
+            continue
+        if group_start == index and parsed:
+            partials.append(members)
+        else:
+            partials.append(_parse_range(
+                input_file, columns, ranges[group_start][0], ranges[index][1], chunk_rows
+            ))
+        group_start = index + 1
+
+    partials = [partial for partial in partials if partial is not None]
+    return merge_members(partials) if partials else {}
@@ -0,0 +1,196 @@
+"""
+Monthly range partitioning of fact_orders on date_key.
+
+fact_orders is created as a declaratively partitioned table with one
+partition per order month (date_key ranges such as [20201201, 20210101))
+plus a default partition for NULL or unexpected keys. PostgreSQL routes
+COPY rows into the right partition, prunes partitions for year/month
+filters, and lets old months be detached or a single month be reloaded
+without touching the rest of the table.
+
+Usage:
+    python fact_partitions.py list
+    python fact_partitions.py detach 2020-01
+    python fact_partitions.py detach-before 2021-01
+"""
+
+import sys
+
+import pandas as pd
+
+import db
+
+FACT_TABLE = "fact_orders"
+
+# Clause appended to CREATE TABLE fact_orders (...)
+PARTITION_CLAUSE = "PARTITION BY RANGE (date_key)"
+
+
+def partition_name(year_month, table=FACT_TABLE):
+    """'2020-12' -> 'fact_orders_y2020m12'"""
+    year, month = (int(part) for part in year_month.split("-"))
+    return f"{table}_y{year:04d}m{month:02d}"
+
+
+def month_bounds(year_month):
+    """'2020-12' -> (20201201, 20210101): inclusive/exclusive date_key range"""
+    year, month = (int(part) for part in year_month.split("-"))
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return year * 10000 + month * 100 + 1, next_year * 10000 + next_month * 100 + 1
+
+
+def months_in_csv(csv_file, key_column="date_key", chunk_rows=500000):
+    """Distinct 'YYYY-MM' months present in a CSV's date_key column (streamed)"""
+    months = set()
+    for chunk in pd.read_csv(csv_file, usecols=[key_column], chunksize=chunk_rows):
+        keys = pd.to_numeric(chunk[key_column], errors="coerce").dropna().astype("int64")
+        months.update((keys // 100).unique().tolist())
+    return sorted(f"{ym // 100:04d}-{ym % 100:02d}" for ym in months)
+
+
+def is_partitioned(conn, table=FACT_TABLE):
+    """True if table (resolved through search_path) is a partitioned table"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row is not None and row[0] == "p"
+
+
+def ensure_month_partitions(conn, months, table=FACT_TABLE):
+    """
+    Create missing monthly partitions (and the default partition).
+
+    Existing partitions are looked up among the children of table itself
+    (pg_inherits), not by name through search_path: during a staged load
+    public.fact_orders_y2020m12 must not stand in for the staging one. New
+    partitions are created in table's schema.
+
+    Returns the list of partitions created.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT n.nspname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.oid = to_regclass(%s)
+    """, (table,))
+    schema = cursor.fetchone()[0]
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {schema}.{table.split('.')[-1]}_default PARTITION OF {table} DEFAULT"
+    )
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+    existing = {row[0] for row in cursor.fetchall()}
+    created = []
+    for year_month in months:
+        name = partition_name(year_month, table.split(".")[-1])
+        if name in existing:
+            continue
+        start, end = month_bounds(year_month)
+        cursor.execute(
+            f"CREATE TABLE {schema}.{name} PARTITION OF {table} FOR VALUES FROM ({start}) TO ({end})"
+        )
+        created.append(name)
+    cursor.close()
+    conn.commit()
+    return created
+
+
+def list_partitions(conn, table=FACT_TABLE):
+    """[(partition_name, bound_expression, approx_rows), ...] ordered by name"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (table,))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def detach_month(conn, year_month, table=FACT_TABLE):
+    """
+    Detach one month from fact_orders; the partition stays as a plain table
+    (archive it or DROP it separately).
+    """
+    name = partition_name(year_month, table)
+    cursor = conn.cursor()
+    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    cursor.close()
+    conn.commit()
+    return name
+
+
+def detach_months_before(conn, year_month, table=FACT_TABLE):
+    """Detach every monthly partition older than year_month"""
+    cutoff = partition_name(year_month, table)
+    detached = []
+    for name, _, _ in list_partitions(conn, table):
+        if name != f"{table}_default" and name < cutoff:
+            cursor = conn.cursor()
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.close()
+            detached.append(name)
+    conn.commit()
+    return detached
+
+
+def reload_month(conn, year_month, csv_file, copy_func, table=FACT_TABLE, **copy_kwargs):
+    """
+    Replace a single month: TRUNCATE its partition and COPY that month's rows
+    straight into it. Other partitions are not read, locked or rewritten.
+
+    copy_func is bulk_copy.copy_csv_to_table (passed in to keep this module
+    free of loader settings). The TRUNCATE and COPY are not committed here:
+    the caller commits them together with whatever depends on the month
+    (e.g. its rollup rows). Returns (rows_loaded, elapsed_seconds).
+    """
+    name = partition_name(year_month, table)
+    start, end = month_bounds(year_month)
+    ensure_month_partitions(conn, [year_month], table)
+
+    def in_month(value):
+        try:
+            return start <= int(float(value)) < end
+        except ValueError:
+            return False
+
+    cursor = conn.cursor()
+    cursor.execute(f"TRUNCATE TABLE {name}")
+    cursor.close()
+    result = copy_func(
+        conn, csv_file, name,
+        row_filter=("date_key", in_month),
+        **copy_kwargs
+    )
+    return result
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("list", "detach", "detach-before"):
+        print(__doc__)
+        sys.exit(1)
+
+    conn = db.connect()
+    command = sys.argv[1]
+    if command == "list":
+        for name, bound, rows in list_partitions(conn):
+            print(f"  {name:.<32} {max(rows, 0):>10,} rows  {bound}")
+    elif command == "detach":
+        print(f"✅ Detached {detach_month(conn, sys.argv[2])}")
+    else:
+        for name in detach_months_before(conn, sys.argv[2]):
+            print(f"✅ Detached {name}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
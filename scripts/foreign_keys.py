@@ -0,0 +1,96 @@
+"""
+Foreign keys from fact_orders to the star-schema dimensions.
+
+Constraints are dropped before a reload (a dimension TRUNCATE would
+otherwise cascade into fact_orders, and COPY would fire one referential
+check per row), declared NOT VALID once the data is in place (a catalog
+change, no scan) and then VALIDATEd: one anti-join per constraint over the
+loaded rows, holding only a SHARE UPDATE EXCLUSIVE lock so readers and
+writers are not blocked. A validated constraint is the integrity check, and
+the planner uses it for join row estimates.
+
+Fact key columns get the type of the dimension primary key they reference
+(INT), so the joins compare like types and can use the key indexes.
+"""
+
+from fact_partitions import is_partitioned
+from surrogate_keys import DIMENSION_KEYS
+
+# Type of every dimension primary key (see setup_01 CREATE TABLE statements)
+KEY_TYPE = "INT"
+
+# (constraint name, fact column, dimension table, dimension column)
+FACT_FOREIGN_KEYS = [("fk_fact_date", "date_key", "dim_date", "date_key")] + [
+    (f"fk_fact_{key_column[:-len('_key')]}", key_column, table, key_column)
+    for table, key_column, _ in DIMENSION_KEYS
+]
+
+
+def align_key_types(schema, foreign_keys=FACT_FOREIGN_KEYS):
+    """Inferred [(column, sql_type), ...] with every foreign key column typed KEY_TYPE"""
+    key_columns = {column for _, column, _, _ in foreign_keys}
+    return [(column, KEY_TYPE if column in key_columns else sql_type) for column, sql_type in schema]
+
+
+def drop_foreign_keys(conn, table="fact_orders", foreign_keys=FACT_FOREIGN_KEYS):
+    """Drop the managed constraints before a reload; returns their names"""
+    cursor = conn.cursor()
+    for name, _, _, _ in foreign_keys:
+        cursor.execute(f"ALTER TABLE IF EXISTS {table} DROP CONSTRAINT IF EXISTS {name}")
+    conn.commit()
+    cursor.close()
+    return [name for name, _, _, _ in foreign_keys]
+
+
+def add_foreign_keys(conn, table="fact_orders", foreign_keys=FACT_FOREIGN_KEYS):
+    """
+    Declare the constraints NOT VALID (existing rows are not checked yet).
+
+    PostgreSQL does not accept NOT VALID foreign keys on a partitioned table,
+    so there they are added validated (one check per constraint here
+    instead of in validate_foreign_keys). Returns the declared names.
+    """
+    not_valid = "" if is_partitioned(conn, table) else " NOT VALID"
+    cursor = conn.cursor()
+    for name, column, dim_table, dim_column in foreign_keys:
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+            f"FOREIGN KEY ({column}) REFERENCES {dim_table} ({dim_column}){not_valid}"
+        )
+    conn.commit()
+    cursor.close()
+    return [name for name, _, _, _ in foreign_keys]
+
+
+def validate_foreign_keys(conn, table="fact_orders", foreign_keys=FACT_FOREIGN_KEYS):
+    """
+    VALIDATE every constraint still marked NOT VALID.
+
+    A constraint that fails stays NOT VALID (new rows are still checked)
+    and is reported with the error.
+
+    Returns:
+        (validated_names, {name: error})
+    """
+    cursor = conn.cursor()
+    validated, failed = [], {}
+    for name, _, _, _ in foreign_keys:
+        cursor.execute(
+            "SELECT convalidated FROM pg_constraint WHERE conrelid = to_regclass(%s) AND conname = %s",
+            (table, name),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            failed[name] = "constraint not declared"
+            continue
+        try:
+            if not row[0]:
+                cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+            conn.commit()
+            validated.append(name)
+        except Exception as e:
+            conn.rollback()
+            failed[name] = e
+    cursor.close()
+    return validated, failed
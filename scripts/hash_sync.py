@@ -0,0 +1,132 @@
+"""
+Hash-diff synchronisation of a table with its source file.
+
+Instead of deleting every row and loading the file again, the file is
+COPYed into a temporary table and compared with the live table row by row
+on a content hash (md5 of the row's text form), keyed on a unique column.
+Only the differences are applied, with one set-based statement each:
+
+    UPDATE  rows whose key exists on both sides but whose hash differs
+    INSERT  rows whose key is only in the file
+    DELETE  rows whose key is no longer in the file
+
+A refresh where 1% of the orders changed therefore rewrites about 1% of
+the table, leaves about 1% dead tuples for autovacuum, and keeps the
+indexes in place.
+
+INSERT ... ON CONFLICT is not used because a unique constraint on order_id
+is impossible on the date_key-partitioned fact_orders; the anti-join insert
+works on both layouts, and an UPDATE that changes date_key moves the row to
+its new partition.
+"""
+
+from parquet_io import copy_table
+
+
+def _row_hash(alias, columns):
+    return f"md5(ROW({', '.join(f'{alias}.{c}' for c in columns)})::text)"
+
+
+def sync_table(conn, path, table, key_column, columns, touched=None, **copy_kwargs):
+    """
+    Make table match the CSV/Parquet file at path, touching only changed rows.
+
+    Runs inside the caller's transaction (nothing is committed here).
+
+    Args:
+        conn: open psycopg2 connection
+        path: source file (CSV or Parquet, see parquet_io.copy_table)
+        table: live table to synchronise
+        key_column: column that identifies a row (must be unique in the file)
+        columns: columns to load and compare
+        touched: optional SQL expression over a row (e.g. "date_key / 100");
+            its distinct values over every written or deleted row, before
+            and after the change, are returned as "touched"
+        copy_kwargs: passed to copy_table (batch_size, stats, ...)
+
+    Returns:
+        {"incoming", "inserted", "updated", "deleted", "unchanged"} row counts
+        (plus "touched" when requested)
+    """
+    incoming = f"{table}_incoming"
+    changes = f"{table}_changes"
+    col_list = ", ".join(columns)
+    cursor = conn.cursor()
+
+    # Same column types as the live table, so both sides hash identically
+    cursor.execute(f"DROP TABLE IF EXISTS {incoming}")
+    cursor.execute(f"CREATE TEMP TABLE {incoming} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    loaded, _ = copy_table(conn, path, incoming, columns=columns, **copy_kwargs)
+    # Temp tables are never auto-analyzed; the joins below need row estimates
+    cursor.execute(f"ANALYZE {incoming}")
+
+    cursor.execute(f"""
+        SELECT {key_column} FROM {incoming}
+        GROUP BY {key_column} HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    duplicate = cursor.fetchone()
+    if duplicate:
+        cursor.close()
+        raise ValueError(f"{path}: {key_column} {duplicate[0]!r} appears more than once")
+
+    # Keys whose row is new or differs; unchanged rows are never written
+    cursor.execute(f"DROP TABLE IF EXISTS {changes}")
+    cursor.execute(f"""
+        CREATE TEMP TABLE {changes} ON COMMIT DROP AS
+        SELECT s.{key_column}, t.{key_column} IS NULL AS is_new
+        FROM {incoming} s
+        LEFT JOIN {table} t ON t.{key_column} = s.{key_column}
+        WHERE t.{key_column} IS NULL
+           OR {_row_hash('t', columns)} <> {_row_hash('s', columns)}
+    """)
+    cursor.execute(f"ANALYZE {changes}")
+
+    touched_values = set()
+    if touched:
+        # Old values of the rows about to change, and the values they change to
+        cursor.execute(f"""
+            SELECT DISTINCT {touched} FROM {table}
+            WHERE {key_column} IN (SELECT {key_column} FROM {changes} WHERE NOT is_new)
+            UNION
+            SELECT DISTINCT {touched} FROM {incoming}
+            WHERE {key_column} IN (SELECT {key_column} FROM {changes})
+        """)
+        touched_values.update(row[0] for row in cursor.fetchall())
+
+    assignments = ", ".join(f"{c} = s.{c}" for c in columns if c != key_column)
+    cursor.execute(f"""
+        UPDATE {table} t SET {assignments}
+        FROM {incoming} s
+        JOIN {changes} c ON c.{key_column} = s.{key_column} AND NOT c.is_new
+        WHERE t.{key_column} = s.{key_column}
+    """)
+    updated = cursor.rowcount
+
+    cursor.execute(f"""
+        INSERT INTO {table} ({col_list})
+        SELECT {', '.join(f's.{c}' for c in columns)}
+        FROM {incoming} s
+        JOIN {changes} c ON c.{key_column} = s.{key_column} AND c.is_new
+    """)
+    inserted = cursor.rowcount
+
+    cursor.execute(f"""
+        DELETE FROM {table} t
+        WHERE NOT EXISTS (SELECT 1 FROM {incoming} s WHERE s.{key_column} = t.{key_column})
+        {f"RETURNING {touched}" if touched else ""}
+    """)
+    deleted = cursor.rowcount
+    if touched:
+        touched_values.update(row[0] for row in cursor.fetchall())
+    cursor.close()
+
+    result = {
+        "incoming": loaded,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "unchanged": loaded - inserted - updated,
+    }
+    if touched:
+        result["touched"] = sorted(value for value in touched_values if value is not None)
+    return result
@@ -0,0 +1,165 @@
+"""
+Post-load index phase for the GameZone star schema.
+
+Secondary indexes are dropped before a bulk reload (so COPY does not pay
+for index maintenance row by row), rebuilt in parallel over a connection
+pool once the data is in place, and followed by ANALYZE so the planner
+sees fresh statistics.
+
+The index set mirrors the access paths in
+documentation/analytics_queries_*.sql: single-column lookup keys, composite
+indexes for the common GROUP BY / WHERE combinations, and a small BRIN index
+on order_date for date range scans.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Session memory for index builds (larger sorts build faster)
+DEFAULT_MAINTENANCE_WORK_MEM = "256MB"
+
+# Secondary indexes managed by the loader: table -> [(index_name, definition), ...]
+SECONDARY_INDEXES = {
+    "fact_orders": [
+        # Key lookups and dimension joins
+        ("idx_fact_customer", "(customer_id)"),
+        ("idx_fact_product", "(product_id)"),
+        ("idx_fact_order", "(order_id)"),
+        ("idx_fact_date", "(date_key)"),
+        # Monthly trends and new vs repeat split by country
+        ("idx_fact_month_country", "(order_year_month, country_code)"),
+        # YoY revenue by country
+        ("idx_fact_year_country", "(order_year, country_code)"),
+        # Latest vs previous year product ranking
+        ("idx_fact_year_product", "(order_year, product_id)"),
+        # First purchase per customer (new vs repeat customers)
+        ("idx_fact_customer_date", "(customer_id, order_date)"),
+        # Channel effectiveness by platform
+        ("idx_fact_platform_channel", "(purchase_platform, marketing_channel)"),
+        # Date range scans. BRIN stays tiny but only prunes well where rows are
+        # physically clustered by date; the loaders do not guarantee load order
+        ("idx_fact_order_date_brin", "USING brin (order_date)"),
+    ],
+}
+
+# Same access paths for the star schema built by setup_02/setup_01, where
+# fact_orders carries integer surrogate keys instead of dimension strings
+SURROGATE_KEY_INDEXES = {
+    "fact_orders": [
+        ("idx_fact_customer", "(customer_key)"),
+        ("idx_fact_product", "(product_key)"),
+        ("idx_fact_order", "(order_id)"),
+        ("idx_fact_date", "(date_key)"),
+        ("idx_fact_month_country", "(order_year_month, country_key)"),
+        ("idx_fact_year_country", "(order_year, country_key)"),
+        ("idx_fact_year_product", "(order_year, product_key)"),
+        ("idx_fact_customer_date", "(customer_key, order_date)"),
+        ("idx_fact_platform_channel", "(platform_key, channel_key)"),
+        ("idx_fact_order_date_brin", "USING brin (order_date)"),
+        # Every foreign key column leads an index (dimension deletes and
+        # key lookups do not scan fact_orders)
+        ("idx_fact_channel", "(channel_key)"),
+        ("idx_fact_country", "(country_key)"),
+        ("idx_fact_account_creation", "(account_creation_key)"),
+    ],
+}
+
+
+def drop_secondary_indexes(conn, tables=None, indexes=SECONDARY_INDEXES):
+    """
+    Drop the managed secondary indexes before a bulk reload.
+
+    Primary keys and other constraint-backed indexes are left alone.
+    Returns the list of dropped index names.
+    """
+    tables = tables or list(indexes)
+    cursor = conn.cursor()
+    dropped = []
+    for table in tables:
+        for index_name, _ in indexes.get(table, []):
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+            dropped.append(index_name)
+    conn.commit()
+    cursor.close()
+    return dropped
+
+
+def _build_index(pool, table, index_name, definition, online, maintenance_work_mem):
+    """Build one index on its own pooled connection"""
+    conn = pool.getconn()
+    previous_autocommit = conn.autocommit
+    try:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+        try:
+            # CONCURRENTLY is not supported on partitioned tables
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+            row = cursor.fetchone()
+            if row is not None and row[0] == "p":
+                online = False
+            concurrently = "CONCURRENTLY " if online else ""
+            cursor.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {index_name} ON {table} {definition}"
+            )
+        finally:
+            # The connection goes back to the pool; do not leave the larger setting on it
+            cursor.execute("RESET maintenance_work_mem")
+            cursor.close()
+    finally:
+        conn.autocommit = previous_autocommit
+        pool.putconn(conn)
+
+
+def build_secondary_indexes(pool, tables=None, workers=4, online=False,
+                            maintenance_work_mem=DEFAULT_MAINTENANCE_WORK_MEM,
+                            indexes=SECONDARY_INDEXES):
+    """
+    Build the managed secondary indexes in parallel.
+
+    Plain CREATE INDEX takes a SHARE lock, which blocks writers but not
+    readers, and several builds on the same table can run at once. With
+    online=True, CREATE INDEX CONCURRENTLY is used instead: writers are not
+    blocked, but builds on the same table are serialised by PostgreSQL.
+    Partitioned tables always get plain builds (the index cascades to
+    every partition). indexes selects the index set (SECONDARY_INDEXES or
+    SURROGATE_KEY_INDEXES).
+
+    Returns:
+        (built_index_names, {index_name: error})
+    """
+    tables = tables or list(indexes)
+    jobs = [
+        (table, index_name, definition)
+        for table in tables
+        for index_name, definition in indexes.get(table, [])
+    ]
+
+    built, failed = [], {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _build_index, pool, table, index_name, definition, online, maintenance_work_mem
+            ): index_name
+            for table, index_name, definition in jobs
+        }
+        for future, index_name in futures.items():
+            try:
+                future.result()
+                built.append(index_name)
+            except Exception as e:
+                failed[index_name] = e
+    return built, failed
+
+
+def analyze_tables(conn, tables):
+    """Refresh planner statistics after a load"""
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        for table in tables:
+            cursor.execute(f"ANALYZE {table}")
+    finally:
+        cursor.close()
+        conn.autocommit = previous_autocommit
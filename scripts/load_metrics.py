@@ -0,0 +1,157 @@
+"""
+Structured per-stage load metrics.
+
+Every stage of a run (read, transform, truncate, insert, commit, index,
+validate, ...) is appended to an NDJSON file as one JSON object with the
+run id, script, stage, table, rows, bytes, duration and rows/sec. Runs can
+then be compared to spot where time goes and catch throughput regressions.
+
+Usage:
+    python load_metrics.py list [metrics_file]
+    python load_metrics.py compare [run_a run_b] [--file metrics_file]
+
+compare defaults to the two most recent runs.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_METRICS_FILE = "load_metrics.ndjson"
+
+
+class LoadMetrics:
+    """Collects stage records for one run and appends them to an NDJSON file"""
+
+    def __init__(self, script, path=None):
+        self.script = script
+        self.path = path or os.getenv("LOAD_METRICS_FILE", DEFAULT_METRICS_FILE)
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{script}"
+        self._lock = threading.Lock()
+
+    def record(self, stage, table=None, rows=None, nbytes=None, duration=0.0, **extra):
+        """Append one stage record"""
+        entry = {
+            "run_id": self.run_id,
+            "script": self.script,
+            "stage": stage,
+            "table": table,
+            "rows": rows,
+            "bytes": nbytes,
+            "duration_s": round(duration, 6),
+            "rows_per_s": round(rows / duration, 1) if rows and duration > 0 else None,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        entry.update(extra)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+    @contextmanager
+    def stage(self, stage, table=None, rows=None, nbytes=None):
+        """
+        Time a block and record it; the yielded dict can be updated with
+        rows/nbytes discovered inside the block.
+        """
+        info = {"rows": rows, "nbytes": nbytes}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(stage, table, duration=time.perf_counter() - start, **info)
+
+
+def load_runs(path=DEFAULT_METRICS_FILE):
+    """{run_id: [records...]} in file order"""
+    runs = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                runs.setdefault(entry["run_id"], []).append(entry)
+    return runs
+
+
+def summarise_run(records):
+    """{(stage, table): {"rows", "bytes", "duration_s"}} summed per stage/table"""
+    summary = {}
+    for entry in records:
+        key = (entry["stage"], entry.get("table") or "-")
+        totals = summary.setdefault(key, {"rows": 0, "bytes": 0, "duration_s": 0.0})
+        totals["rows"] += entry.get("rows") or 0
+        totals["bytes"] += entry.get("bytes") or 0
+        totals["duration_s"] += entry.get("duration_s") or 0.0
+    return summary
+
+
+def compare_runs(records_a, records_b):
+    """
+    Diff two runs stage by stage.
+
+    Returns [(stage, table, duration_a, duration_b, pct_change, rate_a, rate_b), ...]
+    where pct_change is the duration change from run a to run b.
+    """
+    summary_a, summary_b = summarise_run(records_a), summarise_run(records_b)
+    rows = []
+    for key in sorted(set(summary_a) | set(summary_b)):
+        a, b = summary_a.get(key), summary_b.get(key)
+        duration_a = a["duration_s"] if a else None
+        duration_b = b["duration_s"] if b else None
+        pct = None
+        if duration_a and duration_b is not None:
+            pct = (duration_b - duration_a) / duration_a * 100
+        rate_a = a["rows"] / a["duration_s"] if a and a["rows"] and a["duration_s"] else None
+        rate_b = b["rows"] / b["duration_s"] if b and b["rows"] and b["duration_s"] else None
+        rows.append((key[0], key[1], duration_a, duration_b, pct, rate_a, rate_b))
+    return rows
+
+
+def _fmt(value, spec, width):
+    return ("-" if value is None else format(value, spec)).rjust(width)
+
+
+def main():
+    args = sys.argv[1:]
+    path = DEFAULT_METRICS_FILE
+    if "--file" in args:
+        i = args.index("--file")
+        path = args[i + 1]
+        del args[i:i + 2]
+
+    if not args or args[0] not in ("list", "compare"):
+        print(__doc__)
+        sys.exit(1)
+
+    if args[0] == "list":
+        path = args[1] if len(args) > 1 else path
+        for run_id, records in load_runs(path).items():
+            total = sum(entry.get("duration_s") or 0 for entry in records)
+            print(f"  {run_id:<40} {len(records):>4} stages  {total:>10.2f}s")
+        return
+
+    runs = load_runs(path)
+    if len(args) >= 3:
+        run_a, run_b = args[1], args[2]
+    else:
+        if len(runs) < 2:
+            print("❌ Need at least two runs to compare")
+            sys.exit(1)
+        run_a, run_b = list(runs)[-2:]
+
+    print(f"[COMPARE] {run_a} → {run_b}\n")
+    print(f"  {'stage':<12} {'table':<24} {'before s':>10} {'after s':>10} {'change':>8} "
+          f"{'before rows/s':>14} {'after rows/s':>14}")
+    print("  " + "=" * 98)
+    for stage, table, d_a, d_b, pct, r_a, r_b in compare_runs(runs[run_a], runs[run_b]):
+        flag = "⚠️" if pct is not None and pct > 20 else "  "
+        print(f"{flag}{stage:<12} {table:<24} {_fmt(d_a, '.3f', 10)} {_fmt(d_b, '.3f', 10)} "
+              f"{_fmt(pct, '+.1f', 7)}% {_fmt(r_a, ',.0f', 14)} {_fmt(r_b, ',.0f', 14)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Parallel multi-table loader.
+
+Each table load is a task with declared dependencies. Tasks whose
+dependencies have finished run concurrently on a thread pool, each with its
+own connection borrowed from the shared pool (db.get_pool), so total
+wall-clock time is bounded by the longest dependency chain rather than the
+sum of all tables.
+
+With a RefreshState (see refresh_state), completed tasks are checkpointed
+and tasks whose source files are unchanged since their checkpoint are
+skipped, so a failed refresh resumes where it stopped.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Default number of tables loaded at the same time (override with LOAD_WORKERS)
+DEFAULT_WORKERS = 4
+
+# name: table/task name; func: callable(conn) -> row count; depends_on: task names;
+# sources: files the task loads (checksummed for skip-if-unchanged)
+LoadTask = namedtuple("LoadTask", ["name", "func", "depends_on", "sources"], defaults=[()])
+
+
+def _run_task(pool, task):
+    """Run one task on a pooled connection and commit it"""
+    conn = pool.getconn()
+    try:
+        start = time.perf_counter()
+        count = task.func(conn)
+        conn.commit()
+        return count, time.perf_counter() - start
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def run_parallel_load(pool, tasks, workers=DEFAULT_WORKERS, state=None):
+    """
+    Run load tasks concurrently, respecting their dependencies.
+
+    A task starts as soon as every task in its depends_on list has finished.
+    If a task fails, tasks that depend on it are skipped and the first error
+    is re-raised once the remaining independent tasks have completed.
+
+    With state (a refresh_state.RefreshState), tasks that are still current
+    are not run (their checkpointed row count is returned with 0 seconds)
+    and every task that completes is checkpointed.
+
+    Returns:
+        dict of task name -> (row_count, elapsed_seconds)
+    """
+    pending = {task.name: task for task in tasks}
+    unknown = {dep for task in tasks for dep in task.depends_on} - set(pending)
+    if unknown:
+        raise ValueError(f"Unknown task dependencies: {sorted(unknown)}")
+
+    results = {}
+    failed = {}
+    running = {}
+
+    if state is not None:
+        for name, rows in state.skippable(tasks).items():
+            print(f"  ⏭  {name}: sources unchanged since last refresh, skipped")
+            results[name] = (rows, 0.0)
+            del pending[name]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Skip tasks whose dependencies failed
+            for name, task in list(pending.items()):
+                if any(dep in failed for dep in task.depends_on):
+                    failed[name] = RuntimeError(f"{name} skipped: dependency failed")
+                    del pending[name]
+
+            # Submit every task whose dependencies are complete
+            for name, task in list(pending.items()):
+                if all(dep in results for dep in task.depends_on):
+                    running[executor.submit(_run_task, pool, task)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between tasks: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                task = next(t for t in tasks if t.name == name)
+                try:
+                    results[name] = future.result()
+                    if state is not None:
+                        state.mark_done(task, results[name][0])
+                except Exception as e:
+                    print(f"  ❌ {name} failed: {e}")
+                    failed[name] = e
+                    if state is not None:
+                        state.mark_failed(task)
+
+    if failed:
+        raise next(iter(failed.values()))
+    return results
@@ -0,0 +1,348 @@
+"""
+Columnar (Parquet) storage for the analytical mart.
+
+setup_02 can write each table as a zstd-compressed, typed Parquet file
+instead of CSV (MART_FORMAT=parquet), with fact_orders optionally split
+into one directory per order_year_month. Reading a built mart back is then
+a column scan instead of a full text parse, and the files take a fraction
+of the disk.
+
+The loaders read either format through the helpers here: mart_path()
+resolves "<table>.csv" or "<table>.parquet", read_frame() loads a small
+table into pandas, and copy_parquet_to_table() streams a Parquet file or
+directory into PostgreSQL with COPY, one record batch at a time.
+
+pyarrow is optional; it is only imported when Parquet is actually used.
+
+Usage (convert existing CSV data files for MART_FORMAT=parquet):
+    python parquet_io.py convert data_dim_01_customers.csv [more.csv ...]
+"""
+
+import io
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+from bulk_copy import DEFAULT_BATCH_SIZE, copy_csv_to_table
+from csv_schema import DEFAULT_CHUNK_ROWS, summary_sql_type, update_summary
+from fact_partitions import months_in_csv
+
+MART_FORMATS = ("csv", "parquet")
+
+# Good ratio at near-snappy speed
+DEFAULT_COMPRESSION = "zstd"
+
+# fact_orders Parquet partition column ("" writes a single file)
+DEFAULT_FACT_PARTITION_COLUMN = "order_year_month"
+
+
+def _pyarrow():
+    """Import pyarrow on first use (Parquet output is optional)"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError(
+            "MART_FORMAT=parquet requires pyarrow (pip install pyarrow)"
+        ) from e
+    return pyarrow
+
+
+def mart_path(table, mart_format="csv", directory=""):
+    """Path of a mart table in the given format, e.g. 'fact_orders.parquet'"""
+    if mart_format not in MART_FORMATS:
+        raise ValueError(f"Unknown mart format '{mart_format}' (expected one of {MART_FORMATS})")
+    return os.path.join(directory, f"{table}.{mart_format}")
+
+
+def is_parquet(path):
+    return path.endswith(".parquet")
+
+
+def disk_usage(path):
+    """Size of a file, or of every file under a partitioned Parquet directory"""
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+    return os.path.getsize(path)
+
+
+def remove_table(path):
+    """Delete a Parquet table (single file or directory of part files) if it exists"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _conform(table, schema):
+    """Cast the columns of table that schema already types (a NULL-only column adopts it)"""
+    pa = _pyarrow()
+    columns = []
+    for name, column in zip(table.schema.names, table.columns):
+        target = schema.field(name).type if name in schema.names else column.type
+        if target != column.type and not pa.types.is_null(target):
+            column = column.cast(target)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.schema.names)
+
+
+def write_parquet(frame, path, partition_by=None, compression=DEFAULT_COMPRESSION,
+                  append=False):
+    """
+    Write a DataFrame as Parquet.
+
+    With partition_by, path becomes a directory with one hive-style
+    subdirectory per value (fact_orders.parquet/order_year_month=2020-12/).
+    Without append, whatever is at path is removed first, every partition
+    included. With append, the rows go to new part files and nothing
+    already written is read or rewritten: a partitioned table gets new
+    files inside its partitions, a single-file table becomes a directory
+    whose first part is the existing file.
+    """
+    pa = _pyarrow()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if append and os.path.exists(path):
+        table = _conform(table, _dataset(path).schema)
+    else:
+        append = False
+        remove_table(path)
+    basename_template = f"part-{time.time_ns()}-{{i}}.parquet"
+    if partition_by:
+        pa.parquet.write_to_dataset(
+            table, path, partition_cols=[partition_by], compression=compression,
+            existing_data_behavior="overwrite_or_ignore", basename_template=basename_template
+        )
+    elif append:
+        if os.path.isfile(path):
+            first_part = f"{path}.part-0"
+            os.replace(path, first_part)
+            os.makedirs(path)
+            os.replace(first_part, os.path.join(path, "part-0.parquet"))
+        pa.parquet.write_table(table, os.path.join(path, basename_template.format(i=0)),
+                               compression=compression)
+    else:
+        pa.parquet.write_table(table, path, compression=compression)
+
+
+def _stream_schema(table):
+    """
+    Schema for every batch of a streamed file, from its first batch: decimals
+    widened to full precision (a later batch may hold larger values) and
+    all-NULL columns typed as strings.
+    """
+    pa = _pyarrow()
+    fields = []
+    for field in table.schema:
+        if pa.types.is_decimal(field.type):
+            field = field.with_type(pa.decimal128(38, field.type.scale))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def write_parquet_frames(frames, path, compression=DEFAULT_COMPRESSION):
+    """
+    Write an iterable of DataFrames (e.g. db.stream_frames) to one Parquet
+    file, one row group per frame, without holding more than one in memory.
+
+    Returns:
+        rows written
+    """
+    pa = _pyarrow()
+    writer = None
+    rows = 0
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, _stream_schema(table), compression=compression)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _dataset(path):
+    pa = _pyarrow()
+    return pa.dataset.dataset(path, format="parquet", partitioning="hive")
+
+
+def _plain_columns(data):
+    """Decode dictionary columns (hive partition values) of a batch or table"""
+    pa = _pyarrow()
+    columns = [
+        column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+        for column in data.columns
+    ]
+    return type(data).from_arrays(columns, names=data.schema.names)
+
+
+def read_frame(path, columns=None):
+    """Load a mart table (CSV or Parquet file/directory) into pandas"""
+    if is_parquet(path):
+        return _dataset(path).to_table(columns=columns).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+
+def empty_frame(path):
+    """Zero-row frame with the columns (and, for Parquet, the types) of a mart table"""
+    if is_parquet(path):
+        return _plain_columns(_dataset(path).schema.empty_table()).to_pandas()
+    return pd.read_csv(path, nrows=0)
+
+
+def _nullable_integers(arrow_type):
+    """types_mapper for to_pandas: integer columns with NULLs stay integers (Int32, not float64)"""
+    pa = _pyarrow()
+    if pa.types.is_integer(arrow_type):
+        return pd.api.types.pandas_dtype(str(arrow_type).capitalize())
+    return None
+
+
+def iter_frames(path, chunk_rows=DEFAULT_BATCH_SIZE, **read_csv_kwargs):
+    """
+    Yield a mart table (CSV or Parquet) as DataFrames of at most chunk_rows rows.
+
+    Parquet integer columns come back as nullable integers in every chunk,
+    so a key column with NULLs is written back as 11, not 11.0.
+    """
+    if is_parquet(path):
+        for batch in _dataset(path).to_batches(batch_size=chunk_rows):
+            if batch.num_rows:
+                yield _plain_columns(batch).to_pandas(types_mapper=_nullable_integers)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, **read_csv_kwargs)
+
+
+def infer_parquet_schema(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    [(column_name, sql_type), ...] for a Parquet mart table (reads every row).
+
+    Timestamp and date columns keep their stored type (midnight values
+    must not narrow a timestamp to DATE); other columns are rendered as
+    text, one record batch at a time, and go through the same inference
+    as CSV files.
+    """
+    pa = _pyarrow()
+    dataset = _dataset(path)
+    stored = {field.name: field.type for field in _plain_columns(dataset.schema.empty_table()).schema}
+    summaries = {}
+    for batch in dataset.to_batches(batch_size=chunk_rows):
+        batch = _plain_columns(batch)
+        for name, column in zip(batch.schema.names, batch.columns):
+            if not (pa.types.is_timestamp(column.type) or pa.types.is_date(column.type)):
+                values = pa.compute.cast(column, pa.string()).to_pandas()
+                summaries[name] = update_summary(summaries.get(name), values)
+    schema = []
+    for name, data_type in stored.items():
+        if pa.types.is_timestamp(data_type):
+            schema.append((name, "TIMESTAMP"))
+        elif pa.types.is_date(data_type):
+            schema.append((name, "DATE"))
+        else:
+            schema.append((name, summary_sql_type(name, summaries.get(name))))
+    return schema
+
+
+def months_in_parquet(path, key_column="date_key"):
+    """Distinct 'YYYY-MM' months in a Parquet table's date_key column"""
+    pa = _pyarrow()
+    keys = pa.compute.unique(_dataset(path).to_table(columns=[key_column])[key_column])
+    months = {int(key) // 100 for key in keys.to_pylist() if key is not None}
+    return sorted(f"{ym // 100:04d}-{ym % 100:02d}" for ym in months)
+
+
+def copy_parquet_to_table(conn, path, table_name, columns=None,
+                          batch_size=DEFAULT_BATCH_SIZE, row_filter=None, stats=None):
+    """
+    Stream a Parquet file or partitioned directory into table_name with COPY.
+
+    Mirrors bulk_copy.copy_csv_to_table: same arguments and return value,
+    so the loaders can pick either by file type. Each record batch is
+    rendered to CSV by Arrow (nulls become empty fields) and sent with one
+    COPY; only one batch is held in memory at a time.
+
+    Returns:
+        (rows_loaded, elapsed_seconds)
+    """
+    pa = _pyarrow()
+    start = time.perf_counter()
+    rows_loaded = 0
+    insert_s = 0.0
+    bytes_sent = 0
+
+    dataset = _dataset(path)
+    columns = list(columns) if columns else dataset.schema.names
+    col_names = ", ".join(columns)
+    write_options = pa.csv.WriteOptions(include_header=False)
+
+    cursor = conn.cursor()
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        batch = _plain_columns(batch)
+        if row_filter:
+            filter_column, predicate = row_filter
+            raw = batch.column(batch.schema.get_field_index(filter_column)).to_pylist()
+            mask = pa.array([value is not None and predicate(str(value)) for value in raw])
+            batch = batch.filter(mask)
+        if batch.num_rows == 0:
+            continue
+
+        buffer = io.BytesIO()
+        pa.csv.write_csv(batch, buffer, write_options)
+        bytes_sent += buffer.tell()
+        buffer.seek(0)
+
+        copy_start = time.perf_counter()
+        cursor.copy_expert(
+            f"COPY {table_name} ({col_names}) FROM STDIN WITH (FORMAT csv, NULL '')",
+            buffer
+        )
+        insert_s += time.perf_counter() - copy_start
+        rows_loaded += batch.num_rows
+
+    cursor.close()
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats.update(read_s=elapsed - insert_s, insert_s=insert_s, bytes=bytes_sent)
+    return rows_loaded, elapsed
+
+
+def copy_table(conn, path, table_name, **kwargs):
+    """COPY a CSV or Parquet mart table, picking the reader by file type"""
+    if is_parquet(path):
+        return copy_parquet_to_table(conn, path, table_name, **kwargs)
+    return copy_csv_to_table(conn, path, table_name, **kwargs)
+
+
+def fact_months(path):
+    """Months present in the fact table file (either format)"""
+    if is_parquet(path):
+        return months_in_parquet(path)
+    return months_in_csv(path)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        print(__doc__)
+        sys.exit(1)
+
+    for csv_file in sys.argv[2:]:
+        target = os.path.splitext(csv_file)[0] + ".parquet"
+        write_parquet(pd.read_csv(csv_file), target)
+        print(f"✅ {csv_file} → {target} ({disk_usage(csv_file):,} → {disk_usage(target):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
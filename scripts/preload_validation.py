@@ -0,0 +1,135 @@
+"""
+Pre-load validation of fact_orders with a quarantine file.
+
+Referential integrity used to be checked only after the load, with one
+NOT EXISTS scan per dimension, and bad rows surfaced as per-row insert
+warnings. Here the fact file is validated before anything is written: it is
+streamed in chunks, every chunk is checked with vectorized rules and hash
+lookups (Series.isin) against the dimension key sets, clean rows go to a
+CSV that the loader COPYs in bulk, and rejected rows go to a quarantine CSV
+with a reject_reasons column.
+
+Reason codes (several are joined with ';'):
+    MISSING_ORDER_ID        order_id is empty
+    BAD_ORDER_DATE          order_date is missing or cannot be parsed
+    BAD_DATE_KEY            date_key is not the YYYYMMDD of order_date
+    BAD_AMOUNT              order_amount_usd is missing or not a number
+    AMOUNT_OUT_OF_RANGE     order_amount_usd is negative or above the maximum
+    MONTH_OUT_OF_RANGE      order_month is not 1-12
+    MISSING_<COLUMN>        a required dimension reference is empty
+    UNKNOWN_<COLUMN>        a dimension reference is not in the dimension
+"""
+
+import numpy as np
+import pandas as pd
+
+from bulk_copy import DEFAULT_BATCH_SIZE, NULL_TOKENS
+from date_parsing import parse_dates
+from dimension_extract import date_key_of
+from parquet_io import is_parquet, iter_frames
+from surrogate_keys import DIMENSION_KEYS
+
+# Orders above this amount (USD) are quarantined as implausible
+DEFAULT_MAX_ORDER_AMOUNT = 100000
+
+# (fact column, dimension table, dimension column, required) for the
+# surrogate-key star schema built by setup_02
+SURROGATE_KEY_REFERENCES = [("date_key", "dim_date", "date_key", True)] + [
+    (key_column, table, key_column, key_column in ("customer_key", "product_key"))
+    for table, key_column, _ in DIMENSION_KEYS
+]
+
+
+def key_set(values):
+    """Distinct non-null keys as text (CSV and Parquet dimensions compare alike)"""
+    values = pd.Series(values).dropna()
+    return pd.Index(values.astype(str).unique())
+
+
+def _as_text(values):
+    """Text form of a key column, with NaN kept (integers stay '20201224', not '20201224.0')"""
+    if pd.api.types.is_float_dtype(values):
+        values = values.astype("Int64")
+    return values.astype(str).where(values.notna())
+
+
+def reject_reasons(frame, references, key_sets, max_amount=DEFAULT_MAX_ORDER_AMOUNT):
+    """
+    Reason codes for every row of frame ('' for a clean row).
+
+    Args:
+        frame: chunk of fact rows
+        references: [(fact column, dimension table, dimension column, required), ...]
+        key_sets: {dimension table: pd.Index of its keys as text} (see key_set)
+        max_amount: upper bound for order_amount_usd
+
+    Returns:
+        Series of ';'-joined reason codes aligned with frame
+    """
+    checks = []
+    if "order_id" in frame.columns:
+        checks.append(("MISSING_ORDER_ID", frame["order_id"].isna()))
+    if "order_date" in frame.columns:
+        order_date = parse_dates(frame["order_date"])
+        checks.append(("BAD_ORDER_DATE", order_date.isna()))
+        if "date_key" in frame.columns:
+            date_key = pd.to_numeric(frame["date_key"], errors="coerce")
+            expected = date_key_of(order_date.fillna(pd.Timestamp(0)))
+            checks.append(("BAD_DATE_KEY", order_date.notna() & (date_key != expected)))
+    if "order_amount_usd" in frame.columns:
+        amount = pd.to_numeric(frame["order_amount_usd"], errors="coerce")
+        checks.append(("BAD_AMOUNT", amount.isna()))
+        checks.append(("AMOUNT_OUT_OF_RANGE", (amount < 0) | (amount > max_amount)))
+    if "order_month" in frame.columns:
+        month = pd.to_numeric(frame["order_month"], errors="coerce")
+        checks.append(("MONTH_OUT_OF_RANGE", month.notna() & ~month.between(1, 12)))
+
+    for column, table, _, required in references:
+        if column not in frame.columns or table not in key_sets:
+            continue
+        values = _as_text(frame[column])
+        present = values.notna()
+        if required:
+            checks.append((f"MISSING_{column.upper()}", ~present))
+        checks.append((f"UNKNOWN_{column.upper()}", present & ~values.isin(key_sets[table])))
+
+    reasons = np.full(len(frame), "", dtype=object)
+    for code, failed in checks:
+        failed = failed.to_numpy(dtype=bool, na_value=False)
+        reasons[failed] = reasons[failed] + code + ";"
+    return pd.Series(reasons, index=frame.index).str.rstrip(";")
+
+
+def split_clean_rows(path, clean_path, quarantine_path, references, key_sets,
+                     chunk_rows=DEFAULT_BATCH_SIZE, max_amount=DEFAULT_MAX_ORDER_AMOUNT):
+    """
+    Stream path into clean_path (rows that passed) and quarantine_path
+    (rejected rows plus reject_reasons), both CSV.
+
+    CSV sources are read as text (with the loader's NULL tokens, so a country
+    code like "NA" stays a value) and clean rows are written back unchanged.
+
+    Returns:
+        {"rows", "clean", "quarantined", "reasons": {code: rows}}
+    """
+    summary = {"rows": 0, "clean": 0, "quarantined": 0, "reasons": {}}
+    read_kwargs = {} if is_parquet(path) else {
+        "dtype": str, "keep_default_na": False, "na_values": sorted(NULL_TOKENS)
+    }
+    first = True
+    for chunk in iter_frames(path, chunk_rows, **read_kwargs):
+        reasons = reject_reasons(chunk, references, key_sets, max_amount)
+        rejected = reasons != ""
+        mode = "w" if first else "a"
+        chunk[~rejected].to_csv(clean_path, mode=mode, header=first, index=False)
+        chunk[rejected].assign(reject_reasons=reasons[rejected]).to_csv(
+            quarantine_path, mode=mode, header=first, index=False
+        )
+        first = False
+
+        summary["rows"] += len(chunk)
+        summary["quarantined"] += int(rejected.sum())
+        for code, count in reasons[rejected].str.split(";").explode().value_counts().items():
+            summary["reasons"][code] = summary["reasons"].get(code, 0) + int(count)
+    summary["clean"] = summary["rows"] - summary["quarantined"]
+    return summary
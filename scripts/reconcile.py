@@ -0,0 +1,273 @@
+"""
+Order-independent checksum reconciliation between a mart file and a table.
+
+COUNT(*) and SUM(order_amount_usd) cannot prove that every row arrived
+intact. Here every row is reduced to a 31-bit hash and the hashes are
+summed per month (date_key / 100) and per table. Sums do not depend on row
+order, so neither side sorts anything, and duplicates add up instead of
+cancelling out (as they would with XOR). The database computes its sums in one
+aggregate query; the file is streamed in chunks and hashed with numpy.
+
+Both sides hash the same canonical form of each column, chosen by the
+column's type in the database:
+
+    integers            the value
+    numeric / float     the value scaled to the column's scale (6 for floats)
+                        and rounded half away from zero
+    date                days since 1970-01-01
+    timestamp           whole seconds since 1970-01-01
+    anything else       first 32 bits of the md5 of the text (the file side
+                        hashes each distinct value once)
+
+Column hashes are folded into the row hash with a non-linear step,
+x = ((x XOR h) * m_i) mod (2^31 - 1). Integer arithmetic in PostgreSQL and
+numpy gives identical results, and a value moving to another row or column
+changes the sum.
+
+Usage:
+    python reconcile.py [table file ...]
+
+Without arguments fact_orders is checked against the file update_all_tables
+loaded (the validated file when pre-load validation is on).
+"""
+
+import hashlib
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import db
+from bulk_copy import DEFAULT_BATCH_SIZE, NULL_TOKENS
+from date_parsing import parse_dates
+from parquet_io import is_parquet, iter_frames
+
+# Hashes live in [0, MODULUS); products of two stay below 2^62 (no bigint overflow)
+MODULUS = 2**31 - 1
+NULL_HASH = MODULUS - 1
+MULTIPLIERS = [pow(16807, i + 1, MODULUS) for i in range(256)]
+
+# Scale used for float columns (numeric columns use their declared scale)
+FLOAT_SCALE = 6
+
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+DECIMAL_TYPES = {"numeric", "real", "double precision"}
+TIMESTAMP_TYPES = {"timestamp without time zone", "timestamp with time zone"}
+
+# Rows are grouped by month when the table has this column
+GROUP_COLUMN = "date_key"
+TOTAL_GROUP = "total"
+
+ColumnType = namedtuple("ColumnType", ["name", "data_type", "scale"])
+Mismatch = namedtuple("Mismatch", ["group", "file_rows", "table_rows", "file_hash", "table_hash"])
+
+
+def column_types(cursor, table, columns=None):
+    """[ColumnType] of table in column order, limited to columns when given"""
+    cursor.execute("""
+        SELECT column_name, data_type, numeric_scale
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    types = [ColumnType(*row) for row in cursor.fetchall()]
+    if columns is not None:
+        types = [column for column in types if column.name in set(columns)]
+    return types
+
+
+def _scale(column):
+    return column.scale if column.data_type == "numeric" and column.scale is not None else FLOAT_SCALE
+
+
+def _sql_column_hash(column):
+    """SQL expression for the hash of one column"""
+    name = column.name
+    if column.data_type in INTEGER_TYPES:
+        value = f"{name}::bigint"
+    elif column.data_type in DECIMAL_TYPES:
+        value = f"round({name}::numeric * {10 ** _scale(column)})"
+    elif column.data_type == "date":
+        value = f"({name} - DATE '1970-01-01')"
+    elif column.data_type in TIMESTAMP_TYPES:
+        value = f"floor(extract(epoch FROM {name}))"
+    else:
+        return (f"COALESCE(('x' || substr(md5({name}::text), 1, 8))::bit(32)::bigint % {MODULUS}, "
+                f"{NULL_HASH})")
+    return f"COALESCE(((({value}) % {MODULUS} + {MODULUS}) % {MODULUS})::bigint, {NULL_HASH})"
+
+
+def row_hash_sql(columns):
+    """SQL expression folding the column hashes of a row into the row hash"""
+    expression = "0::bigint"
+    for column, multiplier in zip(columns, MULTIPLIERS):
+        expression = f"((({expression}) # {_sql_column_hash(column)}) * {multiplier}) % {MODULUS}"
+    return expression
+
+
+def _md5_hashes(values):
+    """First 32 bits of md5(text) mod MODULUS, hashing each distinct value once"""
+    codes, uniques = pd.factorize(values)
+    hashes = np.array(
+        [int(hashlib.md5(str(value).encode("utf-8")).hexdigest()[:8], 16) % MODULUS for value in uniques]
+        + [NULL_HASH],
+        dtype=np.int64,
+    )
+    # Code -1 (missing) picks the trailing NULL_HASH
+    return hashes[codes]
+
+
+def _datetimes(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return parse_dates(values)
+
+
+def _frame_column_hash(values, column):
+    """numpy hashes of one column, matching _sql_column_hash"""
+    if column.data_type in INTEGER_TYPES:
+        numbers = pd.to_numeric(values, errors="coerce")
+    elif column.data_type in DECIMAL_TYPES:
+        scaled = pd.to_numeric(values, errors="coerce") * 10 ** _scale(column)
+        numbers = np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)
+    elif column.data_type == "date":
+        numbers = (_datetimes(values).dt.floor("D") - pd.Timestamp("1970-01-01")) // pd.Timedelta(days=1)
+    elif column.data_type in TIMESTAMP_TYPES:
+        numbers = (_datetimes(values) - pd.Timestamp("1970-01-01")) // pd.Timedelta(seconds=1)
+    else:
+        return _md5_hashes(values)
+    numbers = pd.Series(numbers, index=values.index)
+    missing = numbers.isna().to_numpy()
+    hashes = np.mod(numbers.fillna(0).to_numpy(dtype=np.int64), MODULUS)
+    hashes[missing] = NULL_HASH
+    return hashes
+
+
+def frame_row_hashes(frame, columns):
+    """Row hashes of a DataFrame, matching row_hash_sql"""
+    hashes = np.zeros(len(frame), dtype=np.int64)
+    for column, multiplier in zip(columns, MULTIPLIERS):
+        hashes = ((hashes ^ _frame_column_hash(frame[column.name], column)) * multiplier) % MODULUS
+    return hashes
+
+
+def _month(group):
+    """'2021-03' for a date_key / 100 group"""
+    if group is None or group == TOTAL_GROUP or pd.isna(group):
+        return group if group == TOTAL_GROUP else None
+    group = int(group)
+    return f"{group // 100:04d}-{group % 100:02d}"
+
+
+def _with_total(groups):
+    """Add the TOTAL_GROUP sums to {group: (rows, hash_sum)}"""
+    groups[TOTAL_GROUP] = (
+        sum(rows for rows, _ in groups.values()), sum(total for _, total in groups.values())
+    )
+    return groups
+
+
+def table_checksums(cursor, table, columns):
+    """{month or TOTAL_GROUP: (rows, hash sum)} of a table, in one aggregate query"""
+    grouped = any(column.name == GROUP_COLUMN for column in columns)
+    group = f"{GROUP_COLUMN} / 100" if grouped else "NULL::int"
+    cursor.execute(f"""
+        SELECT {group} AS month, COUNT(*), SUM({row_hash_sql(columns)})
+        FROM {table}
+        GROUP BY 1
+    """)
+    return _with_total({
+        _month(month): (rows, int(total or 0)) for month, rows, total in cursor.fetchall()
+    })
+
+
+def file_checksums(path, columns, chunk_rows=DEFAULT_BATCH_SIZE):
+    """{month or TOTAL_GROUP: (rows, hash sum)} of a CSV or Parquet file, streamed"""
+    read_kwargs = {} if is_parquet(path) else {
+        "dtype": str, "keep_default_na": False, "na_values": sorted(NULL_TOKENS)
+    }
+    grouped = any(column.name == GROUP_COLUMN for column in columns)
+    groups = {}
+    for chunk in iter_frames(path, chunk_rows, **read_kwargs):
+        sums = pd.DataFrame({
+            "month": (pd.to_numeric(chunk[GROUP_COLUMN], errors="coerce") // 100) if grouped else np.nan,
+            "hash": frame_row_hashes(chunk, columns),
+        }, index=chunk.index).groupby("month", dropna=False)["hash"].agg(["size", "sum"])
+        for month, (rows, total) in sums.iterrows():
+            key = _month(month)
+            previous_rows, previous_total = groups.get(key, (0, 0))
+            groups[key] = (previous_rows + int(rows), previous_total + int(total))
+    return _with_total(groups)
+
+
+def reconcile_table(cursor, table, path, columns=None):
+    """
+    Compare the checksums of path and table.
+
+    Args:
+        cursor: database cursor
+        table: loaded table
+        path: CSV or Parquet file it was loaded from
+        columns: columns to compare (default: every table column in the file)
+
+    Returns:
+        [Mismatch] for every month (and the total) that differs; empty when
+        the table holds exactly the file's rows
+    """
+    if columns is None:
+        header = next(iter_frames(path, 1, dtype=str), pd.DataFrame()).columns
+        columns = [name for name in header]
+    types = column_types(cursor, table, columns)
+    if not types:
+        raise ValueError(f"{table} has no columns in common with {path}")
+    table_sums = table_checksums(cursor, table, types)
+    file_sums = file_checksums(path, types)
+    return [
+        Mismatch(group, *file_sums.get(group, (0, 0))[:1], *table_sums.get(group, (0, 0))[:1],
+                 file_sums.get(group, (0, 0))[1], table_sums.get(group, (0, 0))[1])
+        for group in sorted(set(table_sums) | set(file_sums), key=str)
+        if file_sums.get(group) != table_sums.get(group)
+    ]
+
+
+def default_targets():
+    """[(table, file)] checked when no arguments are given"""
+    from update_all_tables import FACT_ORDERS_FILE, PRELOAD_VALIDATION, VALIDATED_FACT_FILE
+
+    fact_file = VALIDATED_FACT_FILE if PRELOAD_VALIDATION and os.path.exists(VALIDATED_FACT_FILE) \
+        else FACT_ORDERS_FILE
+    return [("fact_orders", fact_file)]
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) % 2:
+        print("Usage: python reconcile.py [table file ...]")
+        sys.exit(1)
+    targets = list(zip(args[::2], args[1::2])) or default_targets()
+
+    conn = db.connect()
+    failures = 0
+    try:
+        cursor = conn.cursor()
+        for table, path in targets:
+            print(f"[RECONCILE] {table} <- {path}")
+            mismatches = reconcile_table(cursor, table, path)
+            if not mismatches:
+                print("  ✅ Checksums match for every month")
+                continue
+            failures += 1
+            for m in mismatches:
+                label = m.group or "(no date_key)"
+                print(f"  ❌ {label:<14} file {m.file_rows:>12,} rows  table {m.table_rows:>12,} rows"
+                      + ("  (same row count, different content)" if m.file_rows == m.table_rows else ""))
+        cursor.close()
+    finally:
+        conn.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Checkpoints for resumable table refreshes.
+
+Every task that completes is recorded in a JSON state file together with
+the checksums of the source files it loaded. On the next run a task is
+skipped when its sources still have the same checksums and none of its
+dependencies has to run again, so:
+
+    - a rerun after a failure resumes at the failed task (the tasks that
+      completed are skipped, the failed one and its dependents run), and
+    - a routine refresh only reloads tables whose source files changed.
+
+A task that fails loses its checkpoint. Delete the state file to force a
+full refresh.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+DEFAULT_STATE_FILE = "refresh_state.json"
+
+_BLOCK_SIZE = 1 << 20
+
+
+def file_checksum(path):
+    """sha256 of a file, or of every file under a directory (partitioned Parquet); None if missing"""
+    if not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        files = [path]
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update(os.path.relpath(name, path).encode("utf-8"))
+        with open(name, "rb") as f:
+            for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class RefreshState:
+    """Completed tasks and the source checksums they were loaded from"""
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self.tasks = {}
+        self._checksums = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.tasks = json.load(f).get("tasks", {})
+
+    def checksums(self, task):
+        """{source path: checksum} for a task's sources (computed once per run)"""
+        for source in task.sources:
+            if source not in self._checksums:
+                self._checksums[source] = file_checksum(source)
+        return {source: self._checksums[source] for source in task.sources}
+
+    def is_current(self, task):
+        """True if the task completed before from sources identical to today's"""
+        entry = self.tasks.get(task.name)
+        if entry is None or not task.sources:
+            return False
+        checksums = self.checksums(task)
+        return None not in checksums.values() and entry["checksums"] == checksums
+
+    def skippable(self, tasks):
+        """
+        {task name: checkpointed row count} for tasks that need not run.
+
+        A task is skipped only if it is current and every task it depends on
+        is skipped too (a reloaded dependency reloads its dependents).
+        """
+        by_name = {task.name: task for task in tasks}
+        decided = {}
+
+        def skip(name):
+            if name not in decided:
+                task = by_name[name]
+                decided[name] = False  # a dependency cycle runs (and is reported by the loader)
+                decided[name] = self.is_current(task) and all(skip(dep) for dep in task.depends_on)
+            return decided[name]
+
+        return {name: self.tasks[name]["rows"] for name in by_name if skip(name)}
+
+    def mark_done(self, task, rows):
+        """Checkpoint a completed task"""
+        self.tasks[task.name] = {
+            "rows": rows,
+            "checksums": self.checksums(task),
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._save()
+
+    def mark_failed(self, task):
+        """Forget a task's checkpoint so the next run loads it again"""
+        if self.tasks.pop(task.name, None) is not None:
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"tasks": self.tasks}, f, indent=2)
+        os.replace(tmp_path, self.path)
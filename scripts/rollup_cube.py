@@ -0,0 +1,122 @@
+"""
+Monthly rollup of fact_orders, maintained incrementally.
+
+Most dashboard queries (documentation/analytics_queries_*.sql) re-aggregate
+the whole fact table by some mix of month, country, platform, channel and
+product. fact_orders_monthly holds those aggregates once, at
+month x country x platform x channel x product grain, so they read
+thousands of rows instead of every order:
+
+    order_count       orders
+    revenue_usd       SUM(order_amount_usd)
+    ship_days_sum     SUM(ship_ts - order_date) in days
+    shipped_orders    orders with both dates (ship_days_sum / shipped_orders
+                      is the average shipping time)
+
+All measures are additive, so any coarser grouping is a SUM over the
+rollup, e.g. revenue by country and year:
+
+    SELECT country_code, order_year, SUM(revenue_usd)
+    FROM fact_orders_monthly GROUP BY 1, 2;
+
+Distinct customers are not additive and still need fact_orders.
+
+month_key (YYYYMM) is derived from date_key, the partition key of
+fact_orders, so refreshing a month reads only that month's partition.
+refresh_rollup() replaces just the months a load touched (every month for
+a full reload) and runs inside the caller's transaction, so the rollup
+changes together with the fact rows.
+"""
+
+from fact_partitions import month_bounds
+
+ROLLUP_TABLE = "fact_orders_monthly"
+
+# Grain below the month
+ROLLUP_DIMENSIONS = ["country_code", "purchase_platform", "marketing_channel", "product_id", "product_name"]
+
+ROLLUP_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        month_key INT,
+        order_year_month VARCHAR(10),
+        order_year SMALLINT,
+        order_month SMALLINT,
+        country_code VARCHAR(10),
+        purchase_platform VARCHAR(50),
+        marketing_channel VARCHAR(50),
+        product_id VARCHAR(50),
+        product_name VARCHAR(255),
+        order_count BIGINT NOT NULL,
+        revenue_usd NUMERIC(18,2),
+        ship_days_sum BIGINT,
+        shipped_orders BIGINT NOT NULL
+    )
+"""
+
+
+def month_key(year_month):
+    """'2021-03' -> 202103"""
+    year, month = (int(part) for part in year_month.split("-"))
+    return year * 100 + month
+
+
+def _month_filter(months):
+    """date_key ranges of months (YYYYMM ints), so partition pruning applies"""
+    ranges = []
+    for key in months:
+        start, end = month_bounds(f"{key // 100:04d}-{key % 100:02d}")
+        ranges.append(f"(date_key >= {start} AND date_key < {end})")
+    return " OR ".join(ranges)
+
+
+def refresh_rollup(conn, months=None, source="fact_orders"):
+    """
+    Recompute the rollup for months (YYYYMM ints; None rebuilds every month).
+
+    Runs in the caller's transaction (nothing is committed here).
+
+    Args:
+        conn: open psycopg2 connection
+        months: months touched by the load, or None for a full rebuild
+        source: relation with the natural fact columns (fact_orders, or
+            fact_orders_labeled for the surrogate-key star schema)
+
+    Returns:
+        rows written to the rollup
+    """
+    months = sorted({int(key) for key in months if key is not None}) if months is not None else None
+    if months == []:
+        return 0
+
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_DDL)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_month ON {ROLLUP_TABLE} (month_key)")
+    if months is None:
+        cursor.execute(f"DELETE FROM {ROLLUP_TABLE}")
+        where = ""
+    else:
+        cursor.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE month_key = ANY(%s)", (months,))
+        where = f"WHERE {_month_filter(months)}"
+
+    dimensions = ", ".join(ROLLUP_DIMENSIONS)
+    cursor.execute(f"""
+        INSERT INTO {ROLLUP_TABLE} (
+            month_key, order_year_month, order_year, order_month, {dimensions},
+            order_count, revenue_usd, ship_days_sum, shipped_orders
+        )
+        SELECT
+            month_key,
+            to_char(month_key / 100, 'FM0000') || '-' || to_char(month_key % 100, 'FM00'),
+            month_key / 100,
+            month_key % 100,
+            {dimensions},
+            COUNT(*),
+            SUM(order_amount_usd),
+            SUM(ship_ts::date - order_date::date),
+            COUNT(ship_ts::date - order_date::date)
+        FROM (SELECT (date_key::bigint / 100)::int AS month_key, * FROM {source} {where}) f
+        GROUP BY month_key, {dimensions}
+    """)
+    written = cursor.rowcount
+    cursor.close()
+    return written
@@ -5,22 +5,77 @@ Using psycopg2 directly (no SQLAlchemy)
 
 import pandas as pd
 import psycopg2
-from psycopg2 import sql
 import os
+import time
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+import db
+from bulk_copy import DEFAULT_BATCH_SIZE, rows_per_second
+from column_profile import print_drift, profile_tables
+from csv_schema import DEFAULT_CHUNK_ROWS, build_create_table_sql, infer_csv_schema
+from fact_partitions import PARTITION_CLAUSE, ensure_month_partitions
+from foreign_keys import add_foreign_keys, align_key_types, drop_foreign_keys, validate_foreign_keys
+from index_maintenance import SURROGATE_KEY_INDEXES, analyze_tables, build_secondary_indexes
+from load_metrics import LoadMetrics
+from parallel_loader import DEFAULT_WORKERS, LoadTask, run_parallel_load
+from parquet_io import (
+    copy_table,
+    disk_usage,
+    fact_months,
+    infer_parquet_schema,
+    is_parquet,
+    mart_path,
+    read_frame,
+)
+from preload_validation import SURROGATE_KEY_REFERENCES, key_set, split_clean_rows
+from rollup_cube import ROLLUP_TABLE, refresh_rollup
+from staged_load import (
+    STAGING_SCHEMA,
+    reset_staging_schema,
+    staging_connect_options,
+    swap_staging_into_place,
+    validate_staging,
+)
+from surrogate_keys import LABELED_FACT_VIEW, LABELED_FACT_VIEW_SQL
 
 print("[INFO] === GameZone Data Mart → PostgreSQL ===\n")
 
-# Configuration - Load from environment variables
-HOST = os.getenv('DB_HOST', '127.0.0.1')
-PORT = int(os.getenv('DB_PORT', 5432))
-DATABASE = os.getenv('DB_NAME', 'gamezone_analytics')
-USERNAME = os.getenv('DB_USER', 'postgres')
-PASSWORD = os.getenv('DB_PASSWORD', '')
+# Configuration - Load from environment variables (.env, read by the db module)
+HOST = db.DB_HOST
+PORT = db.DB_PORT
+DATABASE = db.DB_NAME
+USERNAME = db.DB_USER
+PASSWORD = db.DB_PASSWORD
+
+# Load strategy: "copy" (bulk COPY FROM STDIN) or "insert" (row-by-row, debugging only)
+LOAD_METHOD = os.getenv('LOAD_METHOD', 'copy').lower()
+COPY_BATCH_SIZE = int(os.getenv('COPY_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+SCHEMA_CHUNK_ROWS = int(os.getenv('SCHEMA_CHUNK_ROWS', DEFAULT_CHUNK_ROWS))
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', DEFAULT_WORKERS))
+
+# Format of the mart written by setup_02: "csv" or "parquet" (requires pyarrow)
+MART_FORMAT = os.getenv('MART_FORMAT', 'csv').lower()
+
+# "month" creates fact_orders partitioned by order month; "none" creates a single heap
+FACT_PARTITIONING = os.getenv('FACT_PARTITIONING', 'month').lower()
+
+# "rebuild" drops and recreates the database; "staged" loads a staging schema and swaps it in
+REFRESH_MODE = os.getenv('REFRESH_MODE', 'rebuild').lower()
+
+# Validate fact_orders against the dimension files before loading: rejected
+# rows go to QUARANTINE_FILE with reason codes, only clean rows are loaded
+PRELOAD_VALIDATION = os.getenv('PRELOAD_VALIDATION', 'true').lower() == 'true'
+QUARANTINE_FILE = os.getenv('QUARANTINE_FILE', 'quarantine_fact_orders.csv')
+VALIDATED_FACT_FILE = 'fact_orders_validated.csv'
+
+# Profile every loaded table into profile_history and report drift since the last load
+PROFILE_AFTER_LOAD = os.getenv('PROFILE_AFTER_LOAD', 'false').lower() == 'true'
+
+# Rebuild the monthly rollup (fact_orders_monthly) after every load
+ROLLUP_REFRESH = os.getenv('ROLLUP_REFRESH', 'true').lower() == 'true'
+
+# Per-stage timings are appended to LOAD_METRICS_FILE (NDJSON)
+METRICS = LoadMetrics("setup_01")
 
 # Validate that password is provided
 if not PASSWORD:
@@ -36,24 +91,26 @@ print("[CONNECT] Connecting to PostgreSQL...")
 
 try:
     # First connect to default postgres database
-    conn = psycopg2.connect(
-        host=HOST,
-        port=PORT,
-        user=USERNAME,
-        password=PASSWORD,
-        database="postgres"
-    )
-    conn.autocommit = True
+    conn = db.connect(database="postgres", autocommit=True)
     cursor = conn.cursor()
     print("✅ Connected to PostgreSQL\n")
     
-    # Check if database exists and drop it
-    print(f"[CREATE] Creating database '{DATABASE}'...")
-    cursor.execute(f"DROP DATABASE IF EXISTS {DATABASE}")
-    cursor.execute(f"CREATE DATABASE {DATABASE}")
+    if REFRESH_MODE == "staged":
+        # Keep the live database; tables are replaced by an atomic swap at the end
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (DATABASE,))
+        if cursor.fetchone() is None:
+            cursor.execute(f"CREATE DATABASE {DATABASE}")
+            print(f"✅ Database '{DATABASE}' created\n")
+        else:
+            print(f"✅ Database '{DATABASE}' exists, loading into '{STAGING_SCHEMA}' schema\n")
+    else:
+        # Check if database exists and drop it
+        print(f"[CREATE] Creating database '{DATABASE}'...")
+        cursor.execute(f"DROP DATABASE IF EXISTS {DATABASE}")
+        cursor.execute(f"CREATE DATABASE {DATABASE}")
+        print(f"✅ Database '{DATABASE}' created\n")
     cursor.close()
     conn.close()
-    print(f"✅ Database '{DATABASE}' created\n")
     
 except psycopg2.Error as e:
     print(f"❌ Error: {e}")
@@ -65,19 +122,17 @@ except psycopg2.Error as e:
 print(f"[CONNECT] Connecting to '{DATABASE}' database...")
 
 try:
-    conn = psycopg2.connect(
-        host=HOST,
-        port=PORT,
-        user=USERNAME,
-        password=PASSWORD,
-        database=DATABASE
-    )
-    conn.autocommit = True
+    conn = db.connect(autocommit=True)
     cursor = conn.cursor()
     cursor.execute("SELECT version()")
     version = cursor.fetchone()[0]
     print(f"✅ Connected to '{DATABASE}'\n{version[:80]}...\n")
     
+    if REFRESH_MODE == "staged":
+        # Unqualified CREATE/COPY/INDEX statements below now target the staging schema
+        reset_staging_schema(conn)
+        cursor.execute(f"SET search_path TO {STAGING_SCHEMA}, public")
+    
 except psycopg2.Error as e:
     print(f"❌ Error connecting: {e}")
     exit(1)
@@ -100,9 +155,13 @@ cursor.execute("""
 """)
 print("  ✅ dim_date")
 
+# Dimensions are keyed by integer surrogate keys (assigned in setup_02);
+# the natural keys stay unique so lookups by code still work.
+# customer_id is TEXT: the source holds ids of up to ~300 characters
 cursor.execute("""
     CREATE TABLE IF NOT EXISTS dim_customer (
-        customer_id VARCHAR(50) PRIMARY KEY,
+        customer_key INT PRIMARY KEY,
+        customer_id TEXT UNIQUE,
         country_code VARCHAR(10),
         account_creation_method VARCHAR(50)
     )
@@ -111,99 +170,113 @@ print("  ✅ dim_customer")
 
 cursor.execute("""
     CREATE TABLE IF NOT EXISTS dim_product (
-        product_id VARCHAR(50) PRIMARY KEY,
-        product_name VARCHAR(255)
+        product_key INT PRIMARY KEY,
+        product_id VARCHAR(50),
+        product_name VARCHAR(255),
+        UNIQUE (product_id, product_name)
     )
 """)
 print("  ✅ dim_product")
 
 cursor.execute("""
     CREATE TABLE IF NOT EXISTS dim_country (
-        country_code VARCHAR(10) PRIMARY KEY
+        country_key INT PRIMARY KEY,
+        country_code VARCHAR(10) UNIQUE
     )
 """)
 print("  ✅ dim_country")
 
 cursor.execute("""
     CREATE TABLE IF NOT EXISTS dim_platform (
-        platform VARCHAR(50) PRIMARY KEY
+        platform_key INT PRIMARY KEY,
+        platform VARCHAR(50) UNIQUE
     )
 """)
 print("  ✅ dim_platform")
 
 cursor.execute("""
     CREATE TABLE IF NOT EXISTS dim_marketing_channel (
-        marketing_channel VARCHAR(50) PRIMARY KEY
+        channel_key INT PRIMARY KEY,
+        marketing_channel VARCHAR(50) UNIQUE
     )
 """)
 print("  ✅ dim_marketing_channel")
 
-# Create fact table with dynamic columns
-# First, let's read the CSV to determine columns
-import pandas as pd
-fact_csv_columns = pd.read_csv("fact_orders.csv", nrows=0).columns.tolist() if os.path.exists("fact_orders.csv") else []
-
-col_defs = []
-for col in fact_csv_columns:
-    col_defs.append(f"{col} VARCHAR(500)")
-
-if col_defs:
-    cursor.execute(f"""
-        CREATE TABLE IF NOT EXISTS fact_orders (
-            {', '.join(col_defs)}
-        )
-    """)
+cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dim_account_creation_method (
+        account_creation_key INT PRIMARY KEY,
+        account_creation_method VARCHAR(50) UNIQUE
+    )
+""")
+print("  ✅ dim_account_creation_method")
+
+# Create fact table with typed columns inferred from every row of the mart file
+FACT_FILE = mart_path("fact_orders", MART_FORMAT)
+if os.path.exists(FACT_FILE):
+    infer_schema = infer_parquet_schema if is_parquet(FACT_FILE) else infer_csv_schema
+    with METRICS.stage("transform", "fact_orders", nbytes=disk_usage(FACT_FILE)):
+        # Key columns take the dimension key type, whatever the values suggest
+        fact_schema = align_key_types(infer_schema(FACT_FILE, chunk_rows=SCHEMA_CHUNK_ROWS))
+    cursor.execute(build_create_table_sql(
+        "fact_orders", fact_schema,
+        partition_by=PARTITION_CLAUSE if FACT_PARTITIONING == "month" else None
+    ))
+    for col, sql_type in fact_schema:
+        print(f"     {col:.<30} {sql_type}")
 else:
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS fact_orders (
             order_id VARCHAR(50),
-            date_key INT,
-            order_date VARCHAR(50),
-            customer_id VARCHAR(50),
-            product_id VARCHAR(50),
-            unit_price DECIMAL(18,2),
-            purchase_platform VARCHAR(50),
-            marketing_channel VARCHAR(50),
-            account_creation_method VARCHAR(50),
-            country_code VARCHAR(10),
-            order_year FLOAT,
-            order_month FLOAT,
+            order_date TIMESTAMP,
+            ship_ts DATE,
+            order_amount_usd NUMERIC(12,2),
+            order_year SMALLINT,
+            order_month SMALLINT,
             order_month_name VARCHAR(10),
             order_year_month VARCHAR(10),
-            ship_ts VARCHAR(50)
-        )
+            customer_key INT,
+            product_key INT,
+            platform_key INT,
+            channel_key INT,
+            country_key INT,
+            account_creation_key INT,
+            date_key INT
+        ) {PARTITION_CLAUSE if FACT_PARTITIONING == "month" else ""}
     """)
 print("  ✅ fact_orders")
 
+# One partition per order month; COPY routes each row to its month
+if FACT_PARTITIONING == "month":
+    months = fact_months(FACT_FILE) if os.path.exists(FACT_FILE) else []
+    ensure_month_partitions(conn, months)
+    print(f"  ✅ fact_orders partitions ({len(months)} months + default)")
+
+# Foreign keys are declared after the load (dimension TRUNCATEs would cascade into fact_orders)
+drop_foreign_keys(conn)
+
 print()
 
 # ===================================================================
-# 4. LOAD DATA FROM CSV
+# 4. LOAD DATA FROM CSV / PARQUET
 # ===================================================================
-print("[LOAD] Loading data from CSV files...\n")
+print(f"[LOAD] Loading data from {MART_FORMAT.upper()} files (method: {LOAD_METHOD})...\n")
 
-def load_csv_to_postgres(csv_file, table_name):
-    """Load CSV into PostgreSQL table"""
-    if not os.path.exists(csv_file):
-        print(f"  ⚠️  {csv_file} not found, skipping...")
-        return 0
-    
-    try:
-        df = pd.read_csv(csv_file)
-        
-        # Clear table first
-        cursor.execute(f"TRUNCATE TABLE {table_name} CASCADE")
-        
-        # Prepare columns and values
+def insert_rows_individually(conn, csv_file, table_name):
+    """Row-by-row INSERT fallback (debugging only: one round trip per row)"""
+    cursor = conn.cursor()
+    insert_count = 0
+    # Read CSV in chunks so even the debug path keeps memory flat
+    if is_parquet(csv_file):
+        frames = [read_frame(csv_file)]
+    else:
+        frames = pd.read_csv(csv_file, chunksize=COPY_BATCH_SIZE)
+    for df in frames:
         columns = df.columns.tolist()
-        
-        # Insert data row by row
-        insert_count = 0
+        placeholders = ", ".join(["%s"] * len(columns))
+        col_names = ", ".join(columns)
+        query = f"INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})"
+
         for idx, row in df.iterrows():
-            placeholders = ", ".join(["%s"] * len(columns))
-            col_names = ", ".join(columns)
-            query = f"INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})"
-            
             try:
                 # Convert NaN to None for proper NULL handling
                 values = tuple(None if pd.isna(v) else v for v in row)
@@ -211,52 +284,194 @@ def load_csv_to_postgres(csv_file, table_name):
                 insert_count += 1
             except Exception as e:
                 print(f"    Warning: Row {idx} error: {e}")
+    cursor.close()
+    return insert_count
+
+
+def validate_fact_file(fact_file):
+    """Split fact_orders into clean and quarantined rows; returns the file to load"""
+    with METRICS.stage("validate_source", "fact_orders", nbytes=disk_usage(fact_file)) as stage:
+        key_sets = {}
+        for _, table, dim_column, _ in SURROGATE_KEY_REFERENCES:
+            dim_file = mart_path(table, MART_FORMAT)
+            if os.path.exists(dim_file):
+                key_sets[table] = key_set(read_frame(dim_file, columns=[dim_column])[dim_column])
+        summary = split_clean_rows(
+            fact_file, VALIDATED_FACT_FILE, QUARANTINE_FILE,
+            SURROGATE_KEY_REFERENCES, key_sets, chunk_rows=COPY_BATCH_SIZE
+        )
+        stage.update(rows=summary["rows"], quarantined=summary["quarantined"])
+    if summary["quarantined"]:
+        reasons = ", ".join(f"{code} {count:,}" for code, count in sorted(summary["reasons"].items()))
+        print(f"  ⚠️  fact_orders: {summary['quarantined']:,} of {summary['rows']:,} rows "
+              f"quarantined to {QUARANTINE_FILE} ({reasons})")
+    return VALIDATED_FACT_FILE
+
+
+def load_csv_to_postgres(conn, csv_file, table_name):
+    """Load a mart table file (CSV or Parquet) into PostgreSQL table"""
+    if not os.path.exists(csv_file):
+        print(f"  ⚠️  {csv_file} not found, skipping...")
+        return 0
+    
+    try:
+        # Only fact rows that pass validation reach the database
+        if table_name == "fact_orders" and PRELOAD_VALIDATION:
+            csv_file = validate_fact_file(csv_file)
         
-        conn.commit()
-        print(f"  ✅ {table_name:.<40} {insert_count:>8,} records")
+        # Clear table first
+        with METRICS.stage("truncate", table_name):
+            cursor = conn.cursor()
+            cursor.execute(f"TRUNCATE TABLE {table_name} CASCADE")
+            cursor.close()
+        
+        if LOAD_METHOD == "insert":
+            with METRICS.stage("insert", table_name) as stage:
+                start = time.perf_counter()
+                insert_count = insert_rows_individually(conn, csv_file, table_name)
+                elapsed = time.perf_counter() - start
+                stage.update(rows=insert_count, nbytes=disk_usage(csv_file))
+        else:
+            copy_stats = {}
+            insert_count, elapsed = copy_table(
+                conn, csv_file, table_name, batch_size=COPY_BATCH_SIZE, stats=copy_stats
+            )
+            METRICS.record("read", table_name, insert_count, disk_usage(csv_file),
+                           copy_stats["read_s"])
+            METRICS.record("insert", table_name, insert_count, copy_stats["bytes"],
+                           copy_stats["insert_s"])
+        
+        with METRICS.stage("commit", table_name):
+            conn.commit()
+        rate = rows_per_second(insert_count, elapsed)
+        print(f"  ✅ {table_name:.<40} {insert_count:>8,} records  ({rate:>10,.0f} rows/s)")
         return insert_count
         
     except Exception as e:
+        # Re-raised: run_parallel_load skips the dependent tables and fails the run
+        conn.rollback()
         print(f"  ❌ Error loading {table_name}: {e}")
-        return 0
+        raise
 
-# Load tables
-print("  [DIMENSION TABLES]")
-load_csv_to_postgres("dim_date.csv", "dim_date")
-load_csv_to_postgres("dim_customer.csv", "dim_customer")
-load_csv_to_postgres("dim_product.csv", "dim_product")
-load_csv_to_postgres("dim_country.csv", "dim_country")
-load_csv_to_postgres("dim_platform.csv", "dim_platform")
-load_csv_to_postgres("dim_marketing_channel.csv", "dim_marketing_channel")
 
-print("\n  [FACT TABLES]")
-load_csv_to_postgres("fact_orders.csv", "fact_orders")
-
-print()
+def csv_load_task(table_name, depends_on=()):
+    """Build a LoadTask that loads <table_name>.csv (or .parquet) into table_name"""
+    return LoadTask(
+        table_name,
+        lambda task_conn: load_csv_to_postgres(
+            task_conn, mart_path(table_name, MART_FORMAT), table_name
+        ),
+        list(depends_on),
+    )
 
-# ===================================================================
-# 5. CREATE INDEXES
-# ===================================================================
-print("[INDEX] Creating indexes...\n")
 
-indexes = [
-    "CREATE INDEX IF NOT EXISTS idx_fact_customer ON fact_orders(customer_id)",
-    "CREATE INDEX IF NOT EXISTS idx_fact_product ON fact_orders(product_id)",
-    "CREATE INDEX IF NOT EXISTS idx_fact_order ON fact_orders(order_id)",
-    "CREATE INDEX IF NOT EXISTS idx_fact_date ON fact_orders(date_key)",
+# Dimension tables are independent; fact_orders waits for the dimensions it references
+dimension_tables = [
+    "dim_date",
+    "dim_customer",
+    "dim_product",
+    "dim_country",
+    "dim_platform",
+    "dim_marketing_channel",
+    "dim_account_creation_method",
 ]
+load_tasks = [csv_load_task(table) for table in dimension_tables]
+load_tasks.append(csv_load_task("fact_orders", depends_on=dimension_tables))
 
-for idx_query in indexes:
+print(f"  Loading {len(load_tasks)} tables with {LOAD_WORKERS} workers...\n")
+load_start = time.perf_counter()
+
+pool = db.get_pool(
+    LOAD_WORKERS,
+    options=staging_connect_options() if REFRESH_MODE == "staged" else None
+)
+try:
     try:
-        cursor.execute(idx_query)
-        idx_name = idx_query.split()[-5]
-        print(f"  ✅ {idx_name}")
+        load_results = run_parallel_load(pool, load_tasks, workers=LOAD_WORKERS)
     except Exception as e:
-        pass
+        print(f"\n❌ Load failed: {e}")
+        exit(1)
+
+    total_loaded = sum(count for count, _ in load_results.values())
+    print(f"\n  Loaded {total_loaded:,} records in {time.perf_counter() - load_start:.1f}s")
+
+    print()
+
+    # ===================================================================
+    # 5. CREATE INDEXES
+    # ===================================================================
+    # Indexes are built after the load so COPY does not maintain them row by row
+    print("[INDEX] Building secondary indexes...\n")
 
-conn.commit()
+    index_start = time.perf_counter()
+    with METRICS.stage("index", "fact_orders") as stage:
+        built, failed = build_secondary_indexes(
+            pool, workers=LOAD_WORKERS, indexes=SURROGATE_KEY_INDEXES
+        )
+        stage["rows"] = load_results.get("fact_orders", (0, 0))[0]
+    for idx_name in built:
+        print(f"  ✅ {idx_name}")
+    for idx_name, error in failed.items():
+        print(f"  ❌ {idx_name}: {error}")
+    print(f"\n  Built {len(built)} indexes in {time.perf_counter() - index_start:.1f}s")
+finally:
+    db.close_pool()
+
+print("\n[ANALYZE] Refreshing planner statistics...")
+with METRICS.stage("analyze"):
+    analyze_tables(conn, dimension_tables + ["fact_orders"])
+print("  ✅ ANALYZE complete")
 print()
 
+# Declare the foreign keys without checking existing rows, then validate
+# them: one anti-join per constraint that does not block readers
+print("[CONSTRAINTS] Declaring and validating foreign keys...\n")
+with METRICS.stage("constraints", "fact_orders") as stage:
+    add_foreign_keys(conn)
+    validated, failed = validate_foreign_keys(conn)
+    stage["rows"] = load_results.get("fact_orders", (0, 0))[0]
+for fk_name in validated:
+    print(f"  ✅ {fk_name}")
+for fk_name, error in failed.items():
+    print(f"  ❌ {fk_name}: {error}")
+print()
+
+if REFRESH_MODE == "staged":
+    print("[SWAP] Validating staging tables...\n")
+    staged_tables = dimension_tables + ["fact_orders"]
+    with METRICS.stage("validate", "staging"):
+        problems = validate_staging(conn, staged_tables)
+    if problems:
+        for problem in problems:
+            print(f"  ❌ {problem}")
+        print("\n❌ Staging validation failed; live tables left unchanged")
+        exit(1)
+    with METRICS.stage("swap"):
+        swap_staging_into_place(conn, staged_tables)
+    cursor.execute("SET search_path TO public")
+    print("  ✅ Staging tables swapped into place\n")
+
+# Views bind to the tables they were created on, so (re)create it after any swap
+cursor.execute(LABELED_FACT_VIEW_SQL)
+print(f"[VIEW] ✅ {LABELED_FACT_VIEW} (fact_orders joined to its dimensions)\n")
+
+if ROLLUP_REFRESH:
+    # Delete + insert in one transaction: readers see the old rollup until commit
+    conn.autocommit = False
+    with METRICS.stage("rollup", ROLLUP_TABLE) as stage:
+        stage["rows"] = refresh_rollup(conn, source=LABELED_FACT_VIEW)
+        conn.commit()
+    conn.autocommit = True
+    print(f"[ROLLUP] ✅ {ROLLUP_TABLE}: {stage['rows']:,} rows\n")
+
+if PROFILE_AFTER_LOAD:
+    # One scan per table; stored in profile_history under this run's id
+    print(f"[PROFILE] Profiling columns (load {METRICS.run_id})...\n")
+    with METRICS.stage("profile"):
+        _, baseline, drifts = profile_tables(conn, METRICS.run_id, dimension_tables + ["fact_orders"])
+    print_drift(baseline, drifts)
+    print()
+
 # ===================================================================
 # 6. VALIDATION
 # ===================================================================
@@ -271,10 +486,11 @@ queries = [
     ("Dates loaded", "SELECT COUNT(*) FROM fact_orders WHERE date_key IS NOT NULL"),
 ]
 
-for label, query in queries:
-    cursor.execute(query)
-    result = cursor.fetchone()[0]
-    print(f"  {label:.<35} {result:>10,}")
+with METRICS.stage("validate"):
+    for label, query in queries:
+        cursor.execute(query)
+        result = cursor.fetchone()[0]
+        print(f"  {label:.<35} {result:>10,}")
 
 print()
 
@@ -288,15 +504,11 @@ POSTGRESQL CONNECTION INFO:
   Database:     {DATABASE}
   Username:     {USERNAME}
 
-PYTHON CONNECTION:
-  import psycopg2
-  conn = psycopg2.connect(
-      host="{HOST}",
-      port={PORT},
-      database="{DATABASE}",
-      user="{USERNAME}",
-      password="YOUR_PASSWORD"
-  )
+PYTHON CONNECTION (settings from .env):
+  import db
+  conn = db.connect()
+  for row in db.stream_query(conn, "SELECT * FROM fact_orders"):
+      ...
 
 TABLES CREATED:
   ✅ dim_date
@@ -305,33 +517,37 @@ TABLES CREATED:
   ✅ dim_country
   ✅ dim_platform
   ✅ dim_marketing_channel
+  ✅ dim_account_creation_method
   ✅ fact_orders
+  ✅ {LABELED_FACT_VIEW} (view)
+  ✅ {ROLLUP_TABLE} (monthly rollup)
 
 SAMPLE QUERIES:
 
   -- Top 10 customers by order count
-  SELECT customer_id, COUNT(*) as order_count 
-  FROM fact_orders 
-  GROUP BY customer_id 
+  SELECT c.customer_id, COUNT(*) as order_count 
+  FROM fact_orders f
+  JOIN dim_customer c ON f.customer_key = c.customer_key
+  GROUP BY c.customer_id 
   ORDER BY order_count DESC LIMIT 10;
 
   -- Top products
   SELECT p.product_id, p.product_name, COUNT(*) as orders
   FROM fact_orders f
-  JOIN dim_product p ON f.product_id = p.product_id
+  JOIN dim_product p ON f.product_key = p.product_key
   GROUP BY p.product_id, p.product_name
   ORDER BY orders DESC LIMIT 5;
 
   -- Orders by country
   SELECT c.country_code, COUNT(*) as orders
   FROM fact_orders f
-  JOIN dim_customer c ON f.customer_id = c.customer_id
+  JOIN dim_country c ON f.country_key = c.country_key
   GROUP BY c.country_code
   ORDER BY orders DESC;
 
-  -- Orders by platform
+  -- Orders by platform (the view joins the dimensions back on)
   SELECT purchase_platform, COUNT(*) as orders
-  FROM fact_orders
+  FROM {LABELED_FACT_VIEW}
   GROUP BY purchase_platform;
 """
 
@@ -11,160 +11,330 @@ Output:
     dim_platform.csv
     dim_marketing_channel.csv
     dim_country.csv
-    fact_orders.csv
+    dim_account_creation_method.csv
+    fact_orders.csv    (integer surrogate keys instead of dimension strings)
+
+With MART_FORMAT=parquet each table is written as <table>.parquet instead,
+and fact_orders.parquet is a directory partitioned by order_year_month.
+
+With BUILD_ENGINE=streaming the input is processed STREAM_CHUNK_ROWS rows at
+a time: each chunk's new dimension members and encoded fact rows are
+appended to the output files, so only one chunk plus the dimensions is in
+memory and inputs larger than RAM build in a single pass.
+
+With DIMENSION_WORKERS > 1 the members of every dimension are first
+collected in one scan spread over a process pool (see dimension_extract),
+so the chunks only look keys up.
 """
 
+import os
+import time
+
 import pandas as pd
 
+from build_watermark import (
+    DEFAULT_WATERMARK_FILE,
+    check_watermark,
+    complete_rows_end,
+    load_watermark,
+    read_rows_after,
+    save_watermark,
+)
+from date_parsing import parse_dates
+from dimension_extract import (
+    CUSTOMER_COLUMNS,
+    DATE_COLUMNS,
+    TEXT_COLUMNS,
+    date_key_of,
+    extract_dimensions,
+)
+from load_metrics import LoadMetrics
+from parquet_io import (
+    DEFAULT_FACT_PARTITION_COLUMN,
+    disk_usage,
+    empty_frame,
+    mart_path,
+    read_frame,
+    write_parquet,
+)
+from surrogate_keys import DIMENSION_KEYS, assign_keys
+
 INPUT_CLEAN = r"C:\Users\reddy\Downloads\gamezone-business-intelligence\gamezone_orders_clean.csv"
 
-print("=== Building dimension and fact tables from cleaned GameZone data ===")
+# Per-stage timings are appended to LOAD_METRICS_FILE (NDJSON)
+METRICS = LoadMetrics("setup_02")
 
-# -------------------------------------------------------------------
-# 1. LOAD CLEAN DATA
-# -------------------------------------------------------------------
-df = pd.read_csv(INPUT_CLEAN)
+# "csv" or "parquet" (typed, zstd-compressed; requires pyarrow)
+MART_FORMAT = os.getenv('MART_FORMAT', 'csv').lower()
 
-print(f"Loaded cleaned data: {df.shape[0]:,} rows, {df.shape[1]} columns")
-print("Columns:", list(df.columns))
+# Parquet only: split fact_orders into one directory per value ("" for a single file)
+FACT_PARQUET_PARTITION = os.getenv('FACT_PARQUET_PARTITION', DEFAULT_FACT_PARTITION_COLUMN)
 
-# Ensure order_date exists
-if "order_date" not in df.columns:
-    raise ValueError("Column 'order_date' not found in cleaned data.")
+# "full" rebuilds every table; "incremental" processes only rows appended to
+# the input since the last build, appends unseen dimension members and
+# writes the new orders to fact_orders_delta as well as fact_orders
+BUILD_MODE = os.getenv('BUILD_MODE', 'full').lower()
+WATERMARK_FILE = os.getenv('BUILD_WATERMARK_FILE', DEFAULT_WATERMARK_FILE)
 
-# Explicitly convert order_date to datetime here (critical!)
-# Try multiple formats and use coerce for errors
-df["order_date"] = pd.to_datetime(df["order_date"], format='mixed', errors="coerce")
+# "memory" reads the whole input at once; "streaming" processes it in chunks
+BUILD_ENGINE = os.getenv('BUILD_ENGINE', 'memory').lower()
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 1000000))
 
-# Drop rows with invalid dates
-df = df.dropna(subset=['order_date'])
+# Processes scanning the input for dimension members (1 = derive them chunk by chunk)
+DIMENSION_WORKERS = int(os.getenv('DIMENSION_WORKERS', 1))
 
-print("order_date dtype after to_datetime:", df["order_date"].dtype)
-print(f"Rows after date cleanup: {df.shape[0]:,}")
+# Fixed CSV timestamp format: pandas drops the time part when every value in
+# a frame is midnight, which would differ from chunk to chunk
+CSV_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-# -------------------------------------------------------------------
-# 2. DIM_DATE
-# -------------------------------------------------------------------
-date_cols = ["order_date", "order_year", "order_month", "order_month_name", "order_year_month"]
 
-missing_date_cols = [c for c in date_cols if c not in df.columns]
-if missing_date_cols:
-    raise ValueError(f"Missing expected date columns in cleaned data: {missing_date_cols}")
+def write_table(frame, table, partition_by=None, append=False):
+    """Write (or append to) one output table in MART_FORMAT and record its size"""
+    path = mart_path(table, MART_FORMAT)
+    with METRICS.stage("write", table, rows=len(frame)) as stage:
+        if MART_FORMAT == "parquet":
+            write_parquet(frame, path, partition_by=partition_by, append=append)
+        elif append:
+            frame.to_csv(path, mode="a", header=False, index=False, date_format=CSV_DATE_FORMAT)
+        else:
+            frame.to_csv(path, index=False, date_format=CSV_DATE_FORMAT)
+        stage["nbytes"] = disk_usage(path)
+    return path
 
-dim_date = (
-    df[date_cols]
-    .drop_duplicates()
-    .reset_index(drop=True)
-)
 
-# enforce datetime again on this subset (extra safety)
-dim_date["order_date"] = pd.to_datetime(dim_date["order_date"], errors="coerce")
+def unseen_members(members, key_column, known):
+    """Dimension rows that are not in known yet"""
+    if known is None:
+        return members
+    return members[~members[key_column].isin(known[key_column])]
 
-# drop rows where order_date is NaT
-dim_date = dim_date.dropna(subset=["order_date"])
 
-# build date_key safely
-dim_date["date_key"] = dim_date["order_date"].dt.strftime("%Y%m%d").astype(int)
+def timed_chunks(chunks):
+    """Yield input chunks, recording how long each took to parse"""
+    start = time.perf_counter()
+    for chunk in chunks:
+        METRICS.record("read", "gamezone_orders_clean", len(chunk),
+                       duration=time.perf_counter() - start)
+        yield chunk
+        start = time.perf_counter()
 
-dim_date = dim_date[
-    ["date_key", "order_date", "order_year", "order_month", "order_month_name", "order_year_month"]
-]
 
-dim_date.to_csv("dim_date.csv", index=False)
-print(f"[dim_date] Saved dim_date.csv → {dim_date.shape[0]:,} rows")
+def prepare_orders(df):
+    """Parse order_date (each distinct string once) and drop rows without a valid date"""
+    # Ensure order_date exists
+    if "order_date" not in df.columns:
+        raise ValueError("Column 'order_date' not found in cleaned data.")
+    missing_date_cols = [c for c in DATE_COLUMNS if c not in df.columns]
+    if missing_date_cols:
+        raise ValueError(f"Missing expected date columns in cleaned data: {missing_date_cols}")
 
-# -------------------------------------------------------------------
-# 3. DIM_CUSTOMER
-# -------------------------------------------------------------------
-customer_cols = [c for c in ["customer_id", "country_code", "account_creation_method"] if c in df.columns]
+    with METRICS.stage("transform", "order_date", rows=len(df)):
+        df["order_date"] = parse_dates(df["order_date"])
+    return df.dropna(subset=["order_date"])
 
-if customer_cols:
-    dim_customer = (
-        df[customer_cols]
-        .drop_duplicates()
-        .reset_index(drop=True)
-    )
-    dim_customer.to_csv("dim_customer.csv", index=False)
-    print(f"[dim_customer] Saved dim_customer.csv → {dim_customer.shape[0]:,} rows")
-else:
-    print("[dim_customer] No customer-related columns found, skipping.")
-
-# -------------------------------------------------------------------
-# 4. DIM_PRODUCT
-# -------------------------------------------------------------------
-product_cols = [c for c in ["product_id", "product_name"] if c in df.columns]
-
-if product_cols:
-    dim_product = (
-        df[product_cols]
-        .drop_duplicates()
-        .reset_index(drop=True)
-    )
-    dim_product.to_csv("dim_product.csv", index=False)
-    print(f"[dim_product] Saved dim_product.csv → {dim_product.shape[0]:,} rows")
-else:
-    print("[dim_product] No product-related columns found, skipping.")
-
-# -------------------------------------------------------------------
-# 5. DIM_PLATFORM
-# -------------------------------------------------------------------
-if "purchase_platform" in df.columns:
-    dim_platform = (
-        df[["purchase_platform"]]
-        .drop_duplicates()
-        .reset_index(drop=True)
-        .rename(columns={"purchase_platform": "platform"})
-    )
-    dim_platform.to_csv("dim_platform.csv", index=False)
-    print(f"[dim_platform] Saved dim_platform.csv → {dim_platform.shape[0]:,} rows")
-else:
-    print("[dim_platform] purchase_platform column not found, skipping.")
-
-# -------------------------------------------------------------------
-# 6. DIM_MARKETING_CHANNEL
-# -------------------------------------------------------------------
-if "marketing_channel" in df.columns:
-    dim_marketing_channel = (
-        df[["marketing_channel"]]
-        .drop_duplicates()
-        .reset_index(drop=True)
-    )
-    dim_marketing_channel.to_csv("dim_marketing_channel.csv", index=False)
-    print(f"[dim_marketing_channel] Saved dim_marketing_channel.csv → {dim_marketing_channel.shape[0]:,} rows")
-else:
-    print("[dim_marketing_channel] marketing_channel column not found, skipping.")
-
-# -------------------------------------------------------------------
-# 7. DIM_COUNTRY
-# -------------------------------------------------------------------
-if "country_code" in df.columns:
-    dim_country = (
-        df[["country_code"]]
-        .drop_duplicates()
-        .reset_index(drop=True)
+
+def build_dim_date(df, known):
+    """New dim_date rows (one per date_key) for the dates in df"""
+    with METRICS.stage("transform", "dim_date", rows=len(df)):
+        dim_date = df[DATE_COLUMNS].assign(date_key=date_key_of(df["order_date"]))
+        dim_date = dim_date.drop_duplicates(subset=["date_key"]).reset_index(drop=True)
+        dim_date = dim_date[["date_key"] + DATE_COLUMNS]
+    return unseen_members(dim_date, "date_key", known)
+
+
+def build_dimensions(df, known, tables=None):
+    """
+    Assign surrogate keys for every dimension present in df (or only tables).
+
+    known maps table -> dimension frame built so far (None before the first
+    chunk of a full build); existing members keep their keys.
+
+    Returns:
+        (fact_keys {key_column: per-row keys}, new_members {table: new rows})
+    """
+    fact_keys, new_members = {}, {}
+    for table, key_column, column_map in DIMENSION_KEYS:
+        source_cols = [c for c in column_map if c in df.columns]
+        if len(source_cols) != len(column_map) or (tables and table not in tables):
+            continue
+        with METRICS.stage("transform", table, rows=len(df)):
+            previous = known.get(table)
+            if previous is not None:
+                previous = previous.rename(columns={v: k for k, v in column_map.items()})
+            fact_keys[key_column], members = assign_keys(df, source_cols, key_column, existing=previous)
+            members = unseen_members(members, key_column, previous)
+            if table == "dim_customer":
+                # One row per customer; attributes from the customer's first order
+                customer_cols = [c for c in CUSTOMER_COLUMNS if c in df.columns]
+                members = members.merge(
+                    df[customer_cols].drop_duplicates(subset=["customer_id"]),
+                    on="customer_id",
+                    how="left"
+                )
+            new_members[table] = members.rename(columns=column_map)
+    return fact_keys, new_members
+
+
+def build_fact(df, fact_keys):
+    """fact_orders rows for df: natural columns replaced by their surrogate keys"""
+    with METRICS.stage("transform", "fact_orders", rows=len(df)):
+        encoded_cols = [c for _, key, column_map in DIMENSION_KEYS if key in fact_keys for c in column_map]
+        fact = df.drop(columns=encoded_cols).assign(**fact_keys)
+        fact["date_key"] = date_key_of(fact["order_date"])
+
+        # Rename unit_price to order_amount_usd for clarity
+        if "unit_price" in fact.columns:
+            fact = fact.rename(columns={"unit_price": "order_amount_usd"})
+    return fact
+
+
+def add_members(new_members, known, written, new_counts):
+    """Write each table's new members (appending once the table exists) and add them to known"""
+    for table, members in new_members.items():
+        if members.empty and table in written:
+            continue
+        write_table(members, table, append=table in written)
+        written.add(table)
+        known[table] = members if known[table] is None else pd.concat(
+            [known[table], members], ignore_index=True
+        )
+        new_counts[table] += len(members)
+
+
+def main():
+    print("=== Building dimension and fact tables from cleaned GameZone data ===")
+
+    # -------------------------------------------------------------------
+    # 1. OPEN CLEAN DATA
+    # -------------------------------------------------------------------
+    watermark = load_watermark(WATERMARK_FILE) if BUILD_MODE == "incremental" else None
+    rebuild_reason = check_watermark(INPUT_CLEAN, watermark) if BUILD_MODE == "incremental" else None
+    incremental = BUILD_MODE == "incremental" and rebuild_reason is None
+    if BUILD_MODE == "incremental" and not incremental:
+        print(f"⚠️  Incremental build not possible ({rebuild_reason}), rebuilding everything")
+
+    chunksize = STREAM_CHUNK_ROWS if BUILD_ENGINE == "streaming" else None
+    start_offset = watermark["offset"] if incremental else 0
+    with METRICS.stage("read", "gamezone_orders_clean") as stage:
+        if incremental:
+            # Only the rows appended since the last build are parsed
+            orders, input_end = read_rows_after(
+                INPUT_CLEAN, start_offset, dtype=TEXT_COLUMNS, chunksize=chunksize
+            )
+        else:
+            input_end = complete_rows_end(INPUT_CLEAN)
+            orders = pd.read_csv(INPUT_CLEAN, dtype=TEXT_COLUMNS, chunksize=chunksize)
+        stage["nbytes"] = input_end - start_offset
+
+    if incremental:
+        print(f"Incremental build: {input_end - start_offset:,} new bytes since {watermark['updated_at']}")
+        # The delta holds this run's orders only, even when there are none
+        write_table(empty_frame(mart_path("fact_orders", MART_FORMAT)), "fact_orders_delta")
+        if input_end == start_offset:
+            print("=== Nothing to do: no new orders ===")
+            return
+
+    chunks = timed_chunks(orders) if chunksize else [orders]
+    print(f"Build engine: {BUILD_ENGINE}" + (f" ({chunksize:,} rows per chunk)" if chunksize else ""))
+
+    # Dimensions built so far (seeded from the previous build when incremental)
+    known = {
+        table: read_frame(mart_path(table, MART_FORMAT)) if incremental else None
+        for table in ["dim_date"] + [table for table, _, _ in DIMENSION_KEYS]
+    }
+    written = {table for table, frame in known.items() if frame is not None}
+    new_counts = {table: 0 for table in known}
+    previous_max = (
+        pd.Timestamp(watermark["max_order_date"])
+        if incremental and watermark["max_order_date"] else None
     )
-    dim_country.to_csv("dim_country.csv", index=False)
-    print(f"[dim_country] Saved dim_country.csv → {dim_country.shape[0]:,} rows")
-else:
-    print("[dim_country] country_code column not found, skipping.")
-
-# -------------------------------------------------------------------
-# 8. FACT_ORDERS
-# -------------------------------------------------------------------
-fact = df.copy()
-
-# Join date_key from dim_date
-fact = fact.merge(
-    dim_date[["order_date", "date_key"]],
-    on="order_date",
-    how="left"
-)
+    max_order_date = previous_max
+    rows_read = rows_kept = late_rows = 0
+    # Until the first non-empty chunk is written, a full build still has the
+    # previous build's fact_orders on disk: that write replaces it
+    fact_written = False
+
+    # -------------------------------------------------------------------
+    # 2. DIMENSION MEMBERS IN ONE PARALLEL SCAN (DIMENSION_WORKERS > 1)
+    # -------------------------------------------------------------------
+    if DIMENSION_WORKERS > 1:
+        with METRICS.stage("extract", "dimensions", nbytes=input_end - start_offset) as stage:
+            stage["workers"] = DIMENSION_WORKERS
+            extracted = extract_dimensions(
+                INPUT_CLEAN, DIMENSION_WORKERS, start=start_offset or None, end=input_end,
+                chunk_rows=STREAM_CHUNK_ROWS
+            )
+        print(f"Extracted dimension members with {DIMENSION_WORKERS} workers")
+        new_members = {}
+        for table, distinct in extracted.items():
+            if table == "dim_date":
+                new_members[table] = build_dim_date(distinct, known[table])
+            else:
+                new_members.update(build_dimensions(distinct, known, tables=[table])[1])
+        # The chunks below then only look keys up; every member is already known
+        add_members(new_members, known, written, new_counts)
+
+    # -------------------------------------------------------------------
+    # 3. DIMENSIONS AND FACT_ORDERS, CHUNK BY CHUNK
+    # -------------------------------------------------------------------
+    for chunk_number, df in enumerate(chunks):
+        rows_read += len(df)
+        df = prepare_orders(df)
+        rows_kept += len(df)
+        if df.empty:
+            continue
+
+        chunk_max = df["order_date"].max()
+        if previous_max is not None:
+            late_rows += int((df["order_date"] < previous_max).sum())
+        max_order_date = chunk_max if max_order_date is None else max(max_order_date, chunk_max)
+
+        # dim_date and the keyed dimensions: only members not written yet
+        new_dates = build_dim_date(df, known["dim_date"])
+        fact_keys, new_members = build_dimensions(df, known)
+        new_members["dim_date"] = new_dates
+        add_members(new_members, known, written, new_counts)
+
+        fact = build_fact(df, fact_keys)
+        del df
+        # Later writes (and incremental builds) append to what is already written
+        partition_by = FACT_PARQUET_PARTITION if FACT_PARQUET_PARTITION in fact.columns else None
+        write_table(fact, "fact_orders", partition_by=partition_by, append=incremental or fact_written)
+        if incremental:
+            # The day's orders on their own, for loaders that append instead of reloading
+            write_table(fact, "fact_orders_delta", append=fact_written)
+        fact_written = True
+        print(f"  chunk {chunk_number + 1}: {len(fact):,} orders")
+
+    if not fact_written and not incremental:
+        # No order survived date cleanup: an empty table, not the previous build's rows
+        header = prepare_orders(pd.read_csv(INPUT_CLEAN, dtype=TEXT_COLUMNS, nrows=0))
+        write_table(build_fact(header, build_dimensions(header, known)[0]), "fact_orders")
+
+    print(f"Loaded cleaned data: {rows_read:,} rows, {rows_kept:,} after date cleanup")
+    if late_rows:
+        print(f"⚠️  {late_rows:,} new rows are dated before the previous watermark ({previous_max})")
+
+    # -------------------------------------------------------------------
+    # 4. SUMMARY
+    # -------------------------------------------------------------------
+    for table, count in new_counts.items():
+        if known[table] is None:
+            print(f"[{table}] source column(s) not found, skipping.")
+            continue
+        path = mart_path(table, MART_FORMAT)
+        print(f"[{table}] Saved {path} → {count:,} new rows ({len(known[table]):,} total)")
+    print(f"[fact_orders] Saved {mart_path('fact_orders', MART_FORMAT)} → {rows_kept:,} rows")
+    if incremental:
+        print(f"[fact_orders_delta] Saved {mart_path('fact_orders_delta', MART_FORMAT)} → {rows_kept:,} rows")
+
+    total_rows = (watermark["rows"] if incremental else 0) + rows_read
+    save_watermark(INPUT_CLEAN, input_end, total_rows, max_order_date, path=WATERMARK_FILE)
+    print(f"[watermark] {WATERMARK_FILE}: {total_rows:,} rows processed, up to {max_order_date}")
 
-# Rename unit_price to order_amount_usd for clarity
-if "unit_price" in fact.columns:
-    fact = fact.rename(columns={"unit_price": "order_amount_usd"})
+    print("=== Dimension and fact tables generation completed ===")
 
-fact.to_csv("fact_orders.csv", index=False)
-print(f"[fact_orders] Saved fact_orders.csv → {fact.shape[0]:,} rows, {fact.shape[1]} columns")
 
-print("=== Dimension and fact tables generation completed ===")
+# The guard keeps DIMENSION_WORKERS processes (spawned on Windows) from re-running the build
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,33 @@
 """
 Verify all Dimension Tables are Loaded in PostgreSQL
+
+Usage:
+    python setup_03_verify_dimension_tables.py [--fast]
+
+--fast estimates counts, distributions and null checks from catalog
+statistics and block samples (approx_stats) and prints each figure with its
+error bound; without it every figure is exact.
 """
 
+import sys
+
 import psycopg2
 from datetime import datetime
 
-print("[INFO] === Verifying GameZone Dimension Tables ===\n")
+import db
+from approx_stats import (
+    add_estimates, estimated_rows, sample_percent, sampled_group_totals, sampled_range, sampled_totals,
+)
 
-# Configuration
-HOST = "127.0.0.1"
-PORT = 5432
-DATABASE = "gamezone_analytics"
-USERNAME = "postgres"
-PASSWORD = "Litureddy098@"
+FAST = "--fast" in sys.argv[1:]
 
+print("[INFO] === Verifying GameZone Dimension Tables ===\n")
+if FAST:
+    print("[INFO] --fast: estimated figures, [low – high] is the error bound\n")
+
+# Connection settings come from .env (DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, ...)
 try:
-    conn = psycopg2.connect(
-        host=HOST,
-        port=PORT,
-        user=USERNAME,
-        password=PASSWORD,
-        database=DATABASE
-    )
+    conn = db.connect(autocommit=True)
     cursor = conn.cursor()
     print("✅ Connected to PostgreSQL\n")
     
@@ -44,19 +50,23 @@ dim_tables = [
 ]
 
 results = {}
+row_estimates = estimated_rows(cursor) if FAST else {}
 
 for table in dim_tables:
     try:
-        # Get row count
-        cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        count = cursor.fetchone()[0]
+        # Get row count (reltuples in --fast mode)
+        if table in row_estimates:
+            count = row_estimates[table]
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            count = cursor.fetchone()[0]
         
-        # Get column names
-        cursor.execute(f"""
+        # Get column names (same statement for every table: prepared once)
+        db.execute_prepared(cursor, "table_columns", """
             SELECT column_name FROM information_schema.columns 
-            WHERE table_name = '{table}'
+            WHERE table_name = $1
             ORDER BY ordinal_position
-        """)
+        """, (table,))
         columns = [row[0] for row in cursor.fetchall()]
         
         # Get sample data
@@ -69,7 +79,7 @@ for table in dim_tables:
             'samples': samples
         }
         
-        print(f"  ✅ {table:.<40} {count:>10,} rows")
+        print(f"  ✅ {table:.<40} {count:>10,.0f} rows")
         
     except psycopg2.Error as e:
         print(f"  ❌ {table:.<40} Error: {e}")
@@ -86,7 +96,7 @@ for table, info in results.items():
     if 'error' not in info:
         print(f"📊 {table.upper()}")
         print(f"   Columns ({len(info['columns'])}): {', '.join(info['columns'])}")
-        print(f"   Total Records: {info['count']:,}")
+        print(f"   Total Records: {info['count']:,.0f}")
         if info['samples']:
             print(f"   Sample Data:")
             for sample in info['samples'][:2]:  # Show first 2 samples
@@ -105,10 +115,37 @@ validation_queries = {
     "Marketing Channels": "SELECT marketing_channel, COUNT(*) as count FROM dim_marketing_channel GROUP BY marketing_channel",
 }
 
+# --fast: the same figures from a sample of each table
+# (query name -> (table, group column) for distributions, None for the date range)
+fast_validation = {
+    "Dates Range": None,
+    "Customers by Country": ("dim_customer", "country_code"),
+    "Platform Distribution": ("dim_platform", "platform"),
+    "Marketing Channels": ("dim_marketing_channel", "marketing_channel"),
+}
+
+
+def table_percent(table):
+    """Sample percent for table (whole table when its size is unknown)"""
+    return sample_percent(row_estimates[table]) if table in row_estimates else 100.0
+
+
 for query_name, query in validation_queries.items():
     print(f"  📈 {query_name}")
-    cursor.execute(query)
-    results_data = cursor.fetchall()
+    if FAST and fast_validation[query_name] is None:
+        min_date, max_date, exact = sampled_range(cursor, "dim_date", "order_date", table_percent("dim_date"))
+        results_data = [(min_date, max_date)]
+        if not exact:
+            print("     (sampled: the true range is at least this wide)")
+    elif FAST:
+        table, column = fast_validation[query_name]
+        counts = sampled_group_totals(cursor, table, f"t.{column}", "1", table_percent(table))
+        results_data = sorted(counts.items(), key=lambda item: item[1].value, reverse=True)
+        if query_name == "Customers by Country":
+            results_data = results_data[:10]
+    else:
+        cursor.execute(query)
+        results_data = cursor.fetchall()
     for row in results_data:
         if len(row) == 2:
             print(f"     {row[0]}: {row[1]}")
@@ -121,7 +158,7 @@ for query_name, query in validation_queries.items():
 # ===================================================================
 print("[SUMMARY] Table Load Summary:\n")
 
-total_records = sum(info.get('count', 0) for info in results.values() if 'error' not in info)
+total_records = add_estimates(info.get('count', 0) for info in results.values() if 'error' not in info)
 
 summary_data = [
     ("dim_date", results.get('dim_date', {}).get('count', 0), "dates"),
@@ -135,10 +172,10 @@ summary_data = [
 print("  Table                    Records      Description")
 print("  " + "="*55)
 for table, count, desc in summary_data:
-    status = "✅" if count > 0 else "⚠️"
-    print(f"  {status} {table:.<25} {count:>8,}  ({desc})")
+    status = "✅" if count else "⚠️"
+    print(f"  {status} {table:.<25} {count:>8,.0f}  ({desc})")
 
-print(f"\n  Total Dimension Records: {total_records:,}\n")
+print(f"\n  Total Dimension Records: {total_records:,.0f}\n")
 
 # ===================================================================
 # DATA INTEGRITY CHECKS
@@ -153,9 +190,16 @@ integrity_checks = [
 ]
 
 for table, column, description in integrity_checks:
-    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")
-    null_count = cursor.fetchone()[0]
-    status = "✅ PASS" if null_count == 0 else f"⚠️ WARNING ({null_count} nulls)"
+    if FAST:
+        null_count = sampled_totals(
+            cursor, table, {"nulls": f"(t.{column} IS NULL)::int"}, table_percent(table)
+        )["nulls"]
+    else:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")
+        null_count = cursor.fetchone()[0]
+    status = f"✅ PASS ({null_count} nulls)" if FAST and not null_count else (
+        "✅ PASS" if not null_count else f"⚠️ WARNING ({null_count} nulls)"
+    )
     print(f"  {status}: {description}")
 
 print()
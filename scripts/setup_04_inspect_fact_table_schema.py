@@ -2,22 +2,11 @@
 Check fact_orders table structure
 """
 
-import psycopg2
-
-HOST = "127.0.0.1"
-PORT = 5432
-DATABASE = "gamezone_analytics"
-USERNAME = "postgres"
-PASSWORD = "Litureddy098@"
+import db
 
+# Connection settings come from .env (DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, ...)
 try:
-    conn = psycopg2.connect(
-        host=HOST,
-        port=PORT,
-        user=USERNAME,
-        password=PASSWORD,
-        database=DATABASE
-    )
+    conn = db.connect()
     cursor = conn.cursor()
     
     # Get column names and types
@@ -0,0 +1,218 @@
+"""
+Zero-downtime staged loads with an atomic table swap.
+
+A staged load writes every table into the "staging" schema (connections use
+search_path=staging,public, so the loaders' unqualified table names resolve
+to the staging copies), validates the result, and then moves the staging
+tables into "public" in a single transaction. Dashboard queries keep reading
+the previous tables until the swap commits and never see a truncated or
+half-loaded star schema. Swapping whole tables also leaves no DELETE bloat.
+
+Partitioned tables are moved together with their partitions (partitions
+are separate relations with their own schema).
+
+Views bind to tables by OID, so a view on a live table would follow it
+into the retired schema and be dropped with it. The swap re-creates every
+view that reads a swapped table (e.g. fact_orders_labeled) on the new
+tables in the same transaction.
+"""
+
+import time
+
+import psycopg2
+from psycopg2 import errors
+
+STAGING_SCHEMA = "staging"
+RETIRED_SCHEMA = "retired"
+
+# Refuse to swap if a table shrinks by more than this percentage
+DEFAULT_MAX_SHRINK_PCT = 50
+
+# The swap waits at most this long for dashboard queries to release a table
+DEFAULT_LOCK_TIMEOUT = "5s"
+DEFAULT_SWAP_RETRIES = 5
+
+
+def staging_connect_options(schema=STAGING_SCHEMA):
+    """libpq options that make unqualified table names resolve to staging first"""
+    return f"-c search_path={schema},public"
+
+
+def reset_staging_schema(conn):
+    """Start from an empty staging schema"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {STAGING_SCHEMA}")
+    cursor.close()
+    conn.commit()
+
+
+def _partitions(cursor, schema, table):
+    """[(partition_name, bound_expression), ...] of schema.table (empty if not partitioned)"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (f"{schema}.{table}",))
+    return cursor.fetchall()
+
+
+def _move_table(cursor, table, from_schema, to_schema):
+    """Move a table and, if partitioned, each of its partitions to another schema"""
+    partitions = _partitions(cursor, from_schema, table)
+    cursor.execute(f"ALTER TABLE {from_schema}.{table} SET SCHEMA {to_schema}")
+    for partition, _ in partitions:
+        cursor.execute(f"ALTER TABLE {from_schema}.{partition} SET SCHEMA {to_schema}")
+
+
+def clone_tables_into_staging(conn, tables):
+    """
+    Create empty staging copies of the live tables.
+
+    Columns, defaults, CHECK constraints and primary/unique keys are copied.
+    Secondary indexes are not: they are built after the load.
+    """
+    cursor = conn.cursor()
+    for table in tables:
+        # Partitioned tables keep their partition key and monthly partitions
+        cursor.execute(f"SELECT pg_get_partkeydef('public.{table}'::regclass)")
+        partition_key = cursor.fetchone()[0]
+        cursor.execute(
+            f"CREATE TABLE {STAGING_SCHEMA}.{table} "
+            f"(LIKE public.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            + (f" PARTITION BY {partition_key}" if partition_key else "")
+        )
+        for partition, bound in _partitions(cursor, "public", table):
+            cursor.execute(
+                f"CREATE TABLE {STAGING_SCHEMA}.{partition} "
+                f"PARTITION OF {STAGING_SCHEMA}.{table} {bound}"
+            )
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+        """, (f"public.{table}",))
+        for name, definition in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {STAGING_SCHEMA}.{table} ADD CONSTRAINT {name} {definition}")
+    cursor.close()
+    conn.commit()
+
+
+def validate_staging(conn, tables, max_shrink_pct=DEFAULT_MAX_SHRINK_PCT):
+    """
+    Sanity-check the staged tables before they go live.
+
+    Returns a list of problem descriptions (empty when the swap is safe).
+    """
+    cursor = conn.cursor()
+    problems = []
+    for table in tables:
+        cursor.execute(f"SELECT COUNT(*) FROM {STAGING_SCHEMA}.{table}")
+        staged = cursor.fetchone()[0]
+        if staged == 0:
+            problems.append(f"{table}: staging table is empty")
+            continue
+
+        cursor.execute("SELECT to_regclass(%s)", (f"public.{table}",))
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(f"SELECT COUNT(*) FROM public.{table}")
+            live = cursor.fetchone()[0]
+            if live and staged < live * (100 - max_shrink_pct) / 100:
+                problems.append(f"{table}: {staged:,} staged rows vs {live:,} live rows")
+
+    if "fact_orders" in tables and "dim_date" in tables:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {STAGING_SCHEMA}.fact_orders fo
+            WHERE fo.date_key IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM {STAGING_SCHEMA}.dim_date dd WHERE dd.date_key = fo.date_key
+            )
+        """)
+        orphans = cursor.fetchone()[0]
+        if orphans:
+            problems.append(f"fact_orders: {orphans:,} rows with unknown date_key")
+
+    cursor.close()
+    conn.rollback()
+    return problems
+
+
+def _dependent_views(cursor, tables):
+    """[(view, definition), ...] of the views that read any of the public tables"""
+    cursor.execute("""
+        SELECT DISTINCT v.oid::regclass::text, pg_get_viewdef(v.oid)
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass
+          AND d.refobjid = ANY(ARRAY(SELECT to_regclass(t) FROM unnest(%s::text[]) t))
+          AND v.relkind = 'v'
+          AND v.oid <> d.refobjid
+    """, ([f"public.{table}" for table in tables],))
+    return cursor.fetchall()
+
+
+def _recreate_view(cursor, view, definition):
+    """Point view at whatever its definition now resolves to (same transaction)"""
+    cursor.execute("SAVEPOINT recreate_view")
+    try:
+        # Keeps grants and views built on this one
+        cursor.execute(f"CREATE OR REPLACE VIEW {view} AS {definition}")
+    except psycopg2.Error:
+        # A column changed type: only a fresh view can take the new one
+        cursor.execute("ROLLBACK TO SAVEPOINT recreate_view")
+        cursor.execute(f"DROP VIEW {view}")
+        cursor.execute(f"CREATE VIEW {view} AS {definition}")
+    cursor.execute("RELEASE SAVEPOINT recreate_view")
+
+
+def swap_staging_into_place(conn, tables, lock_timeout=DEFAULT_LOCK_TIMEOUT,
+                            retries=DEFAULT_SWAP_RETRIES):
+    """
+    Atomically replace the live tables with their staging copies.
+
+    All renames happen in one transaction: readers see either the old star
+    schema or the new one. lock_timeout keeps the swap from queueing behind
+    a long dashboard query (and blocking everyone queued after it); the swap
+    is retried instead. Views on the swapped tables are re-created on the
+    new ones before the commit. The retired tables are dropped after it.
+    """
+    previous_autocommit = conn.autocommit
+    conn.autocommit = False
+    cursor = conn.cursor()
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                # View definitions are read and replayed with public names
+                cursor.execute("SET LOCAL search_path TO public")
+                views = _dependent_views(cursor, tables)
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {RETIRED_SCHEMA}")
+                for table in tables:
+                    cursor.execute(f"DROP TABLE IF EXISTS {RETIRED_SCHEMA}.{table} CASCADE")
+                    cursor.execute("SELECT to_regclass(%s)", (f"public.{table}",))
+                    if cursor.fetchone()[0] is not None:
+                        _move_table(cursor, table, "public", RETIRED_SCHEMA)
+                    _move_table(cursor, table, STAGING_SCHEMA, "public")
+                for view, definition in views:
+                    _recreate_view(cursor, view, definition)
+                conn.commit()
+                break
+            except errors.LockNotAvailable:
+                conn.rollback()
+                if attempt == retries:
+                    raise
+                print(f"  ⚠️  Tables busy, retrying swap ({attempt}/{retries})...")
+                time.sleep(attempt)
+
+        # Old tables are no longer visible to new queries
+        for table in tables:
+            cursor.execute(f"DROP TABLE IF EXISTS {RETIRED_SCHEMA}.{table} CASCADE")
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.autocommit = previous_autocommit
@@ -0,0 +1,108 @@
+"""
+Integer surrogate keys for the GameZone star schema.
+
+setup_02 replaces the repeated strings in fact_orders (customer, product,
+platform, channel, country, account creation method) with compact integer
+keys and writes each dimension with its key. Keys are assigned with
+pd.factorize, so each distinct member is hashed once and fact rows are
+encoded by position. Fact/dimension joins become integer hash joins, and
+the fact table shrinks several-fold.
+
+fact_orders_labeled joins the dimensions back on for ad-hoc and BI queries
+that expect the original column names.
+"""
+
+import numpy as np
+import pandas as pd
+
+# (dimension table, surrogate key, {order column: dimension column})
+DIMENSION_KEYS = [
+    ("dim_customer", "customer_key", {"customer_id": "customer_id"}),
+    ("dim_product", "product_key", {"product_id": "product_id", "product_name": "product_name"}),
+    ("dim_platform", "platform_key", {"purchase_platform": "platform"}),
+    ("dim_marketing_channel", "channel_key", {"marketing_channel": "marketing_channel"}),
+    ("dim_country", "country_key", {"country_code": "country_code"}),
+    ("dim_account_creation_method", "account_creation_key",
+     {"account_creation_method": "account_creation_method"}),
+]
+
+LABELED_FACT_VIEW = "fact_orders_labeled"
+
+# fact_orders with the natural columns joined back on (same names as the
+# CSV export, so the analytics queries read it like the old wide table)
+LABELED_FACT_VIEW_SQL = f"""
+    CREATE OR REPLACE VIEW {LABELED_FACT_VIEW} AS
+    SELECT
+        c.customer_id,
+        f.order_id,
+        f.order_date,
+        f.ship_ts,
+        p.product_name,
+        p.product_id,
+        f.order_amount_usd,
+        pl.platform AS purchase_platform,
+        mc.marketing_channel,
+        am.account_creation_method,
+        co.country_code,
+        f.order_year,
+        f.order_month,
+        f.order_month_name,
+        f.order_year_month,
+        f.date_key
+    FROM fact_orders f
+    LEFT JOIN dim_customer c ON c.customer_key = f.customer_key
+    LEFT JOIN dim_product p ON p.product_key = f.product_key
+    LEFT JOIN dim_platform pl ON pl.platform_key = f.platform_key
+    LEFT JOIN dim_marketing_channel mc ON mc.channel_key = f.channel_key
+    LEFT JOIN dim_country co ON co.country_key = f.country_key
+    LEFT JOIN dim_account_creation_method am ON am.account_creation_key = f.account_creation_key
+"""
+
+
+def assign_keys(frame, columns, key_column, existing=None):
+    """
+    Give every distinct combination of columns a 1-based integer key.
+
+    Rows with a missing value in any of the columns get a NULL key.
+    With existing (a previous dimension frame holding key_column and
+    columns), known members keep their keys and unseen members are
+    numbered after the highest existing key.
+
+    Returns:
+        (row_keys, members): an Int32 Series aligned with frame, and the
+        dimension frame [key_column, *columns] ordered by key
+    """
+    if len(columns) == 1:
+        codes, uniques = pd.factorize(frame[columns[0]])
+        members = pd.DataFrame({columns[0]: uniques})
+    else:
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(frame[columns]))
+        members = uniques.to_frame(index=False, name=columns)
+    valid = members.notna().all(axis=1).to_numpy()
+
+    keys = np.full(len(members), -1, dtype="int64")
+    if existing is None or existing.empty:
+        keys[valid] = np.arange(1, valid.sum() + 1)
+        known = pd.DataFrame(columns=[key_column] + list(columns))
+    else:
+        # Match dtypes so a text key read back from CSV still joins (e.g. "0123")
+        known = existing[[key_column] + list(columns)].astype(
+            {col: members[col].dtype for col in columns}
+        )
+        matched = members.merge(known, on=list(columns), how="left")[key_column]
+        keys[valid] = matched[valid].fillna(-1).to_numpy(dtype="int64")
+        unseen = valid & (keys < 0)
+        next_key = int(known[key_column].max()) + 1
+        keys[unseen] = np.arange(next_key, next_key + unseen.sum())
+
+    # Code -1 (missing value) picks the trailing -1, which becomes NULL
+    lookup = np.append(keys, -1)
+    row_keys = pd.Series(lookup[codes], index=frame.index, name=key_column)
+    row_keys = row_keys.astype("Int32").mask(row_keys < 0)
+
+    members.insert(0, key_column, keys)
+    members = members[valid & (keys >= 0)]
+    new_members = members[~members[key_column].isin(known[key_column])]
+    members = pd.concat([known, new_members], ignore_index=True)
+    members[key_column] = members[key_column].astype("int32")
+    return row_keys, members.sort_values(key_column).reset_index(drop=True)
@@ -1,314 +1,356 @@
 #!/usr/bin/env python3
 """
 Comprehensive Database Update Script
-Updates all dimension and fact tables with latest data from CSV files
+Updates all dimension and fact tables of the star schema with the latest
+mart files written by setup_02 (CSV or Parquet, integer surrogate keys)
 """
 
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
-from dotenv import load_dotenv
 import os
+import time
 from datetime import datetime
 
-# Load environment variables
-load_dotenv()
+import db
+from bulk_copy import (
+    DEFAULT_BATCH_SIZE,
+    has_quoted_fields,
+    parallel_copy_csv,
+    rows_per_second,
+)
+from fact_partitions import (
+    ensure_month_partitions,
+    is_partitioned,
+    partition_name,
+    reload_month,
+)
+from foreign_keys import add_foreign_keys, drop_foreign_keys, validate_foreign_keys
+from hash_sync import sync_table
+from index_maintenance import (
+    SURROGATE_KEY_INDEXES,
+    analyze_tables,
+    build_secondary_indexes,
+    drop_secondary_indexes,
+)
+from load_metrics import LoadMetrics
+from parallel_loader import DEFAULT_WORKERS, LoadTask, run_parallel_load
+from parquet_io import copy_table, disk_usage, fact_months, is_parquet, mart_path, read_frame
+from preload_validation import SURROGATE_KEY_REFERENCES, key_set, split_clean_rows
+from refresh_state import DEFAULT_STATE_FILE, RefreshState
+from rollup_cube import ROLLUP_TABLE, month_key, refresh_rollup
+from staged_load import (
+    clone_tables_into_staging,
+    reset_staging_schema,
+    staging_connect_options,
+    swap_staging_into_place,
+    validate_staging,
+)
+from surrogate_keys import DIMENSION_KEYS, LABELED_FACT_VIEW, LABELED_FACT_VIEW_SQL
 
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
+# Connection settings come from .env through the shared db module
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', DEFAULT_WORKERS))
+COPY_BATCH_SIZE = int(os.getenv('COPY_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+FACT_COPY_WORKERS = int(os.getenv('FACT_COPY_WORKERS', 1))
+
+# "in_place" reloads the live tables; "staged" loads a staging schema and swaps it in atomically
+REFRESH_MODE = os.getenv('REFRESH_MODE', 'in_place').lower()
+
+# Optional "YYYY-MM": reload only that month's fact_orders partition
+# (in_place refreshes only: a staged refresh rebuilds every table)
+FACT_REFRESH_MONTH = os.getenv('FACT_REFRESH_MONTH')
+
+# "reload" deletes and reloads fact_orders; "sync" applies only the rows that
+# changed (hash diff on order_id, in_place refreshes only)
+FACT_LOAD_MODE = os.getenv('FACT_LOAD_MODE', 'reload').lower()
+
+# Validate fact_orders against the dimension mart files before loading: rejected
+# rows go to QUARANTINE_FILE with reason codes, only clean rows are loaded
+PRELOAD_VALIDATION = os.getenv('PRELOAD_VALIDATION', 'true').lower() == 'true'
+QUARANTINE_FILE = os.getenv('QUARANTINE_FILE', 'quarantine_fact_orders.csv')
+VALIDATED_FACT_FILE = 'fact_orders_validated.csv'
+
+# Completed tables are checkpointed here (in_place refreshes): a rerun resumes
+# after a failure and skips tables whose source files are unchanged ("" disables)
+REFRESH_STATE_FILE = os.getenv('REFRESH_STATE_FILE', DEFAULT_STATE_FILE)
+
+# Keep the monthly rollup (fact_orders_monthly) in step with fact_orders:
+# only the months a load touched are recomputed
+ROLLUP_REFRESH = os.getenv('ROLLUP_REFRESH', 'true').lower() == 'true'
+
+# Per-stage timings are appended to LOAD_METRICS_FILE (NDJSON)
+METRICS = LoadMetrics("update_all_tables")
+
+# Format of the mart written by setup_02: "csv" or "parquet" (requires pyarrow)
+MART_FORMAT = os.getenv('MART_FORMAT', 'csv').lower()
+
+# Star-schema tables, as created by setup_01. setup_02 may renumber the
+# surrogate keys on a full rebuild, so the dimensions and fact_orders are
+# always refreshed from the same mart build.
+DIMENSION_TABLES = [
+    'dim_date',
+    'dim_customer',
+    'dim_product',
+    'dim_country',
+    'dim_platform',
+    'dim_marketing_channel',
+    'dim_account_creation_method',
+]
+# Primary key of every dimension
+DIMENSION_KEY_COLUMNS = {'dim_date': 'date_key', **{table: key for table, key, _ in DIMENSION_KEYS}}
+FACT_ORDERS_FILE = mart_path('fact_orders', MART_FORMAT)
+FACT_ORDERS_COLUMNS = [
+    'order_id', 'order_date', 'ship_ts', 'order_amount_usd', 'order_year', 'order_month',
+    'order_month_name', 'order_year_month', 'customer_key', 'product_key', 'platform_key',
+    'channel_key', 'country_key', 'account_creation_key', 'date_key',
+]
+
+def session_options():
+    """Staged refreshes resolve table names in the staging schema first"""
+    return staging_connect_options() if REFRESH_MODE == 'staged' else None
 
 def connect_db():
     """Connect to PostgreSQL database"""
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
+        conn = db.connect(options=session_options())
         return conn
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         raise
 
-def update_products(conn):
-    """Update dim_products table"""
-    print("\n[PRODUCTS] Loading data...")
-    try:
-        df = pd.read_csv('data_dim_02_products.csv')
-        print(f"  ✓ Loaded {len(df)} products")
-        
-        cursor = conn.cursor()
-        
-        # Clear existing products
-        cursor.execute("DELETE FROM dim_products;")
-        print(f"  ✓ Cleared existing products")
-        
-        # Insert new products
-        for _, row in df.iterrows():
-            cursor.execute(
-                "INSERT INTO dim_products (product_id, product_name) VALUES (%s, %s)",
-                (row['product_id'], row['product_name'])
-            )
-        
-        conn.commit()
-        print(f"  ✓ Inserted {len(df)} products")
-        
-        # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_products;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Verification: {count} products in database")
-        cursor.close()
-        
-        return count
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error updating products: {e}")
-        raise
+def append_new_members(conn, table, source):
+    """
+    Insert the members of a dimension's mart file that are not loaded yet.
 
-def update_customers(conn):
-    """Update dim_customer table"""
-    print("\n[CUSTOMERS] Loading data...")
-    try:
-        df = pd.read_csv('data_dim_01_customers.csv')
-        
-        # Truncate customer_id to 50 characters (database column limit)
-        df['customer_id'] = df['customer_id'].astype(str).str[:50]
-        
-        # Remove duplicates (keep first occurrence)
-        df = df.drop_duplicates(subset=['customer_id'], keep='first')
-        
-        print(f"  ✓ Loaded {len(df)} customers (after deduplication)")
-        
-        cursor = conn.cursor()
-        
-        # Clear existing customers
-        cursor.execute("DELETE FROM dim_customer;")
-        print(f"  ✓ Cleared existing customers")
-        
-        # Insert new customers
-        for _, row in df.iterrows():
-            cursor.execute(
-                "INSERT INTO dim_customer (customer_id, country_code, account_creation_method) VALUES (%s, %s, %s)",
-                (row['customer_id'], row['country_code'], row['account_creation_method'])
-            )
-        
-        conn.commit()
-        print(f"  ✓ Inserted {len(df)} customers")
-        
-        # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_customer;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Verification: {count} customers in database")
-        cursor.close()
-        
-        return count
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error updating customers: {e}")
-        raise
+    Every loaded member must still be in the file under the same key: the
+    fact rows of the months that are not reloaded point at those keys. A
+    mart rebuilt with renumbered keys is refused (it needs a full refresh).
 
-def update_dates(conn):
-    """Update dim_date table"""
-    print("\n[DATES] Loading data...")
+    Returns:
+        (rows_appended, elapsed_seconds)
+    """
+    start = time.perf_counter()
+    key_column = DIMENSION_KEY_COLUMNS[table]
+    incoming = f"{table}_incoming"
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {incoming}")
+    cursor.execute(f"CREATE TEMP TABLE {incoming} (LIKE {table}) ON COMMIT DROP")
+    copy_stats = {}
+    loaded, _ = copy_table(conn, source, incoming, batch_size=COPY_BATCH_SIZE, stats=copy_stats)
+    METRICS.record("read", table, loaded, disk_usage(source), copy_stats["read_s"])
+    
+    cursor.execute(f"""
+        SELECT COUNT(*)
+        FROM {table} t
+        LEFT JOIN {incoming} i ON i.{key_column} = t.{key_column}
+        WHERE i.{key_column} IS NULL OR ROW(t.*) IS DISTINCT FROM ROW(i.*)
+    """)
+    changed = cursor.fetchone()[0]
+    if changed:
+        raise RuntimeError(
+            f"{changed:,} loaded {table} members are missing from or changed in {source}; "
+            f"the mart keys were reassigned, run a full refresh (without FACT_REFRESH_MONTH)"
+        )
+    
+    cursor.execute(f"""
+        INSERT INTO {table}
+        SELECT i.* FROM {incoming} i
+        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{key_column} = i.{key_column})
+    """)
+    appended = cursor.rowcount
+    cursor.close()
+    elapsed = time.perf_counter() - start
+    METRICS.record("insert", table, appended, copy_stats["bytes"], elapsed)
+    return appended, elapsed
+
+def update_dimension(conn, table):
+    """
+    Replace a dimension table with its mart file (keys as assigned by setup_02).
+    With FACT_REFRESH_MONTH only new members are appended (append_new_members).
+    """
+    print(f"\n[{table.upper()}] Loading data...")
+    source = mart_path(table, MART_FORMAT)
     try:
-        df = pd.read_csv('data_dim_03_dates.csv')
-        
-        # Remove duplicates (keep first occurrence)
-        df = df.drop_duplicates(subset=['date_key'], keep='first')
-        
-        print(f"  ✓ Loaded {len(df)} dates (after deduplication)")
-        
         cursor = conn.cursor()
         
-        # Clear existing dates
-        cursor.execute("DELETE FROM dim_date;")
-        print(f"  ✓ Cleared existing dates")
-        
-        # Insert new dates
-        for _, row in df.iterrows():
-            cursor.execute(
-                "INSERT INTO dim_date (date_key, order_date, order_year, order_month, order_month_name, order_year_month) VALUES (%s, %s, %s, %s, %s, %s)",
-                (row['date_key'], row['order_date'], row['order_year'], row['order_month'], row['order_month_name'], row['order_year_month'])
+        if FACT_REFRESH_MONTH:
+            # Only one month of fact_orders is reloaded: existing members keep their keys
+            inserted, elapsed = append_new_members(conn, table, source)
+        else:
+            # Clear existing members (fact_orders foreign keys are dropped for the refresh)
+            with METRICS.stage("truncate", table):
+                cursor.execute(f"DELETE FROM {table};")
+            print(f"  ✓ Cleared existing {table} rows")
+            
+            # Insert new members
+            copy_stats = {}
+            inserted, elapsed = copy_table(
+                conn, source, table, batch_size=COPY_BATCH_SIZE, stats=copy_stats
             )
+            METRICS.record("read", table, inserted, disk_usage(source), copy_stats["read_s"])
+            METRICS.record("insert", table, inserted, copy_stats["bytes"], copy_stats["insert_s"])
         
-        conn.commit()
-        print(f"  ✓ Inserted {len(df)} dates")
+        with METRICS.stage("commit", table):
+            conn.commit()
+        print(f"  ✓ Inserted {inserted:,} rows ({rows_per_second(inserted, elapsed):,.0f} rows/s)")
         
         # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_date;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Verification: {count} dates in database")
+        with METRICS.stage("validate", table):
+            cursor.execute(f"SELECT COUNT(*) FROM {table};")
+            count = cursor.fetchone()[0]
+        print(f"  ✓ Verification: {count} rows in {table}")
         cursor.close()
         
         return count
     except Exception as e:
         conn.rollback()
-        print(f"❌ Error updating dates: {e}")
+        print(f"❌ Error updating {table}: {e}")
         raise
 
-def update_countries(conn):
-    """Update dim_country table"""
-    print("\n[COUNTRIES] Loading data...")
+def validate_fact_orders():
+    """
+    Split the orders file into clean rows and quarantined rows before loading.
+
+    Returns the path of the file to load (the clean rows).
+    """
+    with METRICS.stage("validate_source", "fact_orders", nbytes=disk_usage(FACT_ORDERS_FILE)) as stage:
+        key_sets = {}
+        for _, table, dim_column, _ in SURROGATE_KEY_REFERENCES:
+            dim_file = mart_path(table, MART_FORMAT)
+            key_sets[table] = key_set(read_frame(dim_file, columns=[dim_column])[dim_column])
+        summary = split_clean_rows(
+            FACT_ORDERS_FILE, VALIDATED_FACT_FILE, QUARANTINE_FILE,
+            SURROGATE_KEY_REFERENCES, key_sets, chunk_rows=COPY_BATCH_SIZE
+        )
+        stage.update(rows=summary["rows"], quarantined=summary["quarantined"])
+    print(f"  ✓ Validated {summary['rows']:,} orders: {summary['clean']:,} clean, "
+          f"{summary['quarantined']:,} quarantined")
+    if summary["quarantined"]:
+        for code, count in sorted(summary["reasons"].items(), key=lambda item: -item[1]):
+            print(f"    ⚠️  {code}: {count:,}")
+        print(f"  ⚠️  Rejected rows written to {QUARANTINE_FILE}")
+    return VALIDATED_FACT_FILE
+
+def update_fact_orders(conn):
+    """Update fact_orders table (streamed: memory stays flat whatever the file size)"""
+    print("\n[FACT ORDERS] Streaming data...")
     try:
-        df = pd.read_csv('data_dim_04_countries.csv')
-        print(f"  ✓ Loaded {len(df)} countries")
-        
         cursor = conn.cursor()
         
-        # Clear existing countries
-        cursor.execute("DELETE FROM dim_country;")
-        print(f"  ✓ Cleared existing countries")
+        # Only rows that pass validation reach the database
+        source = validate_fact_orders() if PRELOAD_VALIDATION else FACT_ORDERS_FILE
         
-        # Insert new countries
-        for _, row in df.iterrows():
-            country_code = row['country_code'] if pd.notna(row['country_code']) and row['country_code'].strip() else None
-            if country_code:
-                cursor.execute(
-                    "INSERT INTO dim_country (country_code) VALUES (%s)",
-                    (country_code,)
+        if is_partitioned(conn):
+            if FACT_REFRESH_MONTH:
+                # Monthly refresh: only the month's partition is truncated and reloaded
+                inserted, elapsed = reload_month(
+                    conn, FACT_REFRESH_MONTH, source, copy_table,
+                    columns=FACT_ORDERS_COLUMNS, batch_size=COPY_BATCH_SIZE
                 )
+                METRICS.record("insert", partition_name(FACT_REFRESH_MONTH), inserted,
+                               disk_usage(source), elapsed)
+                # One commit: the month's rows and its rollup change together
+                update_rollup(conn, [month_key(FACT_REFRESH_MONTH)])
+                with METRICS.stage("commit", "fact_orders"):
+                    conn.commit()
+                print(f"  ✓ Reloaded {partition_name(FACT_REFRESH_MONTH)}: {inserted:,} order records "
+                      f"({rows_per_second(inserted, elapsed):,.0f} rows/s)")
+                cursor.execute("SELECT COUNT(*) FROM fact_orders;")
+                count = cursor.fetchone()[0]
+                print(f"  ✓ Verification: {count} orders in database")
+                cursor.close()
+                return count
+            
+            # Create partitions for new months before any loader connection routes rows
+            created = ensure_month_partitions(conn, fact_months(source))
+            if created:
+                print(f"  ✓ Created {len(created)} new month partitions")
+        
+        if FACT_LOAD_MODE == 'sync' and REFRESH_MODE != 'staged':
+            # Only new, changed and removed orders are written; the rest stay untouched
+            with METRICS.stage("sync", "fact_orders", nbytes=disk_usage(source)) as stage:
+                changes = sync_table(
+                    conn, source, "fact_orders", "order_id",
+                    FACT_ORDERS_COLUMNS, touched="date_key / 100", batch_size=COPY_BATCH_SIZE
+                )
+                touched_months = changes.pop("touched")
+                stage.update(changes, rows=changes["inserted"] + changes["updated"] + changes["deleted"])
+            # Same transaction: the rollup never disagrees with the fact rows
+            update_rollup(conn, touched_months)
+            with METRICS.stage("commit", "fact_orders"):
+                conn.commit()
+            print(f"  ✓ Synced {changes['incoming']:,} orders: {changes['inserted']:,} inserted, "
+                  f"{changes['updated']:,} updated, {changes['deleted']:,} deleted, "
+                  f"{changes['unchanged']:,} unchanged")
+            return verify_fact_orders(cursor)
         
-        conn.commit()
-        
-        # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_country;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Inserted and verified: {count} countries in database")
-        cursor.close()
-        
-        return count
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error updating countries: {e}")
-        raise
-
-def update_platforms(conn):
-    """Update dim_platform table"""
-    print("\n[PLATFORMS] Loading data...")
-    try:
-        df = pd.read_csv('data_dim_05_platforms.csv')
-        print(f"  ✓ Loaded {len(df)} platforms")
-        
-        cursor = conn.cursor()
-        
-        # Clear existing platforms
-        cursor.execute("DELETE FROM dim_platform;")
-        print(f"  ✓ Cleared existing platforms")
+        # Clear existing orders
+        with METRICS.stage("truncate", "fact_orders"):
+            cursor.execute("DELETE FROM fact_orders;")
+        print(f"  ✓ Cleared existing orders")
         
-        # Insert new platforms
-        for _, row in df.iterrows():
-            cursor.execute(
-                "INSERT INTO dim_platform (platform) VALUES (%s)",
-                (row['platform'],)
+        # Stream new orders: parallel byte ranges when the file allows it, else chunked COPY
+        # Byte-range splitting only applies to unquoted CSV files
+        if (FACT_COPY_WORKERS > 1 and not is_parquet(source)
+                and not has_quoted_fields(source)):
+            # Ranges are parsed in parallel into a load table; the rows reach
+            # fact_orders on conn, so they commit (or roll back) with the DELETE
+            inserted, elapsed = parallel_copy_csv(
+                conn, connect_db, source, "fact_orders", FACT_COPY_WORKERS
+            )
+            METRICS.record("insert", "fact_orders", inserted,
+                           disk_usage(source), elapsed)
+        else:
+            copy_stats = {}
+            inserted, elapsed = copy_table(
+                conn, source, "fact_orders",
+                columns=FACT_ORDERS_COLUMNS, batch_size=COPY_BATCH_SIZE, stats=copy_stats
             )
+            METRICS.record("read", "fact_orders", inserted,
+                           disk_usage(source), copy_stats["read_s"])
+            METRICS.record("insert", "fact_orders", inserted,
+                           copy_stats["bytes"], copy_stats["insert_s"])
         
-        conn.commit()
-        print(f"  ✓ Inserted {len(df)} platforms")
+        # Staged loads rebuild the rollup after the swap instead
+        if REFRESH_MODE != 'staged':
+            update_rollup(conn)
         
-        # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_platform;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Verification: {count} platforms in database")
-        cursor.close()
+        with METRICS.stage("commit", "fact_orders"):
+            conn.commit()
+        print(f"  ✓ Inserted {inserted:,} order records ({rows_per_second(inserted, elapsed):,.0f} rows/s)")
         
-        return count
+        return verify_fact_orders(cursor)
     except Exception as e:
         conn.rollback()
-        print(f"❌ Error updating platforms: {e}")
+        print(f"❌ Error updating fact orders: {e}")
         raise
 
-def update_marketing_channels(conn):
-    """Update dim_marketing_channel table"""
-    print("\n[MARKETING CHANNELS] Loading data...")
-    try:
-        df = pd.read_csv('data_dim_06_marketing_channels.csv')
-        print(f"  ✓ Loaded {len(df)} marketing channels")
-        
-        cursor = conn.cursor()
-        
-        # Clear existing channels
-        cursor.execute("DELETE FROM dim_marketing_channel;")
-        print(f"  ✓ Cleared existing channels")
-        
-        # Insert new channels
-        for _, row in df.iterrows():
-            channel = row['marketing_channel'] if pd.notna(row['marketing_channel']) and row['marketing_channel'].strip() else None
-            if channel:
-                cursor.execute(
-                    "INSERT INTO dim_marketing_channel (marketing_channel) VALUES (%s)",
-                    (channel,)
-                )
-        
-        conn.commit()
-        
-        # Verify
-        cursor.execute("SELECT COUNT(*) FROM dim_marketing_channel;")
-        count = cursor.fetchone()[0]
-        print(f"  ✓ Inserted and verified: {count} marketing channels in database")
-        cursor.close()
-        
-        return count
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error updating marketing channels: {e}")
-        raise
+def update_rollup(conn, months=None):
+    """Recompute fact_orders_monthly for months (YYYYMM; None: all) in conn's transaction"""
+    if not ROLLUP_REFRESH:
+        return
+    # The rollup reads the natural columns through the labeled view
+    cursor = conn.cursor()
+    cursor.execute(LABELED_FACT_VIEW_SQL)
+    cursor.close()
+    with METRICS.stage("rollup", ROLLUP_TABLE) as stage:
+        stage["rows"] = refresh_rollup(conn, months, source=LABELED_FACT_VIEW)
+    scope = "all months" if months is None else f"{len(months)} months"
+    print(f"  ✓ Refreshed {ROLLUP_TABLE} ({scope}, {stage['rows']:,} rows)")
 
-def update_fact_orders(conn):
-    """Update fact_orders table"""
-    print("\n[FACT ORDERS] Loading data...")
-    try:
-        df = pd.read_csv('data_fact_01_orders_transactions.csv')
-        print(f"  ✓ Loaded {len(df)} order records")
-        
-        cursor = conn.cursor()
-        
-        # Clear existing orders
-        cursor.execute("DELETE FROM fact_orders;")
-        print(f"  ✓ Cleared existing orders")
-        
-        # Insert new orders
-        for _, row in df.iterrows():
-            cursor.execute(
-                """INSERT INTO fact_orders 
-                   (customer_id, order_id, order_date, ship_ts, product_name, product_id, 
-                    order_amount_usd, purchase_platform, marketing_channel, 
-                    account_creation_method, country_code, order_year, order_month, 
-                    order_month_name, order_year_month, date_key)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (row['customer_id'], row['order_id'], row['order_date'], row['ship_ts'],
-                 row['product_name'], row['product_id'], row['order_amount_usd'],
-                 row['purchase_platform'], row['marketing_channel'],
-                 row['account_creation_method'], row['country_code'], row['order_year'],
-                 row['order_month'], row['order_month_name'], row['order_year_month'],
-                 row['date_key'])
-            )
-        
-        conn.commit()
-        print(f"  ✓ Inserted {len(df)} order records")
-        
-        # Verify
+def verify_fact_orders(cursor):
+    """Report the loaded order count and revenue; returns the count"""
+    with METRICS.stage("validate", "fact_orders"):
         cursor.execute("SELECT COUNT(*) FROM fact_orders;")
         count = cursor.fetchone()[0]
-        print(f"  ✓ Verification: {count} orders in database")
         
-        # Revenue check (cast to numeric)
-        cursor.execute("SELECT SUM(order_amount_usd::numeric) FROM fact_orders;")
+        # Revenue check
+        cursor.execute("SELECT SUM(order_amount_usd) FROM fact_orders;")
         total_revenue = cursor.fetchone()[0]
-        if total_revenue:
-            print(f"  ✓ Total Revenue: ${total_revenue:,.2f}")
-        
-        cursor.close()
-        
-        return count
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error updating fact orders: {e}")
-        raise
+    print(f"  ✓ Verification: {count} orders in database")
+    if total_revenue:
+        print(f"  ✓ Total Revenue: ${total_revenue:,.2f}")
+    
+    cursor.close()
+    
+    return count
 
 def main():
     """Main update process"""
@@ -318,38 +360,113 @@ def main():
     print(f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
-        # Connect to database
-        print(f"\n[CONNECTION] Connecting to {DB_HOST}:{DB_PORT}/{DB_NAME}...")
-        conn = connect_db()
-        print("  ✓ Connected successfully")
-        
-        # Update all tables
-        products_count = update_products(conn)
-        customers_count = update_customers(conn)
-        dates_count = update_dates(conn)
-        countries_count = update_countries(conn)
-        platforms_count = update_platforms(conn)
-        channels_count = update_marketing_channels(conn)
-        orders_count = update_fact_orders(conn)
+        if FACT_REFRESH_MONTH and REFRESH_MODE == 'staged':
+            # Staging starts empty, so a staged refresh can only reload every month
+            raise ValueError("FACT_REFRESH_MONTH requires REFRESH_MODE=in_place "
+                             "(a staged refresh reloads every month)")
+        
+        # Update all tables: dimensions concurrently, fact_orders once they are loaded
+        tasks = [
+            LoadTask(table, lambda task_conn, table=table: update_dimension(task_conn, table), [],
+                     [mart_path(table, MART_FORMAT)])
+            for table in DIMENSION_TABLES
+        ]
+        tasks.append(LoadTask("fact_orders", update_fact_orders, [t.name for t in tasks], [FACT_ORDERS_FILE]))
+        
+        table_names = [task.name for task in tasks]
+        
+        # A staged refresh swaps in every table at once, so it always loads them all
+        state = RefreshState(REFRESH_STATE_FILE) if REFRESH_STATE_FILE and REFRESH_MODE != 'staged' else None
+        skipped = state.skippable(tasks) if state else {}
+        if state:
+            print(f"\n[CHECKPOINTS] {len(skipped)} of {len(tasks)} tables unchanged since last refresh ({REFRESH_STATE_FILE})")
+        
+        print(f"\n[CONNECTION] Opening pool of {LOAD_WORKERS} connections to {db.DB_HOST}:{db.DB_PORT}/{db.DB_NAME}...")
+        pool = db.get_pool(LOAD_WORKERS, options=session_options())
+        print(f"  ✓ Connected successfully (refresh mode: {REFRESH_MODE})")
+        
+        try:
+            conn = pool.getconn()
+            if REFRESH_MODE == 'staged':
+                # Load into empty staging copies; the live tables stay untouched until the swap
+                reset_staging_schema(conn)
+                clone_tables_into_staging(conn, table_names)
+                print(f"  ✓ Created staging copies of {len(table_names)} tables")
+            else:
+                # Dimension DELETEs would trip the fact_orders foreign keys; they
+                # are declared and validated again once every table is loaded
+                drop_foreign_keys(conn)
+                if not FACT_REFRESH_MONTH and FACT_LOAD_MODE != 'sync' and "fact_orders" not in skipped:
+                    # Drop secondary indexes so the reload does not maintain them row by row
+                    # (a sync writes few rows and needs idx_fact_order for its key joins)
+                    dropped = drop_secondary_indexes(conn, indexes=SURROGATE_KEY_INDEXES)
+                    print(f"  ✓ Dropped {len(dropped)} secondary indexes before reload")
+            pool.putconn(conn)
+            
+            results = run_parallel_load(pool, tasks, workers=LOAD_WORKERS, state=state)
+            
+            print("\n[INDEXES] Rebuilding secondary indexes...")
+            # Nobody reads staging tables, so plain (parallel) builds are safe there
+            with METRICS.stage("index", "fact_orders"):
+                built, failed = build_secondary_indexes(
+                    pool, workers=LOAD_WORKERS, online=(REFRESH_MODE != 'staged'),
+                    indexes=SURROGATE_KEY_INDEXES
+                )
+            print(f"  ✓ Rebuilt {len(built)} indexes")
+            for idx_name, error in failed.items():
+                print(f"  ❌ {idx_name}: {error}")
+            
+            conn = pool.getconn()
+            with METRICS.stage("analyze"):
+                analyze_tables(conn, table_names)
+            print("  ✓ ANALYZE complete")
+            
+            # Staged refreshes check the staging tables, before anything goes live
+            print("\n[CONSTRAINTS] Declaring and validating foreign keys...")
+            with METRICS.stage("constraints", "fact_orders"):
+                add_foreign_keys(conn)
+                validated, failed = validate_foreign_keys(conn)
+            print(f"  ✓ Validated {len(validated)} foreign keys")
+            for fk_name, error in failed.items():
+                print(f"  ❌ {fk_name}: {error}")
+            
+            if REFRESH_MODE == 'staged':
+                print("\n[SWAP] Validating staging tables...")
+                with METRICS.stage("validate", "staging"):
+                    problems = validate_staging(conn, table_names)
+                problems += [f"{fk_name}: {error}" for fk_name, error in failed.items()]
+                if problems:
+                    for problem in problems:
+                        print(f"  ❌ {problem}")
+                    raise RuntimeError("Staging validation failed; live tables left unchanged")
+                with METRICS.stage("swap"):
+                    swap_staging_into_place(conn, table_names)
+                print("  ✓ Staging tables swapped into place")
+                # Pooled sessions resolve staging first; the rollup lives in public
+                cursor = conn.cursor()
+                cursor.execute("SET search_path TO public")
+                cursor.close()
+                if "fact_orders" in table_names:
+                    update_rollup(conn)
+                conn.commit()
+            pool.putconn(conn)
+        finally:
+            db.close_pool()
+        
+        counts = {name: count for name, (count, _) in results.items()}
         
         # Final summary
         print("\n" + "=" * 70)
         print("✅ DATABASE UPDATE COMPLETE")
         print("=" * 70)
         print(f"\nTable Summary:")
-        print(f"  • dim_products:          {products_count:>6} records")
-        print(f"  • dim_customer:          {customers_count:>6} records")
-        print(f"  • dim_date:              {dates_count:>6} records")
-        print(f"  • dim_country:           {countries_count:>6} records")
-        print(f"  • dim_platform:          {platforms_count:>6} records")
-        print(f"  • dim_marketing_channel: {channels_count:>6} records")
-        print(f"  • fact_orders:           {orders_count:>6} records")
-        print(f"\nTotal Records Loaded: {products_count + customers_count + dates_count + countries_count + platforms_count + channels_count + orders_count:,}")
+        for name in table_names:
+            print(f"  • {name + ':':<29} {counts[name]:>6} records")
+        print(f"\nTotal Records Loaded: {sum(counts.values()):,}")
         print(f"End Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Stage metrics: {METRICS.path} (run {METRICS.run_id})")
         print("=" * 70)
-        
-        conn.close()
-        print("✓ Database connection closed")
+        print("✓ Database connections closed")
         
     except Exception as e:
         print(f"\n❌ Update failed: {e}")
@@ -1,201 +1,295 @@
 #!/usr/bin/env python3
 """
 Comprehensive Database Verification After Update
+
+The whole report comes from one statement (one round trip): a UNION ALL of
+the table counts, a single scan of fact_orders that profiles it and counts
+orphans through left anti-joins against the dimensions, and the dimension
+listings aggregated to JSON. fact_orders carries the integer surrogate keys
+of the star schema; the anti-joins match them against the dimension primary
+keys, so a join row can never be repeated.
+
+With --fast the same report is estimated from catalog statistics and block
+samples (approx_stats) instead of full scans, and every figure carries its
+error bound. The exact mode stays the default, for audits.
+
+Usage:
+    python verify_updated_data.py [--fast]
 """
 
-import psycopg2
-from dotenv import load_dotenv
-import os
+import sys
+from collections import namedtuple
+
+import db
+from approx_stats import (
+    add_estimates, estimated_distinct, estimated_rows, sample_percent,
+    sampled_group_totals, sampled_range, sampled_totals,
+)
+
+DIMENSION_TABLES = [
+    "dim_product",
+    "dim_customer",
+    "dim_date",
+    "dim_country",
+    "dim_platform",
+    "dim_marketing_channel",
+    "dim_account_creation_method",
+]
+
+VerificationReport = namedtuple("VerificationReport", [
+    "table_counts",          # {table: rows}, dimensions then fact_orders
+    "products",              # [(product_id, product_name)]
+    "unique_countries",      # distinct dim_customer.country_code
+    "creation_methods",      # distinct dim_customer.account_creation_method
+    "date_range",            # (min order_date, max order_date) of dim_date
+    "platforms",             # [platform]
+    "marketing_channels",    # [marketing_channel]
+    "fact_customers",        # distinct customer_key in fact_orders
+    "fact_products",         # distinct product_key in fact_orders
+    "total_revenue",         # SUM(order_amount_usd)
+    "product_distribution",  # [(product_id, product_name, orders)], busiest first
+    "orphans",               # {fact key column: rows without a dimension match}
+    "mode",                  # "exact", or "fast" (figures are approx_stats.Estimate)
+    "date_range_exact",      # False when date_range comes from a sample (an inner bound)
+], defaults=["exact", True])
+
+# Anti-joins of the fact profile (shared by the exact and the sampled report)
+ORPHAN_JOINS = """
+        LEFT JOIN dim_product dp ON dp.product_key = fo.product_key
+        LEFT JOIN dim_customer dc ON dc.customer_key = fo.customer_key
+        LEFT JOIN dim_date dd ON dd.date_key = fo.date_key"""
+
+_table_counts = "\n        UNION ALL ".join(
+    f"SELECT {ordinal}, '{table}', COUNT(*) FROM {table}"
+    for ordinal, table in enumerate(DIMENSION_TABLES)
+)
+
+REPORT_QUERY = f"""
+    WITH fact_profile AS (
+        SELECT COUNT(*) AS orders,
+               COUNT(DISTINCT fo.customer_key) AS customers,
+               COUNT(DISTINCT fo.product_key) AS products,
+               SUM(fo.order_amount_usd) AS revenue,
+               COUNT(*) FILTER (WHERE dp.product_key IS NULL) AS orphan_products,
+               COUNT(*) FILTER (WHERE dc.customer_key IS NULL) AS orphan_customers,
+               COUNT(*) FILTER (WHERE dd.date_key IS NULL) AS orphan_dates
+        FROM fact_orders fo{ORPHAN_JOINS}
+    ),
+    table_counts (ordinal, table_name, row_count) AS (
+        {_table_counts}
+        UNION ALL SELECT {len(DIMENSION_TABLES)}, 'fact_orders', orders FROM fact_profile
+    ),
+    product_distribution AS (
+        SELECT dp.product_id, dp.product_name, COUNT(*) AS order_count
+        FROM fact_orders fo
+        LEFT JOIN dim_product dp ON fo.product_key = dp.product_key
+        GROUP BY fo.product_key, dp.product_id, dp.product_name
+    )
+    SELECT
+        (SELECT json_agg(json_build_array(table_name, row_count) ORDER BY ordinal) FROM table_counts),
+        (SELECT json_agg(json_build_array(product_id, product_name) ORDER BY product_id, product_name)
+         FROM dim_product),
+        (SELECT COUNT(DISTINCT country_code) FROM dim_customer),
+        (SELECT COUNT(DISTINCT account_creation_method) FROM dim_customer),
+        (SELECT MIN(order_date) FROM dim_date),
+        (SELECT MAX(order_date) FROM dim_date),
+        (SELECT json_agg(platform ORDER BY platform) FROM dim_platform),
+        (SELECT json_agg(marketing_channel ORDER BY marketing_channel) FROM dim_marketing_channel),
+        fp.customers,
+        fp.products,
+        fp.revenue,
+        (SELECT json_agg(json_build_array(product_id, product_name, order_count) ORDER BY order_count DESC)
+         FROM product_distribution),
+        fp.orphan_products,
+        fp.orphan_customers,
+        fp.orphan_dates
+    FROM fact_profile fp;
+"""
+
+
+def collect_report(cursor):
+    """Run REPORT_QUERY and return its row as a VerificationReport"""
+    cursor.execute(REPORT_QUERY)
+    (counts, products, countries, methods, min_date, max_date, platforms, channels,
+     customers, fact_products, revenue, distribution,
+     orphan_products, orphan_customers, orphan_dates) = cursor.fetchone()
+
+    return VerificationReport(
+        table_counts={table: rows for table, rows in counts},
+        products=[tuple(row) for row in products or []],
+        unique_countries=countries,
+        creation_methods=methods,
+        date_range=(min_date, max_date),
+        platforms=platforms or [],
+        marketing_channels=channels or [],
+        fact_customers=customers,
+        fact_products=fact_products,
+        total_revenue=revenue or 0,
+        product_distribution=[tuple(row) for row in distribution or []],
+        orphans={
+            "product_key": orphan_products,
+            "customer_key": orphan_customers,
+            "date_key": orphan_dates,
+        },
+    )
+
+
+def collect_fast_report(cursor):
+    """
+    The report from reltuples, pg_stats and TABLESAMPLE instead of full scans.
+
+    Counts, distinct counts, revenue, the product distribution and the orphan
+    counts are approx_stats.Estimate values; the dimension listings are read
+    in full (they are small).
+    """
+    rows = estimated_rows(cursor)
+    fact_rows = rows["fact_orders"]
+    fact_percent = sample_percent(fact_rows)
+
+    cursor.execute(
+        "SELECT product_key, product_id, product_name FROM dim_product ORDER BY product_id, product_name;"
+    )
+    product_rows = cursor.fetchall()
+    products = [(pid, pname) for _, pid, pname in product_rows]
+    cursor.execute("SELECT platform FROM dim_platform ORDER BY platform;")
+    platforms = [platform for (platform,) in cursor.fetchall()]
+    cursor.execute("SELECT marketing_channel FROM dim_marketing_channel ORDER BY marketing_channel;")
+    channels = [channel for (channel,) in cursor.fetchall()]
+
+    min_date, max_date, date_range_exact = sampled_range(
+        cursor, "dim_date", "order_date", sample_percent(rows["dim_date"])
+    )
+    profile = sampled_totals(cursor, "fact_orders", {
+        "revenue": "fo.order_amount_usd",
+        "orphan_products": "(dp.product_key IS NULL)::int",
+        "orphan_customers": "(dc.customer_key IS NULL)::int",
+        "orphan_dates": "(dd.date_key IS NULL)::int",
+    }, fact_percent, alias="fo", joins=ORPHAN_JOINS)
+    orders_by_product = sampled_group_totals(
+        cursor, "fact_orders", "fo.product_key", "1", fact_percent, alias="fo"
+    )
+    product_labels = {key: (pid, pname) for key, pid, pname in product_rows}
+
+    return VerificationReport(
+        table_counts={table: rows[table] for table in DIMENSION_TABLES + ["fact_orders"]},
+        products=products,
+        unique_countries=estimated_distinct(cursor, "dim_customer", "country_code", rows["dim_customer"]),
+        creation_methods=estimated_distinct(
+            cursor, "dim_customer", "account_creation_method", rows["dim_customer"]
+        ),
+        date_range=(min_date, max_date),
+        platforms=platforms,
+        marketing_channels=channels,
+        fact_customers=estimated_distinct(cursor, "fact_orders", "customer_key", fact_rows),
+        fact_products=estimated_distinct(cursor, "fact_orders", "product_key", fact_rows),
+        total_revenue=profile["revenue"],
+        product_distribution=sorted(
+            (product_labels.get(key, (None, None)) + (orders,) for key, orders in orders_by_product.items()),
+            key=lambda row: row[2].value, reverse=True,
+        ),
+        orphans={
+            "product_key": profile["orphan_products"],
+            "customer_key": profile["orphan_customers"],
+            "date_key": profile["orphan_dates"],
+        },
+        mode="fast",
+        date_range_exact=date_range_exact,
+    )
 
-# Load environment variables
-load_dotenv()
 
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
+def print_report(report):
+    """Print a VerificationReport in the usual layout"""
+    counts = report.table_counts
+    print("=" * 80)
+    print("📊 DATABASE VERIFICATION REPORT")
+    if report.mode == "fast":
+        print("   (--fast: estimated figures, [low – high] is the error bound)")
+    print("=" * 80)
 
-def verify_database():
-    """Verify all database tables and data integrity"""
+    print("\n[PRODUCTS TABLE]")
+    print(f"  Total Records: {counts['dim_product']}")
+    for pid, pname in report.products:
+        print(f"    • {pid}: {pname}")
+
+    print("\n[CUSTOMERS TABLE]")
+    print(f"  Total Records: {counts['dim_customer']}")
+    print(f"  Unique Countries: {report.unique_countries}")
+    print(f"  Account Creation Methods: {report.creation_methods}")
+
+    print("\n[DATES TABLE]")
+    print(f"  Total Records: {counts['dim_date']}")
+    print(f"  Date Range: {report.date_range[0]} to {report.date_range[1]}"
+          + ("" if report.date_range_exact else " (sampled: the true range is at least this wide)"))
+
+    print("\n[COUNTRIES TABLE]")
+    print(f"  Total Records: {counts['dim_country']}")
+
+    print("\n[PLATFORMS TABLE]")
+    print(f"  Total Records: {counts['dim_platform']}")
+    for platform in report.platforms:
+        print(f"    • {platform}")
+
+    print("\n[MARKETING CHANNELS TABLE]")
+    print(f"  Total Records: {counts['dim_marketing_channel']}")
+    for channel in report.marketing_channels:
+        print(f"    • {channel}")
+
+    print("\n[ACCOUNT CREATION METHODS TABLE]")
+    print(f"  Total Records: {counts['dim_account_creation_method']}")
+
+    print("\n[FACT ORDERS TABLE]")
+    print(f"  Total Records: {counts['fact_orders']}")
+    print(f"  Unique Customers: {report.fact_customers}")
+    print(f"  Unique Products: {report.fact_products}")
+    print(f"  Total Revenue: ${report.total_revenue:,.2f}")
+
+    print("\n  [PRODUCTS DISTRIBUTION IN ORDERS]")
+    for pid, pname, order_count in report.product_distribution:
+        print(f"    • {pid} ({pname}): {order_count:,.0f} orders")
+
+    print("\n[REFERENTIAL INTEGRITY CHECK]")
+    print(f"  Orphaned Product Keys: {report.orphans['product_key']}")
+    print(f"  Orphaned Customer Keys: {report.orphans['customer_key']}")
+    print(f"  Orphaned Date Keys: {report.orphans['date_key']}")
+
+    print("\n" + "=" * 80)
+    print("✅ VERIFICATION COMPLETE")
+    print("=" * 80)
+
+    print(f"\nTotal Records in Database: {add_estimates(counts.values()):,.0f}")
+
+    if not any(report.orphans.values()):
+        print("✅ All referential integrity checks PASSED"
+              + (" (no orphans in the sample)" if report.mode == "fast" else ""))
+    else:
+        print("⚠️  Some referential integrity issues found")
+
+    print("=" * 80)
+
+
+def verify_database(fast=False):
+    """
+    Verify all database tables and data integrity; returns the VerificationReport.
+
+    fast=True estimates the figures (see collect_fast_report) instead of
+    scanning every table.
+    """
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cursor = conn.cursor()
-        
-        print("=" * 80)
-        print("📊 DATABASE VERIFICATION REPORT")
-        print("=" * 80)
-        
-        # Products
-        print("\n[PRODUCTS TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_products;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT product_id, product_name FROM dim_products ORDER BY product_id;")
-        products = cursor.fetchall()
-        for pid, pname in products:
-            print(f"    • {pid}: {pname}")
-        
-        # Customers
-        print("\n[CUSTOMERS TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_customer;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT COUNT(DISTINCT country_code) FROM dim_customer;")
-        countries = cursor.fetchone()[0]
-        print(f"  Unique Countries: {countries}")
-        
-        cursor.execute("SELECT COUNT(DISTINCT account_creation_method) FROM dim_customer;")
-        methods = cursor.fetchone()[0]
-        print(f"  Account Creation Methods: {methods}")
-        
-        # Dates
-        print("\n[DATES TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_date;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT MIN(order_date), MAX(order_date) FROM dim_date;")
-        min_date, max_date = cursor.fetchone()
-        print(f"  Date Range: {min_date} to {max_date}")
-        
-        # Countries
-        print("\n[COUNTRIES TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_country;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        # Platforms
-        print("\n[PLATFORMS TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_platform;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT platform FROM dim_platform ORDER BY platform;")
-        platforms = cursor.fetchall()
-        for (platform,) in platforms:
-            print(f"    • {platform}")
-        
-        # Marketing Channels
-        print("\n[MARKETING CHANNELS TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM dim_marketing_channel;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT marketing_channel FROM dim_marketing_channel ORDER BY marketing_channel;")
-        channels = cursor.fetchall()
-        for (channel,) in channels:
-            print(f"    • {channel}")
-        
-        # Fact Orders
-        print("\n[FACT ORDERS TABLE]")
-        cursor.execute("SELECT COUNT(*) FROM fact_orders;")
-        count = cursor.fetchone()[0]
-        print(f"  Total Records: {count}")
-        
-        cursor.execute("SELECT COUNT(DISTINCT customer_id) FROM fact_orders;")
-        customers = cursor.fetchone()[0]
-        print(f"  Unique Customers: {customers}")
-        
-        cursor.execute("SELECT COUNT(DISTINCT product_id) FROM fact_orders;")
-        products = cursor.fetchone()[0]
-        print(f"  Unique Products: {products}")
-        
-        cursor.execute("SELECT SUM(order_amount_usd::numeric) FROM fact_orders;")
-        total_revenue = cursor.fetchone()[0]
-        print(f"  Total Revenue: ${total_revenue:,.2f}")
-        
-        # Product distribution
-        print("\n  [PRODUCTS DISTRIBUTION IN ORDERS]")
-        cursor.execute("""
-            SELECT fo.product_id, dp.product_name, COUNT(*) as order_count
-            FROM fact_orders fo
-            LEFT JOIN dim_products dp ON fo.product_id = dp.product_id
-            GROUP BY fo.product_id, dp.product_name
-            ORDER BY order_count DESC;
-        """)
-        
-        products_dist = cursor.fetchall()
-        for pid, pname, order_count in products_dist:
-            print(f"    • {pid} ({pname}): {order_count:,} orders")
-        
-        # Referential Integrity Check
-        print("\n[REFERENTIAL INTEGRITY CHECK]")
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM fact_orders fo
-            WHERE NOT EXISTS (SELECT 1 FROM dim_products dp WHERE dp.product_id = fo.product_id);
-        """)
-        orphaned_products = cursor.fetchone()[0]
-        print(f"  Orphaned Product IDs: {orphaned_products}")
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM fact_orders fo
-            WHERE NOT EXISTS (SELECT 1 FROM dim_customer dc WHERE dc.customer_id = fo.customer_id);
-        """)
-        orphaned_customers = cursor.fetchone()[0]
-        print(f"  Orphaned Customer IDs: {orphaned_customers}")
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM fact_orders fo
-            WHERE NOT EXISTS (SELECT 1 FROM dim_date dd WHERE dd.date_key::text = fo.date_key::text);
-        """)
-        orphaned_dates = cursor.fetchone()[0]
-        print(f"  Orphaned Date Keys: {orphaned_dates}")
-        
-        # Summary
-        print("\n" + "=" * 80)
-        print("✅ VERIFICATION COMPLETE")
-        print("=" * 80)
-        
-        total_records = (
-            cursor.execute("SELECT COUNT(*) FROM dim_products;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM dim_customer;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM dim_date;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM dim_country;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM dim_platform;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM dim_marketing_channel;") or 0,
-            cursor.execute("SELECT COUNT(*) FROM fact_orders;") or 0,
-        )
-        
-        cursor.execute("SELECT COUNT(*) FROM dim_products;")
-        total = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM dim_customer;")
-        total += cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM dim_date;")
-        total += cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM dim_country;")
-        total += cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM dim_platform;")
-        total += cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM dim_marketing_channel;")
-        total += cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM fact_orders;")
-        total += cursor.fetchone()[0]
-        
-        print(f"\nTotal Records in Database: {total:,}")
-        
-        if orphaned_products == 0 and orphaned_customers == 0 and orphaned_dates == 0:
-            print("✅ All referential integrity checks PASSED")
-        else:
-            print("⚠️  Some referential integrity issues found")
-        
-        print("=" * 80)
-        
-        cursor.close()
-        conn.close()
-        
+        # Connection settings come from .env through the shared db module
+        conn = db.connect()
+        try:
+            cursor = conn.cursor()
+            report = collect_fast_report(cursor) if fast else collect_report(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+
+        print_report(report)
+        return report
+
     except Exception as e:
         print(f"❌ Verification failed: {e}")
         raise
 
 if __name__ == "__main__":
-    verify_database()
+    verify_database(fast="--fast" in sys.argv[1:])